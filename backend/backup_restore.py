@@ -2,15 +2,30 @@
 """
 Backup and Restore module for Mahall Software
 Handles backup of SQLite database and media files to ZIP archive
+
+Incremental backups keep a content-addressed repository instead of a ZIP:
+
+    <repo>/blobs/ab/abcdef...    one file per distinct content (SHA-256)
+    <repo>/snapshots/<id>.json   manifest: database blob + media path -> blob
+
+Each run only stores blobs that are not in the repository yet, and files whose
+size and modification time match the previous manifest are not even re-read,
+so a daily backup of a large, mostly unchanged photo library is quick and
+takes little extra disk.
 """
 
 import os
 import sys
+import json
+import hashlib
 import zipfile
 import tempfile
+from datetime import datetime, timezone
 from pathlib import Path
 import shutil
 
+HASH_CHUNK_SIZE = 1024 * 1024
+
 # Add the backend directory to Python path
 backend_dir = Path(__file__).parent.absolute()
 sys.path.insert(0, str(backend_dir))
@@ -98,6 +113,7 @@ def restore_backup(backup_path):
         django.setup()
         
         from django.conf import settings
+        from society.data_transfer import refresh_derived_data
         
         backup_path = Path(backup_path)
         
@@ -154,6 +170,11 @@ def restore_backup(backup_path):
                 print("Media files restored")
             else:
                 print("Warning: No media directory found in backup")
+            
+            # Migrate and rebuild only once database and media are both in place,
+            # so a failure here cannot leave the new database with the old media
+            if backup_db.exists():
+                refresh_derived_data()
         
         print("Restore completed successfully")
         
@@ -161,12 +182,208 @@ def restore_backup(backup_path):
         print(f"Error restoring backup: {e}")
         raise
 
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _blob_path(repo_path, digest):
+    return repo_path / "blobs" / digest[:2] / digest
+
+
+def _store_blob(repo_path, source, digest):
+    """Copy ``source`` into the blob store unless that content is already there; returns True if added"""
+    blob = _blob_path(repo_path, digest)
+    if blob.exists():
+        return False
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    # Copy under a temporary name first so an interrupted run never leaves a partial blob
+    partial = blob.with_suffix('.partial')
+    shutil.copyfile(source, partial)
+    os.replace(partial, blob)
+    return True
+
+
+def list_snapshots(repo_path):
+    """Return the snapshot ids in an incremental backup repository, oldest first"""
+    snapshots_dir = Path(repo_path) / "snapshots"
+    if not snapshots_dir.exists():
+        return []
+    return sorted(p.stem for p in snapshots_dir.glob('*.json'))
+
+
+def _load_manifest(repo_path, snapshot_id):
+    with open(Path(repo_path) / "snapshots" / f"{snapshot_id}.json", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def create_incremental_backup(repo_path=None):
+    """
+    Add a snapshot of the database and media files to an incremental backup repository
+    
+    Args:
+        repo_path (str): Repository directory; created if missing.
+                         If None, uses the 'backups' folder in the data directory
+    
+    Returns:
+        str: Id of the new snapshot
+    """
+    try:
+        import django
+        django.setup()
+        
+        from django.conf import settings
+        from society.data_transfer import snapshot_database
+        
+        repo_path = Path(repo_path) if repo_path else Path(settings.DATA_DIR) / "backups"
+        (repo_path / "snapshots").mkdir(parents=True, exist_ok=True)
+        db_path = Path(settings.DATABASES['default']['NAME'])
+        media_path = Path(settings.MEDIA_ROOT)
+        
+        print(f"Creating incremental backup...")
+        print(f"Database: {db_path}")
+        print(f"Media: {media_path}")
+        print(f"Repository: {repo_path}")
+        
+        # Files unchanged since the last snapshot (same size and mtime) reuse its hash
+        previous = list_snapshots(repo_path)
+        known = _load_manifest(repo_path, previous[-1])['media'] if previous else {}
+        
+        manifest = {'created': datetime.now(timezone.utc).isoformat(), 'database': None, 'media': {}}
+        added = 0
+        
+        if db_path.exists():
+            with tempfile.TemporaryDirectory() as temp_dir:
+                db_snapshot = Path(temp_dir) / "db.sqlite3"
+                snapshot_database(db_snapshot)
+                digest = _hash_file(db_snapshot)
+                added += _store_blob(repo_path, db_snapshot, digest)
+                manifest['database'] = digest
+            print("Database snapshot stored")
+        else:
+            print("Warning: Database file not found")
+        
+        if media_path.exists() and media_path.is_dir():
+            for file_path in media_path.rglob('*'):
+                if not file_path.is_file():
+                    continue
+                rel = file_path.relative_to(media_path).as_posix()
+                stat = file_path.stat()
+                entry = known.get(rel)
+                if not (entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+                        and _blob_path(repo_path, entry['hash']).exists()):
+                    digest = _hash_file(file_path)
+                    added += _store_blob(repo_path, file_path, digest)
+                    entry = {'hash': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                manifest['media'][rel] = entry
+            print(f"Media files recorded: {len(manifest['media'])}")
+        else:
+            print("Warning: Media directory not found")
+        
+        snapshot_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        manifest_path = repo_path / "snapshots" / f"{snapshot_id}.json"
+        with open(manifest_path.with_suffix('.partial'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(manifest_path.with_suffix('.partial'), manifest_path)
+        
+        print(f"Snapshot {snapshot_id} created ({added} new blobs)")
+        return snapshot_id
+        
+    except Exception as e:
+        print(f"Error creating incremental backup: {e}")
+        raise
+
+def restore_incremental_backup(repo_path, snapshot_id=None):
+    """
+    Restore database and media files from an incremental backup repository
+    
+    Args:
+        repo_path (str): Repository directory
+        snapshot_id (str): Snapshot to restore; the latest if None
+    """
+    try:
+        import django
+        django.setup()
+        
+        from django.conf import settings
+        from society.data_transfer import refresh_derived_data
+        
+        repo_path = Path(repo_path)
+        snapshots = list_snapshots(repo_path)
+        if not snapshots:
+            raise FileNotFoundError(f"No snapshots found in: {repo_path}")
+        snapshot_id = snapshot_id or snapshots[-1]
+        if snapshot_id not in snapshots:
+            raise FileNotFoundError(f"Snapshot not found: {snapshot_id}")
+        manifest = _load_manifest(repo_path, snapshot_id)
+        
+        db_path = Path(settings.DATABASES['default']['NAME'])
+        media_path = Path(settings.MEDIA_ROOT)
+        
+        print(f"Restoring snapshot {snapshot_id} from: {repo_path}")
+        print(f"Database target: {db_path}")
+        print(f"Media target: {media_path}")
+        
+        # Check every blob before touching the current data
+        wanted = [manifest['database']] if manifest['database'] else []
+        wanted += [entry['hash'] for entry in manifest['media'].values()]
+        for digest in set(wanted):
+            blob = _blob_path(repo_path, digest)
+            if not blob.exists() or _hash_file(blob) != digest:
+                raise ValueError(f"Blob {digest} is missing or corrupt")
+        
+        # Rebuild the media tree next to the current one, then swap it in
+        with tempfile.TemporaryDirectory(dir=media_path.parent if media_path.parent.exists() else None) as temp_dir:
+            new_media = Path(temp_dir) / "media"
+            new_media.mkdir()
+            for rel, entry in manifest['media'].items():
+                target = new_media / rel
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(_blob_path(repo_path, entry['hash']), target)
+            
+            if manifest['database']:
+                # Backup current database first
+                if db_path.exists():
+                    backup_name = f"{db_path}.backup"
+                    shutil.copy2(db_path, backup_name)
+                    print(f"Current database backed up to: {backup_name}")
+                shutil.copyfile(_blob_path(repo_path, manifest['database']), db_path)
+                print("Database restored")
+            else:
+                print("Warning: No database in snapshot")
+            
+            # Backup current media first
+            if media_path.exists():
+                backup_media_name = f"{media_path}_backup"
+                if os.path.exists(backup_media_name):
+                    shutil.rmtree(backup_media_name)
+                os.replace(media_path, backup_media_name)
+                print(f"Current media backed up to: {backup_media_name}")
+            shutil.move(str(new_media), str(media_path))
+            print(f"Media files restored: {len(manifest['media'])}")
+        
+        # Migrate and rebuild only once database and media are both in place
+        if manifest['database']:
+            refresh_derived_data()
+        
+        print("Restore completed successfully")
+        
+    except Exception as e:
+        print(f"Error restoring incremental backup: {e}")
+        raise
+
 def main():
     """Main function for command line usage"""
     if len(sys.argv) < 2:
         print("Usage:")
         print("  python backup_restore.py backup [backup_path]")
         print("  python backup_restore.py restore backup_path")
+        print("  python backup_restore.py backup-incremental [repo_path]")
+        print("  python backup_restore.py restore-incremental repo_path [snapshot_id]")
+        print("  python backup_restore.py list-snapshots repo_path")
         return
     
     command = sys.argv[1].lower()
@@ -180,9 +397,24 @@ def main():
             return
         backup_path = sys.argv[2]
         restore_backup(backup_path)
+    elif command == "backup-incremental":
+        repo_path = sys.argv[2] if len(sys.argv) > 2 else None
+        create_incremental_backup(repo_path)
+    elif command == "restore-incremental":
+        if len(sys.argv) < 3:
+            print("Error: restore-incremental command requires repo_path")
+            return
+        snapshot_id = sys.argv[3] if len(sys.argv) > 3 else None
+        restore_incremental_backup(sys.argv[2], snapshot_id)
+    elif command == "list-snapshots":
+        if len(sys.argv) < 3:
+            print("Error: list-snapshots command requires repo_path")
+            return
+        for snapshot_id in list_snapshots(sys.argv[2]):
+            print(snapshot_id)
     else:
         print(f"Unknown command: {command}")
-        print("Available commands: backup, restore")
+        print("Available commands: backup, restore, backup-incremental, restore-incremental, list-snapshots")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -70,6 +70,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'society.audit.AuditBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'mahall_backend.urls'
@@ -150,6 +151,15 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = DATA_DIR / 'media'
 
+# RecentAction retention: synced entries older than this many days are compacted
+# into daily summaries by `manage.py compact_recent_actions`
+RECENT_ACTION_RETENTION_DAYS = 90
+RECENT_ACTION_ARCHIVE = DATA_DIR / 'recent_actions_archive.sqlite3'
+
+# Background jobs (society.jobs): worker threads and where job files are kept
+JOB_WORKERS = 2
+JOBS_DIR = DATA_DIR / 'jobs'
+
 # CORS settings for API access
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Area, House, Member, Collection, SubCollection, MemberObligation, AppSettings
+from .models import Area, House, Member, Collection, SubCollection, MemberObligation, AppSettings, IdSequence
 
 # Register your models here.
 admin.site.register(Area)
@@ -9,6 +9,7 @@ admin.site.register(Collection)
 admin.site.register(SubCollection)
 admin.site.register(MemberObligation)
 admin.site.register(AppSettings)
+admin.site.register(IdSequence)
 
 from .models import RecentAction
 
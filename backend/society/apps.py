@@ -7,4 +7,34 @@ class SocietyConfig(AppConfig):
 
     def ready(self):
         import society.signals
+        import society.job_handlers
+        from django.core.signals import request_started
+        from django.db.models.signals import post_migrate
+        post_migrate.connect(ensure_search_index_after_migrate, sender=self)
+        # Start the job runner with the first request rather than at import time,
+        # so management commands never spin up worker threads
+        request_started.connect(start_job_runner, dispatch_uid='society_start_job_runner')
+        request_started.connect(recover_firestore_sync, dispatch_uid='society_recover_firestore_sync')
 
+
+def ensure_search_index_after_migrate(using, **kwargs):
+    # Table rebuilds during migrate drop the FTS and change-feed triggers; put them back
+    from django.db import connections
+    from society.change_feed import ensure_change_triggers
+    from society.search_index import ensure_search_index
+    ensure_search_index(connections[using])
+    ensure_change_triggers(connections[using])
+
+
+
+def start_job_runner(**kwargs):
+    from society import jobs
+    jobs.start()
+
+
+def recover_firestore_sync(**kwargs):
+    # Re-queue the Firestore changes a previous process had not sent yet; once per process
+    from django.core.signals import request_started
+    from society.firebase_service import sync_engine
+    request_started.disconnect(dispatch_uid='society_recover_firestore_sync')
+    sync_engine.recover()
@@ -0,0 +1,154 @@
+"""
+Batched writes for the RecentAction audit log.
+
+``record()`` does not insert straight away. Each entry is handed over once its
+transaction commits (entries from rolled-back work, including rolled-back
+savepoints, are dropped), and all entries a transaction committed are written
+together with one bulk_create. This holds everywhere: requests, job threads,
+management commands and the shell. A ``buffer()`` widens the batch further;
+AuditBufferMiddleware opens one per request and the job runner one per job, so
+all audit rows of a request or job cost a single INSERT.
+
+Bulk code paths run inside ``bulk_operation()``: per-row entries recorded in
+the block (signal handlers included) are dropped and one summary entry is
+recorded instead. queryset.update() and bulk_create send no signals at all, so
+those paths describe their rows on the summary themselves.
+"""
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+from .models import RecentAction
+
+BULK_BATCH_SIZE = 500
+
+_local = threading.local()
+
+
+def _stack(name):
+    if not hasattr(_local, name):
+        setattr(_local, name, [])
+    return getattr(_local, name)
+
+
+def _write(entries):
+    if entries:
+        RecentAction.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+
+
+def _deliver(entries):
+    buffers = _stack('buffers')
+    if buffers:
+        buffers[-1].extend(entries)
+    else:
+        _write(entries)
+
+
+def _committed(index, entry):
+    """on_commit callback of the ``index``-th recorded entry"""
+    committed = _stack('committed')
+    committed.append(entry)
+    # The last entry registered outside a savepoint writes the whole transaction;
+    # entries from savepoints opened after it can only follow one by one
+    if index >= getattr(_local, 'writer', 0):
+        _local.committed = []
+        _deliver(committed)
+
+
+def record(model_name, object_id, action_type, description, fields_changed=None):
+    """Queue one audit entry; it is written after the surrounding transaction commits"""
+    summaries = _stack('summaries')
+    if summaries:
+        summaries[-1].rows += 1
+        return
+    entry = RecentAction(
+        model_name=model_name,
+        object_id=str(object_id),
+        action_type=action_type,
+        description=description,
+        fields_changed=fields_changed or {}
+    )
+    connection = transaction.get_connection()
+    # Nothing pending and nothing held back: this is the first entry of a new
+    # transaction (or the previous one rolled back), so number entries afresh
+    if not connection.run_on_commit and not _stack('committed'):
+        _local.registered = 0
+        _local.writer = 0
+    index = _local.registered = getattr(_local, 'registered', 0) + 1
+    # Callbacks registered outside any savepoint run whenever the transaction commits,
+    # so the latest of them is certain to come after every surviving entry before it
+    if not connection.savepoint_ids:
+        _local.writer = index
+    transaction.on_commit(lambda: _committed(index, entry))
+
+
+@contextmanager
+def buffer():
+    """Collect committed audit entries and write them with one bulk insert on exit"""
+    buffers = _stack('buffers')
+    entries = []
+    buffers.append(entries)
+    try:
+        yield entries
+    finally:
+        buffers.pop()
+        if buffers:
+            buffers[-1].extend(entries)
+        else:
+            _write(entries)
+
+
+class BulkSummary:
+    """The summary entry of a ``bulk_operation()``, filled in while the block runs"""
+
+    def __init__(self, description, fields_changed=None):
+        self.description = description
+        self.fields_changed = dict(fields_changed or {})
+        # Per-row entries suppressed so far; bulk writes without signals set it themselves
+        self.rows = 0
+
+    def record_ids(self, object_ids):
+        """Note the objects written without signals (bulk_create, raw SQL)"""
+        object_ids = sorted(object_ids)
+        self.rows = len(object_ids)
+        self.fields_changed['ids'] = object_ids
+
+    def record_update(self, object_ids, field, old_histogram, new_value):
+        """
+        Note a queryset.update() that set ``field`` to ``new_value`` on ``object_ids``.
+        ``old_histogram`` maps each previous value to how many of the rows had it.
+        """
+        self.record_ids(object_ids)
+        self.fields_changed[field] = {'old': dict(old_histogram), 'new': new_value}
+
+
+@contextmanager
+def bulk_operation(model_name, object_id, action_type, description='', fields_changed=None):
+    """
+    Suppress per-row audit entries inside the block and record one summary entry
+    when it completes. The yielded BulkSummary can still change the description
+    and ``fields_changed``; the row count is stored under 'rows'. A block that
+    touched no rows records nothing. The entry is flagged for sync like any other.
+    """
+    summaries = _stack('summaries')
+    summary = BulkSummary(description, fields_changed)
+    summaries.append(summary)
+    try:
+        yield summary
+    finally:
+        summaries.pop()
+    if summary.rows:
+        record(
+            model_name, object_id, action_type, summary.description,
+            {'rows': summary.rows, **summary.fields_changed}
+        )
+
+
+class AuditBufferMiddleware:
+    """Write all audit entries of a request with a single insert"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffer():
+            return self.get_response(request)
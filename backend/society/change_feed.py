@@ -0,0 +1,123 @@
+"""
+Incremental change feed for the Firestore sync.
+
+SQLite triggers on houses, members and obligations upsert the affected house
+into society_familychange with a ``seq`` one above the current maximum. A house
+therefore has at most one row, and ``seq > watermark`` yields every family
+touched since the client's last acknowledged watermark exactly once. Because the
+triggers live in the database, queryset.update() and bulk_create are covered
+too. Like the search index, nothing is installed on other databases.
+"""
+from django.db import connection as default_connection
+from .models import FamilyChange
+
+CHANGE_TABLE = FamilyChange._meta.db_table
+
+DOC_ID_SQL = "COALESCE(NULLIF(firebase_id, ''), home_id)"
+
+
+def _touch(house_id_sql):
+    """Upsert of the house whose pk is ``house_id_sql`` (an expression over new/old)"""
+    return f"""INSERT INTO {CHANGE_TABLE} (house_id, doc_id, seq, deleted)
+        SELECT id, {DOC_ID_SQL}, (SELECT COALESCE(MAX(seq), 0) + 1 FROM {CHANGE_TABLE}), 0
+        FROM society_house WHERE id = {house_id_sql}
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;"""
+
+
+def _touch_member_house(member_id_sql):
+    return _touch(f"(SELECT house_id FROM society_member WHERE id = {member_id_sql})")
+
+
+TRIGGERS = {
+    'society_house_changes_insert': f"""CREATE TRIGGER society_house_changes_insert
+    AFTER INSERT ON society_house BEGIN
+        {_touch('new.id')}
+    END""",
+    'society_house_changes_update': f"""CREATE TRIGGER society_house_changes_update
+    AFTER UPDATE ON society_house BEGIN
+        {_touch('new.id')}
+    END""",
+    # The house row is already gone, so the values come from old.*
+    'society_house_changes_delete': f"""CREATE TRIGGER society_house_changes_delete
+    AFTER DELETE ON society_house BEGIN
+        INSERT INTO {CHANGE_TABLE} (house_id, doc_id, seq, deleted)
+        VALUES (old.id, COALESCE(NULLIF(old.firebase_id, ''), old.home_id),
+                (SELECT COALESCE(MAX(seq), 0) + 1 FROM {CHANGE_TABLE}), 1)
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = 1;
+    END""",
+    'society_member_changes_insert': f"""CREATE TRIGGER society_member_changes_insert
+    AFTER INSERT ON society_member BEGIN
+        {_touch('new.house_id')}
+    END""",
+    'society_member_changes_update': f"""CREATE TRIGGER society_member_changes_update
+    AFTER UPDATE ON society_member BEGIN
+        {_touch('new.house_id')}
+    END""",
+    'society_member_changes_move': f"""CREATE TRIGGER society_member_changes_move
+    AFTER UPDATE OF house_id ON society_member WHEN old.house_id IS NOT new.house_id BEGIN
+        {_touch('old.house_id')}
+    END""",
+    'society_member_changes_delete': f"""CREATE TRIGGER society_member_changes_delete
+    AFTER DELETE ON society_member BEGIN
+        {_touch('old.house_id')}
+    END""",
+    'society_obligation_changes_insert': f"""CREATE TRIGGER society_obligation_changes_insert
+    AFTER INSERT ON society_memberobligation BEGIN
+        {_touch_member_house('new.member_id')}
+    END""",
+    'society_obligation_changes_update': f"""CREATE TRIGGER society_obligation_changes_update
+    AFTER UPDATE ON society_memberobligation BEGIN
+        {_touch_member_house('new.member_id')}
+    END""",
+    'society_obligation_changes_delete': f"""CREATE TRIGGER society_obligation_changes_delete
+    AFTER DELETE ON society_memberobligation BEGIN
+        {_touch_member_house('old.member_id')}
+    END""",
+}
+
+
+def ensure_change_triggers(connection=default_connection):
+    """Create any missing change-feed triggers (SQLite drops them when a table is remade)"""
+    if connection.vendor != 'sqlite':
+        return False
+    # Migrated back to before the change table: triggers writing to it would break every save
+    if CHANGE_TABLE not in connection.introspection.table_names():
+        drop_change_triggers(connection)
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'society_%_changes_%'")
+        existing = {row[0] for row in cursor.fetchall()}
+        for name, sql in TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(sql)
+    return True
+
+
+def drop_change_triggers(connection=default_connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def current_watermark():
+    """The highest change sequence number so far (0 when nothing changed yet)"""
+    return FamilyChange.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+
+def changes_since(since, limit):
+    """
+    Families changed after ``since``, oldest change first, at most ``limit``.
+    Returns (changed house pks, deleted document ids, new watermark, has_more).
+    """
+    rows = list(
+        FamilyChange.objects.filter(seq__gt=since).order_by('seq')
+        .values_list('house_id', 'doc_id', 'seq', 'deleted')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changed = [house_id for house_id, _, _, deleted in rows if not deleted]
+    deleted = [doc_id for _, doc_id, _, is_deleted in rows if is_deleted]
+    watermark = rows[-1][2] if rows else since
+    return changed, deleted, watermark, has_more
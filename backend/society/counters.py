@@ -0,0 +1,115 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, Q
+from .models import Area, House, Member, Collection, SubCollection, MemberObligation, Todo, DashboardCounter
+
+# Counter key -> (model, field filter). Keys containing ':' are nested in the dashboard
+# response, e.g. 'members_by_status:live' -> stats['members_by_status']['live'].
+COUNTERS = {
+    'areas_count': (Area, {}),
+    'houses_count': (House, {}),
+    'members_count': (Member, {}),
+    'collections_count': (Collection, {}),
+    'subcollections_count': (SubCollection, {}),
+    'obligations_count': (MemberObligation, {}),
+    'todos_count': (Todo, {}),
+    'completed_todos_count': (Todo, {'completed': True}),
+    'pending_todos_count': (Todo, {'completed': False}),
+    'members_by_status:live': (Member, {'status': 'live'}),
+    'members_by_status:dead': (Member, {'status': 'dead'}),
+    'members_by_status:terminated': (Member, {'status': 'terminated'}),
+    'obligations_by_status:pending': (MemberObligation, {'paid_status': 'pending'}),
+    'obligations_by_status:paid': (MemberObligation, {'paid_status': 'paid'}),
+    'obligations_by_status:overdue': (MemberObligation, {'paid_status': 'overdue'}),
+    'obligations_by_status:partial': (MemberObligation, {'paid_status': 'partial'}),
+}
+
+COUNTED_MODELS = tuple(dict.fromkeys(model for model, _ in COUNTERS.values()))
+
+
+def instance_keys(instance, values=None):
+    """
+    Return the counter keys that ``instance`` contributes one to. ``values`` can
+    supply field values to use instead of the instance's current ones.
+    """
+    values = values or {}
+    return [
+        key for key, (model, filters) in COUNTERS.items()
+        if isinstance(instance, model)
+        and all(values.get(field, getattr(instance, field)) == value for field, value in filters.items())
+    ]
+
+
+def adjust(deltas):
+    """Apply {key: delta} to the stored counters with one UPDATE per changed key"""
+    for key, delta in deltas.items():
+        if delta:
+            DashboardCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def record_save(instance, old_values=None, created=False):
+    """Update counters after ``instance`` was created or changed from the field values in ``old_values``"""
+    deltas = Counter(instance_keys(instance))
+    if not created:
+        if old_values is None:
+            return
+        deltas.subtract(instance_keys(instance, old_values))
+    adjust(deltas)
+
+
+def record_delete(instance):
+    adjust({key: -1 for key in instance_keys(instance)})
+
+
+def record_obligation_status_change(histogram, new_status):
+    """
+    Update counters after a bulk status change. ``histogram`` maps the old
+    paid_status of the changed rows to how many rows had it.
+    """
+    deltas = Counter()
+    for old_status, count in histogram.items():
+        deltas[f'obligations_by_status:{old_status}'] -= count
+        deltas[f'obligations_by_status:{new_status}'] += count
+    adjust(deltas)
+
+
+def record_obligations_created(statuses):
+    """Update counters after bulk-inserting obligations with the given paid_status values"""
+    deltas = Counter(f'obligations_by_status:{status}' for status in statuses)
+    deltas['obligations_count'] = sum(deltas.values())
+    adjust(deltas)
+
+
+def reconcile():
+    """Recompute every counter from scratch with one aggregate query per model"""
+    values = {}
+    for model in COUNTED_MODELS:
+        keys = [key for key, (counter_model, _) in COUNTERS.items() if counter_model is model]
+        aggregates = {
+            f'c{i}': Count('pk', filter=Q(**COUNTERS[key][1])) if COUNTERS[key][1] else Count('pk')
+            for i, key in enumerate(keys)
+        }
+        result = model.objects.aggregate(**aggregates)
+        values.update({key: result[f'c{i}'] for i, key in enumerate(keys)})
+
+    with transaction.atomic():
+        DashboardCounter.objects.exclude(key__in=COUNTERS.keys()).delete()
+        for key, value in values.items():
+            DashboardCounter.objects.update_or_create(key=key, defaults={'value': value})
+    return values
+
+
+def snapshot():
+    """Return the dashboard statistics from the counters table, reconciling if it is incomplete"""
+    values = dict(DashboardCounter.objects.values_list('key', 'value'))
+    if len(values) != len(COUNTERS):
+        values = reconcile()
+
+    stats = {}
+    for key in COUNTERS:
+        if ':' in key:
+            group, name = key.split(':', 1)
+            stats.setdefault(group, {})[name] = values[key]
+        else:
+            stats[key] = values[key]
+    return stats
@@ -0,0 +1,165 @@
+"""
+Export and import of the whole dataset (database file plus media) as a ZIP,
+shared by the export/import endpoints and their background jobs.
+
+Exports are produced as a stream: the database is copied with the SQLite online
+backup API (a consistent snapshot even while the app keeps writing), and the ZIP
+is generated in chunks, so memory use does not depend on the size of the
+database or the photo library. Already-compressed images are stored as-is.
+"""
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from django.conf import settings
+from django.core.management import call_command
+from . import counters, kinship, search_index
+from .change_feed import ensure_change_triggers
+from .models import IdSequence
+
+CHUNK_SIZE = 1024 * 1024
+
+# Formats that are compressed already; deflating them again only costs CPU
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+# Pages copied per backup step; other connections can write between steps
+BACKUP_PAGES = 4096
+
+
+def _media_files():
+    media_root = settings.MEDIA_ROOT
+    if not os.path.exists(media_root):
+        return []
+    return [
+        (os.path.join(root, file), os.path.relpath(os.path.join(root, file), media_root))
+        for root, dirs, files in os.walk(media_root)
+        for file in files
+    ]
+
+
+def snapshot_database(dest_path):
+    """Copy the live database to ``dest_path`` with the SQLite online backup API"""
+    source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            source.backup(dest, pages=BACKUP_PAGES)
+        finally:
+            dest.close()
+    finally:
+        source.close()
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, unseekable sink for ZipFile; the generator drains it after each write"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        self.position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        chunk = bytes(self.data)
+        self.data.clear()
+        return chunk
+
+
+def stream_export(progress=None):
+    """
+    Yield the export ZIP (db.sqlite3 plus media files) in chunks. The database
+    snapshot is taken when the generator starts and removed when it finishes.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        entries = []
+        if os.path.exists(settings.DATABASES['default']['NAME']):
+            db_snapshot = os.path.join(temp_dir, 'db.sqlite3')
+            snapshot_database(db_snapshot)
+            entries.append((db_snapshot, 'db.sqlite3'))
+        entries.extend(_media_files())
+
+        buffer = _ChunkBuffer()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            for index, (file_path, arc_name) in enumerate(entries, 1):
+                info = zipfile.ZipInfo.from_file(file_path, arc_name)
+                ext = os.path.splitext(arc_name)[1].lower()
+                info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                with open(file_path, 'rb') as src, zf.open(info, 'w') as dest:
+                    while True:
+                        block = src.read(CHUNK_SIZE)
+                        if not block:
+                            break
+                        dest.write(block)
+                        if len(buffer.data) >= CHUNK_SIZE:
+                            yield buffer.drain()
+                yield buffer.drain()
+                if progress and index % 50 == 0:
+                    progress(index * 100 // (len(entries) + 1), f"Added {index} of {len(entries)} files")
+        # Central directory
+        yield buffer.drain()
+
+
+def write_export(zip_path, progress=None):
+    """Write the export ZIP to ``zip_path``; returns the number of media files"""
+    with open(zip_path, 'wb') as f:
+        for chunk in stream_export(progress):
+            f.write(chunk)
+    return len(_media_files())
+
+
+def import_archive(zip_file):
+    """Replace the database and media files with the contents of ``zip_file`` (path or file object)"""
+    # Extract to temp directory first
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with zipfile.ZipFile(zip_file, 'r') as zf:
+            zf.extractall(temp_dir)
+
+        # Replace database
+        db_source = os.path.join(temp_dir, 'db.sqlite3')
+        db_dest = settings.DATABASES['default']['NAME']
+        if os.path.exists(db_source):
+            shutil.copy2(db_source, db_dest)
+
+        # Replace media files
+        media_temp = os.path.join(temp_dir)
+        for item in os.listdir(media_temp):
+            if item != 'db.sqlite3':
+                source = os.path.join(media_temp, item)
+                dest = os.path.join(settings.MEDIA_ROOT, item)
+                if os.path.isdir(source):
+                    if os.path.exists(dest):
+                        shutil.rmtree(dest)
+                    shutil.copytree(source, dest)
+                else:
+                    shutil.copy2(source, dest)
+
+    refresh_derived_data()
+
+
+def refresh_derived_data():
+    """
+    Bring caches and derived tables in line after the database file was
+    replaced (import, restore). A file from an older release is migrated first,
+    so the sequence, kinship, counter and search tables exist; then nothing
+    cached about the old database applies, the ID sequences are moved past the
+    stored IDs, and the kinship closure and dashboard counters are recomputed
+    from the rows.
+    """
+    call_command('migrate', interactive=False, verbosity=0)
+    search_index.ensure_search_index()
+    ensure_change_triggers()
+    search_index.clear_caches()
+    IdSequence.catch_up()
+    kinship.rebuild()
+    counters.reconcile()
@@ -0,0 +1,77 @@
+"""
+Per-family payloads for the Firestore 'units' sync.
+
+``family_payloads`` yields, for every house, the document MyActions writes to
+Firestore: house ids and name, the guardian, the member list and the guardian's
+pending obligations. Houses are processed in chunks with three joined queries
+per chunk (houses, their members, the guardians' pending obligations), so the
+cost does not depend on how many families a chunk holds.
+"""
+from .models import House, Member, MemberObligation
+
+CHUNK_SIZE = 500
+
+# Obligations the sync reports as outstanding (same as the 'pending' filter of obligation search)
+PENDING_STATUSES = ('pending', 'overdue')
+
+
+def _chunks(queryset, size):
+    last_pk = None
+    while True:
+        page = queryset.filter(pk__gt=last_pk) if last_pk is not None else queryset
+        rows = list(page.order_by('pk')[:size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1]['pk']
+
+
+def _guardian(members):
+    """The member flagged as guardian, else the first member, else None"""
+    return next((m for m in members if m['isGuardian']), members[0] if members else None)
+
+
+def _family_payload(house, members, obligations):
+    guardian = _guardian(members) or {}
+    payload = {
+        'docId': house['firebase_id'] or house['home_id'],
+        'houseId': house['home_id'],
+        'houseName': house['house_name'],
+        'guardianName': f"{guardian.get('name') or ''} {guardian.get('surname') or ''}".strip(),
+        'guardianDob': guardian['date_of_birth'].isoformat() if guardian.get('date_of_birth') else '',
+        'guardianAadhaarLast4': (guardian.get('adhar') or '')[-4:],
+        'members': [
+            {'member_id': m['member_id'], 'name': f"{m['name']} {m['surname'] or ''}".strip()}
+            for m in members
+        ],
+    }
+    # Only families with something outstanding carry the obligations list
+    if guardian and obligations.get(guardian['pk']):
+        payload['obligations'] = obligations[guardian['pk']]
+    return payload
+
+
+def family_payloads(houses=None, chunk_size=CHUNK_SIZE):
+    """Yield the sync payload of every house in ``houses`` (default: all), ordered by pk"""
+    houses = (houses if houses is not None else House.objects.all()).values(
+        'pk', 'home_id', 'firebase_id', 'house_name'
+    )
+    for chunk in _chunks(houses, chunk_size):
+        members = {}
+        for row in Member.objects.filter(house_id__in=[h['pk'] for h in chunk]).values(
+            'pk', 'house_id', 'member_id', 'name', 'surname', 'date_of_birth', 'adhar', 'isGuardian'
+        ).order_by('pk'):
+            members.setdefault(row['house_id'], []).append(row)
+
+        guardians = [
+            guardian['pk'] for guardian in (_guardian(members.get(h['pk'], [])) for h in chunk) if guardian
+        ]
+
+        obligations = {}
+        for member_pk, subcollection, amount in MemberObligation.objects.filter(
+            member_id__in=guardians, paid_status__in=PENDING_STATUSES
+        ).values_list('member_id', 'subcollection__name', 'amount').order_by('pk'):
+            obligations.setdefault(member_pk, []).append({'subcollection': subcollection, 'amount': str(amount)})
+
+        for house in chunk:
+            yield _family_payload(house, members.get(house['pk'], []), obligations)
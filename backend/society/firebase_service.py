@@ -1,7 +1,9 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+import threading
 from django.conf import settings
-from .models import AppSettings, House
+from django.db import connection
+from django.db.models import Q
+from .change_feed import current_watermark
+from .models import AppSettings, FamilyChange, House, Member, SyncCursor
 import json
 import logging
 
@@ -9,6 +11,15 @@ logger = logging.getLogger(__name__)
 
 _db = None
 
+FAMILIES_COLLECTION = 'families'
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+# Changes are collected for this many seconds before the background flush runs,
+# so a burst of edits to one family becomes a single write
+SYNC_DELAY = 2.0
+
 def get_firestore_db():
     global _db
     if _db:
@@ -41,6 +52,9 @@ def get_firestore_db():
         service_account_path = os.path.join(settings.BASE_DIR, 'serviceAccountKey.json')
         
         if os.path.exists(service_account_path):
+            # firebase_admin is only needed once a service account is configured
+            import firebase_admin
+            from firebase_admin import credentials, firestore
             if not firebase_admin._apps:
                 cred = credentials.Certificate(service_account_path)
                 firebase_admin.initialize_app(cred)
@@ -55,104 +69,332 @@ def get_firestore_db():
         logger.error(f"Failed to initialize Firebase: {e}")
         return None
 
-def sync_house_to_firebase(house_instance):
-    db = get_firestore_db()
-    if not db:
-        return False, "Firebase DB not initialized"
-    
-    try:
-        # If we have a firebase_id, update that document
-        # If not, we might want to create one? Or wait for linking?
-        
-        if not house_instance.firebase_id:
-            # If no ID, we can't sync TO an existing document.
-            # We could create a new one, but that might duplicate if one exists but isn't linked.
-            return False, "No Linked Firebase ID"
+def house_payload(house):
+    """Firestore family fields for a House (or a values() dict with the same keys)"""
+    get = house.get if isinstance(house, dict) else lambda field: getattr(house, field)
+    # Mapping Django House -> Firestore Family
+    # We don't overwrite members here usually, unless we want to do a full sync
+    return {
+        'houseName': get('house_name'),
+        'familyName': get('family_name'),
+        'locationName': get('location_name'),
+        'address': get('address'),
+    }
 
-        doc_ref = db.collection('families').document(house_instance.firebase_id)
-        
-        # Prepare data
-        # Mapping Django House -> Firestore Family
-        data = {
-            'houseName': house_instance.house_name,
-            'familyName': house_instance.family_name,
-            'locationName': house_instance.location_name,
-            'address': house_instance.address,
-            # We don't overwrite members here usually, unless we want to do a full sync
+
+# Members are stored in a map keyed by Django member_id, so one member change is a
+# single field-path write ('membersById.1001') that leaves the other entries alone
+MEMBERS_MAP = 'membersById'
+MEMBER_FIELDS = ('member_id', 'name', 'surname', 'phone', 'date_of_birth', 'isGuardian', 'married_to_id')
+
+
+def member_entry(member):
+    """Firestore entry for a member values() row"""
+    return {
+        'memberId': member['member_id'],
+        'fullName': member['name'],
+        'surname': member['surname'],
+        'dob': str(member['date_of_birth']),
+        'phone': member['phone'],
+        'isMarried': bool(member['married_to_id']),
+        'role': 'member',
+    }
+
+
+def member_fields(member):
+    """Field-path updates for one member of a family document that already has the keyed map"""
+    if member['isGuardian']:
+        # Guardian fields are written by path so the rest of the map is kept
+        return {
+            'guardian.memberId': member['member_id'],
+            'guardian.fullName': member['name'],
+            'guardian.surname': member['surname'],
+            'guardian.phone': member['phone'],
+            'guardian.dob': str(member['date_of_birth']),
         }
-        
-        doc_ref.update(data)
-        return True, "Synced House"
-    except Exception as e:
-        return False, str(e)
+    return {f"{MEMBERS_MAP}.{member['member_id']}": member_entry(member)}
+
+
+def keyed_members(doc_data, members, delete_field):
+    """
+    Convert a family document from the legacy ``members`` array to the keyed map.
+    Array entries are matched to Django members by name and surname so fields
+    written by other clients survive; ``members`` are all members of the house.
+    The array itself is removed with ``delete_field`` (firestore.DELETE_FIELD).
+    """
+    legacy = {
+        (entry.get('fullName'), entry.get('surname')): entry
+        for entry in doc_data.get('members', [])
+    }
+    fields = {}
+    entries = {}
+    for member in members:
+        if member['isGuardian']:
+            fields.update(member_fields(member))
+            continue
+        entry = dict(legacy.get((member['name'], member['surname']), {}))
+        entry.update(member_entry(member))
+        entries[member['member_id']] = entry
+    fields[MEMBERS_MAP] = entries
+    fields['members'] = delete_field
+    return fields
+
+
+class FirestoreSyncEngine:
+    """
+    Coalescing writer for the Firestore 'families' documents.
+
+    ``enqueue_house`` / ``enqueue_member`` only remember primary keys. ``flush``
+    loads the current rows, reads every touched family document with one
+    get_all call, merges all pending changes per document into a single update
+    and commits the updates in WriteBatches of up to MAX_BATCH_WRITES. Member
+    changes are field-path writes into the MEMBERS_MAP entry of that member;
+    members that left the family (deleted, moved to another house, or promoted
+    to guardian) have their entry removed with DELETE_FIELD. With a
+    ``delay`` the flush runs on a timer thread shortly after the first change, so
+    request threads never wait on Firestore; with ``delay=None`` callers flush
+    themselves. ``client_factory`` returns the Firestore client (or None when
+    sync is disabled) and can be swapped for a fake in tests, together with
+    the ``delete_field`` sentinel (firestore.DELETE_FIELD by default).
+
+    The queue itself lives in memory. A successful flush records the FamilyChange
+    watermark in the SyncCursor named ``cursor_name``, and ``recover`` (run when
+    the process starts) queues every family changed after it, so changes that
+    were pending when a previous process stopped are not lost.
+    """
+
+    def __init__(self, client_factory=None, delay=SYNC_DELAY, batch_limit=MAX_BATCH_WRITES, delete_field=None,
+                 cursor_name='firestore'):
+        self.client_factory = client_factory or get_firestore_db
+        self.delay = delay
+        self.batch_limit = batch_limit
+        self._delete_field = delete_field
+        self.cursor_name = cursor_name
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._houses = set()
+        self._members = set()
+        self._removals = set()
+        self._families = set()
+        self._timer = None
+
+    @property
+    def delete_field(self):
+        if self._delete_field is None:
+            # firebase_admin is only needed once a flush actually has a client
+            from firebase_admin import firestore
+            self._delete_field = firestore.DELETE_FIELD
+        return self._delete_field
+
+    def enqueue_house(self, house_pk):
+        with self._lock:
+            self._houses.add(house_pk)
+            self._schedule()
+
+    def enqueue_member(self, member_pk):
+        with self._lock:
+            self._members.add(member_pk)
+            self._schedule()
+
+    def enqueue_member_removal(self, house_pk, member_id):
+        """Remove ``member_id`` from the family document of ``house_pk`` (member deleted or moved out)"""
+        with self._lock:
+            self._removals.add((house_pk, member_id))
+            self._schedule()
+
+    def enqueue_family(self, house_pk):
+        """Re-send a whole family: the house, all its members, and removal of map entries for members it lost"""
+        with self._lock:
+            self._families.add(house_pk)
+            self._schedule()
+
+    def pending(self):
+        with self._lock:
+            return len(self._houses) + len(self._members) + len(self._removals) + len(self._families)
+
+    def recover(self):
+        """
+        Queue every family changed after the last successful flush; returns how
+        many. The first run only starts tracking from the current watermark.
+        """
+        cursor, created = SyncCursor.objects.get_or_create(
+            name=self.cursor_name, defaults={'seq': current_watermark()}
+        )
+        if created:
+            return 0
+        house_pks = list(
+            FamilyChange.objects.filter(seq__gt=cursor.seq, deleted=False).values_list('house_id', flat=True)
+        )
+        for house_pk in house_pks:
+            self.enqueue_family(house_pk)
+        return len(house_pks)
+
+    def _schedule(self):
+        if self.delay is None or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.delay, self._run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Firestore sync failed: {e}")
+        finally:
+            # The timer thread opened its own database connection
+            connection.close()
+
+    def _take(self):
+        with self._lock:
+            taken = self._houses, self._members, self._removals, self._families
+            self._houses, self._members, self._removals, self._families = set(), set(), set(), set()
+        return taken
+
+    def _requeue(self, houses, members, removals, families):
+        """Put back the changes of a failed flush, merged with anything enqueued since"""
+        with self._lock:
+            self._houses |= houses
+            self._members |= members
+            self._removals |= removals
+            self._families |= families
+            self._schedule()
+
+    def flush(self):
+        """
+        Write all pending changes; returns a summary dict. If anything fails the
+        taken changes are queued again (the writes are idempotent, so batches
+        that did commit are simply repeated) and the error is raised.
+        """
+        with self._flush_lock:
+            # Everything committed up to here is either taken now or already sent
+            watermark = current_watermark()
+            house_pks, member_pks, removals, family_pks = taken = self._take()
+            result = {'documents': 0, 'batches': 0, 'missing': []}
+            if not any(taken):
+                return result
+            try:
+                db = self.client_factory()
+                if not db:
+                    # The cursor stays put, so recover() re-sends these once sync is enabled
+                    logger.info("Firebase DB not initialized; dropping pending sync")
+                    return result
+
+                updates = self._build_updates(db, house_pks, member_pks, removals, family_pks, result)
+                doc_ids = list(updates)
+                for start in range(0, len(doc_ids), self.batch_limit):
+                    batch = db.batch()
+                    for doc_id in doc_ids[start:start + self.batch_limit]:
+                        batch.update(db.collection(FAMILIES_COLLECTION).document(doc_id), updates[doc_id])
+                    batch.commit()
+                    result['batches'] += 1
+            except Exception:
+                self._requeue(*taken)
+                raise
+            SyncCursor.objects.filter(name=self.cursor_name, seq__lt=watermark).update(seq=watermark)
+            result['documents'] = len(doc_ids)
+            return result
+
+    def _build_updates(self, db, house_pks, member_pks, removals, family_pks, result):
+        houses = {
+            row['firebase_id']: row for row in House.objects.filter(
+                pk__in=house_pks | family_pks, firebase_id__isnull=False
+            ).exclude(firebase_id='').values('pk', 'firebase_id', 'house_name', 'family_name', 'location_name', 'address')
+        }
+        full_docs = {doc_id for doc_id, row in houses.items() if row['pk'] in family_pks}
+        members_by_doc = {}
+        for row in Member.objects.filter(
+            Q(pk__in=member_pks) | Q(house__in=family_pks), house__firebase_id__isnull=False
+        ).exclude(house__firebase_id='').values('house__firebase_id', *MEMBER_FIELDS).order_by('pk'):
+            members_by_doc.setdefault(row['house__firebase_id'], []).append(row)
+        removed_by_doc = {}
+        if removals:
+            doc_ids_by_house = dict(House.objects.filter(
+                pk__in={house_pk for house_pk, _ in removals}, firebase_id__isnull=False
+            ).exclude(firebase_id='').values_list('pk', 'firebase_id'))
+            for house_pk, member_id in removals:
+                if house_pk in doc_ids_by_house:
+                    removed_by_doc.setdefault(doc_ids_by_house[house_pk], set()).add(member_id)
+
+        doc_ids = list(dict.fromkeys([*houses, *members_by_doc, *removed_by_doc]))
+        if not doc_ids:
+            return {}
+        collection = db.collection(FAMILIES_COLLECTION)
+        snapshots = {snap.id: snap for snap in db.get_all([collection.document(doc_id) for doc_id in doc_ids])}
+
+        updates = {}
+        unkeyed = []
+        for doc_id in doc_ids:
+            snapshot = snapshots.get(doc_id)
+            if snapshot is None or not snapshot.exists:
+                result['missing'].append(doc_id)
+                continue
+            updates[doc_id] = house_payload(houses[doc_id]) if doc_id in houses else {}
+            if doc_id not in members_by_doc and doc_id not in removed_by_doc and doc_id not in full_docs:
+                continue
+            doc_data = snapshot.to_dict()
+            if MEMBERS_MAP not in doc_data:
+                unkeyed.append((doc_id, doc_data))
+                continue
+            departed = set(removed_by_doc.get(doc_id, ()))
+            if doc_id in full_docs:
+                # Every current member is written below; entries for anyone else are stale
+                departed |= set(doc_data[MEMBERS_MAP])
+            for member in members_by_doc.get(doc_id, []):
+                if member['isGuardian']:
+                    # A member promoted to guardian leaves the members map
+                    departed.add(member['member_id'])
+                else:
+                    departed.discard(member['member_id'])
+                updates[doc_id].update(member_fields(member))
+            for member_id in departed:
+                if member_id in doc_data[MEMBERS_MAP]:
+                    updates[doc_id][f"{MEMBERS_MAP}.{member_id}"] = self.delete_field
+
+        # Documents still holding only the legacy members array get the whole map once
+        # (built from the current members, so departures need no separate delete)
+        if unkeyed:
+            family_members = {}
+            for row in Member.objects.filter(
+                house__firebase_id__in=[doc_id for doc_id, _ in unkeyed]
+            ).values('house__firebase_id', *MEMBER_FIELDS).order_by('pk'):
+                family_members.setdefault(row['house__firebase_id'], []).append(row)
+            for doc_id, doc_data in unkeyed:
+                updates[doc_id].update(keyed_members(doc_data, family_members.get(doc_id, []), self.delete_field))
+        return updates
+
+
+sync_engine = FirestoreSyncEngine()
+
+
+# The wrappers below are called from society.signals after every House/Member
+# save or delete commits
+
+
+def sync_house_to_firebase(house_instance):
+    """Queue a house for the background Firestore sync"""
+    if not house_instance.firebase_id:
+        # If no ID, we can't sync TO an existing document.
+        # We could create a new one, but that might duplicate if one exists but isn't linked.
+        return False, "No Linked Firebase ID"
+    sync_engine.enqueue_house(house_instance.pk)
+    return True, "Queued House"
+
 
 def sync_member_to_firebase(member_instance):
-    # This is trickier because members are inside the 'families' document array
-    db = get_firestore_db()
-    if not db:
-        return False, "Firebase DB not initialized"
-        
-    try:
-        house = member_instance.house
-        if not house or not house.firebase_id:
-            return False, "Member not assigned to a linked House"
-            
-        doc_ref = db.collection('families').document(house.firebase_id)
-        
-        # Transactional update is best here to avoid race conditions with array
-        # But for simplicity: read, modify, write
-        
-        doc = doc_ref.get()
-        if not doc.exists:
-            return False, "Firebase Document not found"
-            
-        doc_data = doc.to_dict()
-        guardian = doc_data.get('guardian', {})
-        members_list = doc_data.get('members', [])
-        
-        # Check if this member is the guardian
-        if member_instance.isGuardian:
-            # Update guardian fields
-            guardian.update({
-                'fullName': member_instance.name,
-                'surname': member_instance.surname,
-                'phone': member_instance.phone,
-                'dob': str(member_instance.date_of_birth),
-                # ... other fields
-            })
-            doc_ref.update({'guardian': guardian})
-        else:
-            # Update member in array
-            # We need to find the member in the array. 
-            # We assume 'name' matches? Or we need a stable ID in Firestore?
-            # Creating a map is better, but the structure is an array.
-            
-            # Strategy: Look for name+surname match?
-            found = False
-            for i, m in enumerate(members_list):
-                # Simple matching logic
-                if m.get('fullName') == member_instance.name and m.get('surname') == member_instance.surname:
-                    members_list[i].update({
-                        'dob': str(member_instance.date_of_birth),
-                        'phone': member_instance.phone,
-                        'isMarried': True if member_instance.married_to else False,
-                        # ...
-                    })
-                    found = True
-                    break
-            
-            if not found:
-                 # Add new?
-                 members_list.append({
-                     'fullName': member_instance.name,
-                     'surname': member_instance.surname,
-                     'dob': str(member_instance.date_of_birth),
-                     'role': 'member'
-                 })
-            
-            doc_ref.update({'members': members_list})
-            
-        return True, "Synced Member"
-        
-    except Exception as e:
-        return False, str(e)
+    """Queue a member for the background Firestore sync (members live inside the family document)"""
+    house = member_instance.house
+    if not house or not house.firebase_id:
+        return False, "Member not assigned to a linked House"
+    sync_engine.enqueue_member(member_instance.pk)
+    return True, "Queued Member"
+
+
+def remove_member_from_firebase(member_id, house_instance):
+    """Queue removal of a deleted member, or one that moved out of ``house_instance``, from its family document"""
+    if not house_instance or not house_instance.firebase_id:
+        return False, "House not linked"
+    sync_engine.enqueue_member_removal(house_instance.pk, member_id)
+    return True, "Queued Member Removal"
@@ -0,0 +1,28 @@
+"""
+Background job kinds (see society.jobs). Imported by SocietyConfig.ready().
+"""
+import os
+from django.conf import settings
+from . import data_transfer
+from .firebase_service import sync_engine
+from .jobs import register
+from .obligation_service import bulk_create_obligations
+
+
+@register('export_data')
+def export_data(params, progress):
+    os.makedirs(settings.JOBS_DIR, exist_ok=True)
+    zip_path = os.path.join(settings.JOBS_DIR, params['filename'])
+    files = data_transfer.write_export(zip_path, progress)
+    return {'file': params['filename'], 'media_files': files, 'size': os.path.getsize(zip_path)}
+
+
+@register('bulk_create_obligations')
+def create_obligations(params, progress):
+    created, errors = bulk_create_obligations(params.get('obligations', []))
+    return {'total_created': len(created), 'total_errors': len(errors), 'errors': errors}
+
+
+@register('firebase_sync')
+def firebase_sync(params, progress):
+    return sync_engine.flush()
@@ -0,0 +1,107 @@
+"""
+In-process background jobs.
+
+Long operations (export, bulk obligation creation, Firebase sync) are
+stored as Job rows and executed by a small thread pool inside the Django
+process, so they need neither Redis nor Celery and work in the packaged
+single-exe build. ``submit()`` queues a job and returns at once; clients poll
+``/jobs/{id}/`` for status and progress.
+
+Handlers are registered per kind with ``@register('kind')`` and called as
+``handler(params, progress)``; ``progress(percent, message)`` updates the job
+row and the handler's return value is stored as the job result. Audit entries
+a handler records are written together when it finishes. The runner is
+started on the first request (see society.apps); jobs left queued or running by
+a previous process are queued again then.
+
+Importing data is deliberately not a job: it replaces the database file that
+holds the Job table itself, so it runs synchronously in its request.
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from . import audit
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_executor = None
+_started = False
+_lock = threading.Lock()
+
+
+def register(kind):
+    """Decorator registering ``handler(params, progress)`` for jobs of ``kind``"""
+    def decorator(handler):
+        _handlers[kind] = handler
+        return handler
+    return decorator
+
+
+def kinds():
+    return sorted(_handlers)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'JOB_WORKERS', 2), thread_name_prefix='job'
+            )
+        return _executor
+
+
+def submit(kind, params=None):
+    """Queue a job of ``kind``; it starts once the surrounding transaction commits"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job.objects.create(kind=kind, params=params or {})
+    transaction.on_commit(lambda: _get_executor().submit(_execute, job.pk))
+    return job
+
+
+def start():
+    """Start the runner once per process, re-queueing work a previous process left behind"""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    # A job still marked running was interrupted by a restart; run it again
+    Job.objects.filter(status='running').update(status='queued', started_at=None, progress=0, message='')
+    for pk in Job.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True):
+        _get_executor().submit(_execute, pk)
+
+
+def _progress(pk):
+    def report(percent, message=''):
+        Job.objects.filter(pk=pk).update(progress=max(0, min(int(percent), 100)), message=message[:255])
+    return report
+
+
+def _execute(pk):
+    try:
+        # Claim the job; another worker (or a duplicate submit) may already have it
+        if not Job.objects.filter(pk=pk, status='queued').update(status='running', started_at=timezone.now()):
+            return
+        job = Job.objects.get(pk=pk)
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        with audit.buffer():
+            result = handler(job.params, _progress(pk))
+        Job.objects.filter(pk=pk).update(
+            status='succeeded', progress=100, result=result, finished_at=timezone.now()
+        )
+    except Exception as e:
+        logger.error(f"Job {pk} failed: {e}\n{traceback.format_exc()}")
+        Job.objects.filter(pk=pk).update(status='failed', error=str(e), finished_at=timezone.now())
+    finally:
+        # Worker threads open their own database connection
+        connection.close()
@@ -0,0 +1,209 @@
+"""
+Genealogy queries over Member.father / Member.mother.
+
+Ancestor/descendant relationships are precomputed in the MemberAncestry closure
+table, so "all descendants of X", "are A and B related" and the family tree are
+indexed lookups rather than recursive walks. The table is refreshed for the
+affected subtree whenever a member's parents change through save() or delete()
+(see society.signals) and can be rebuilt from scratch with
+``manage.py rebuild_kinship``.
+
+queryset.update() and bulk_create send no signals: code that changes father or
+mother that way must call ``refresh_lineage()`` for each changed member, or
+``rebuild()`` afterwards. Importing a dataset rebuilds the table.
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from .models import Member, MemberAncestry
+
+MAX_TREE_DEPTH = 10
+BULK_BATCH_SIZE = 500
+
+
+def compute_ancestry(parents, outside_ancestry=None):
+    """
+    Compute {member: {ancestor: depth}} for every member in ``parents``.
+
+    ``parents`` maps member pk -> (father pk, mother pk) for the members being
+    computed. Parents outside that set are looked up in ``outside_ancestry``
+    (their own {ancestor: depth} maps). Each member includes itself at depth 0;
+    parent links that would form a cycle are ignored.
+    """
+    outside_ancestry = outside_ancestry or {}
+    ancestry = {}
+    visiting = set()
+
+    def visit(pk):
+        # Iterative post-order walk so long lineages cannot hit the recursion limit
+        stack = [pk]
+        while stack:
+            current = stack[-1]
+            if current in ancestry:
+                stack.pop()
+                continue
+            pending = [p for p in parents[current] if p in parents and p not in ancestry and p not in visiting]
+            if pending and current not in visiting:
+                visiting.add(current)
+                stack.extend(pending)
+                continue
+            visiting.discard(current)
+            stack.pop()
+            result = {current: 0}
+            for parent in parents[current]:
+                if not parent:
+                    continue
+                if parent in parents:
+                    source = ancestry.get(parent)
+                    if source is None:
+                        continue  # Cycle in the parent links
+                else:
+                    source = outside_ancestry.get(parent, {parent: 0})
+                for ancestor, depth in source.items():
+                    if ancestor == current:
+                        continue
+                    if ancestor not in result or depth + 1 < result[ancestor]:
+                        result[ancestor] = depth + 1
+            ancestry[current] = result
+
+    for pk in parents:
+        visit(pk)
+    return ancestry
+
+
+def _write_ancestry(ancestry):
+    MemberAncestry.objects.bulk_create([
+        MemberAncestry(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+        for descendant, ancestors in ancestry.items()
+        for ancestor, depth in ancestors.items()
+    ], batch_size=BULK_BATCH_SIZE)
+
+
+def refresh_lineage(member_pk):
+    """Recompute the closure rows of a member and all of its descendants"""
+    with transaction.atomic():
+        subtree = set(MemberAncestry.objects.filter(ancestor_id=member_pk).values_list('descendant_id', flat=True))
+        subtree.add(member_pk)
+        parents = {
+            pk: (father_id, mother_id)
+            for pk, father_id, mother_id in Member.objects.filter(id__in=subtree).values_list('id', 'father_id', 'mother_id')
+        }
+
+        outside_parents = {p for pair in parents.values() for p in pair if p and p not in parents}
+        outside_ancestry = defaultdict(dict)
+        for ancestor, descendant, depth in MemberAncestry.objects.filter(
+            descendant_id__in=outside_parents
+        ).values_list('ancestor_id', 'descendant_id', 'depth'):
+            outside_ancestry[descendant][ancestor] = depth
+
+        MemberAncestry.objects.filter(descendant_id__in=subtree).delete()
+        _write_ancestry(compute_ancestry(parents, outside_ancestry))
+
+
+def rebuild():
+    """Rebuild the whole closure table from Member.father / Member.mother"""
+    parents = {
+        pk: (father_id, mother_id)
+        for pk, father_id, mother_id in Member.objects.values_list('id', 'father_id', 'mother_id')
+    }
+    ancestry = compute_ancestry(parents)
+    with transaction.atomic():
+        MemberAncestry.objects.all().delete()
+        _write_ancestry(ancestry)
+    return sum(len(ancestors) for ancestors in ancestry.values())
+
+
+def ancestors(member, max_depth=None):
+    """Ancestors of ``member`` as a queryset of MemberAncestry rows, nearest first"""
+    links = MemberAncestry.objects.filter(descendant=member, depth__gt=0)
+    if max_depth is not None:
+        links = links.filter(depth__lte=max_depth)
+    return links.select_related('ancestor').order_by('depth', 'ancestor_id')
+
+
+def descendants(member, max_depth=None):
+    """Descendants of ``member`` as a queryset of MemberAncestry rows, nearest first"""
+    links = MemberAncestry.objects.filter(ancestor=member, depth__gt=0)
+    if max_depth is not None:
+        links = links.filter(depth__lte=max_depth)
+    return links.select_related('descendant').order_by('depth', 'descendant_id')
+
+
+def common_ancestors(member, other):
+    """
+    Ancestors shared by two members, nearest first, as (ancestor pk, depth from
+    member, depth from other). A member who is an ancestor of the other counts
+    as a common ancestor at depth 0 on their own side.
+    """
+    return list(
+        MemberAncestry.objects.filter(descendant=member, ancestor__descendant_links__descendant=other)
+        .annotate(other_depth=F('ancestor__descendant_links__depth'))
+        .order_by(F('depth') + F('other_depth'), 'ancestor_id')
+        .values_list('ancestor_id', 'depth', 'other_depth')
+    )
+
+
+def family_tree(member, up=2, down=2):
+    """
+    Return the family tree around ``member`` as a compact node/edge list.
+
+    Ancestors up to ``up`` generations and descendants down to ``down`` generations
+    come from the closure table; spouses of every node are added on the same
+    generation. Nodes carry a ``generation`` relative to ``member`` (negative for
+    ancestors).
+    """
+    up = max(0, min(up, MAX_TREE_DEPTH))
+    down = max(0, min(down, MAX_TREE_DEPTH))
+
+    generations = {member.pk: 0}
+    generations.update({
+        pk: -depth for pk, depth in MemberAncestry.objects.filter(
+            descendant=member, depth__gt=0, depth__lte=up
+        ).values_list('ancestor_id', 'depth')
+    })
+    for pk, depth in MemberAncestry.objects.filter(
+        ancestor=member, depth__gt=0, depth__lte=down
+    ).values_list('descendant_id', 'depth'):
+        generations.setdefault(pk, depth)
+
+    fields = ('id', 'member_id', 'name', 'surname', 'gender', 'status', 'date_of_birth',
+              'father_id', 'mother_id', 'married_to_id', 'house__home_id')
+    rows = {row['id']: row for row in Member.objects.filter(id__in=generations).values(*fields)}
+
+    # Spouses sit on the same generation as the member they are married to
+    spouse_ids = {
+        row['married_to_id']: generations[pk] for pk, row in rows.items()
+        if row['married_to_id'] and row['married_to_id'] not in rows
+    }
+    if spouse_ids:
+        for row in Member.objects.filter(id__in=spouse_ids).values(*fields):
+            rows[row['id']] = row
+            generations[row['id']] = spouse_ids[row['id']]
+
+    nodes = []
+    edges = []
+    spouse_pairs = set()
+    for pk, row in rows.items():
+        nodes.append({
+            'id': row['member_id'],
+            'name': row['name'],
+            'surname': row['surname'],
+            'gender': row['gender'],
+            'status': row['status'],
+            'date_of_birth': row['date_of_birth'],
+            'house': row['house__home_id'],
+            'generation': generations[pk],
+        })
+        for relation in ('father', 'mother'):
+            parent_pk = row[f'{relation}_id']
+            if parent_pk in rows:
+                edges.append({'from': rows[parent_pk]['member_id'], 'to': row['member_id'], 'type': relation})
+        spouse_pk = row['married_to_id']
+        if spouse_pk in rows:
+            pair = frozenset((pk, spouse_pk))
+            if pair not in spouse_pairs:
+                spouse_pairs.add(pair)
+                edges.append({'from': row['member_id'], 'to': rows[spouse_pk]['member_id'], 'type': 'spouse'})
+
+    nodes.sort(key=lambda node: (node['generation'], node['id']))
+    return {'root': member.member_id, 'up': up, 'down': down, 'nodes': nodes, 'edges': edges}
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from society import retention
+
+
+class Command(BaseCommand):
+    help = "Compact synced recent actions older than the retention period into daily summaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Retention period in days (default: RECENT_ACTION_RETENTION_DAYS)")
+        parser.add_argument('--archive', nargs='?', const=str(settings.RECENT_ACTION_ARCHIVE), default=None,
+                            help="Copy the compacted rows to this SQLite file first (default: RECENT_ACTION_ARCHIVE)")
+        parser.add_argument('--vacuum', action='store_true', help="VACUUM the database afterwards")
+
+    def handle(self, *args, **options):
+        removed, summaries = retention.compact(options['days'], options['archive'])
+        if options['archive'] and removed:
+            self.stdout.write(f"Archived {removed} actions to {options['archive']}")
+        if options['vacuum']:
+            retention.vacuum()
+        self.stdout.write(self.style.SUCCESS(f"Compacted {removed} actions into {summaries} daily summaries"))
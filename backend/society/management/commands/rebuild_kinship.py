@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from society import kinship
+
+
+class Command(BaseCommand):
+    help = "Rebuild the member ancestry closure table from Member.father / Member.mother"
+
+    def handle(self, *args, **options):
+        rows = kinship.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt kinship closure table ({rows} rows)"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from society import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters from scratch (run periodically to correct any drift)"
+
+    def handle(self, *args, **options):
+        values = counters.reconcile()
+        for key, value in values.items():
+            self.stdout.write(f"{key}: {value}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {len(values)} counters"))
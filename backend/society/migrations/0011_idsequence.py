@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:55
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.db.models.functions import Cast
+
+
+def seed_sequences(apps, schema_editor):
+    # Start each sequence after the highest numeric ID already in use
+    IdSequence = apps.get_model('society', 'IdSequence')
+    sources = {
+        'house': (apps.get_model('society', 'House'), 'home_id'),
+        'member': (apps.get_model('society', 'Member'), 'member_id'),
+    }
+    for name, (model, field) in sources.items():
+        numeric_ids = model.objects.filter(**{f'{field}__regex': r'^[0-9]+$'})
+        max_id = numeric_ids.aggregate(max_id=Max(Cast(field, models.BigIntegerField())))['max_id']
+        IdSequence.objects.create(name=name, last_value=max(max_id or 0, 1000))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('society', '0010_appsettings_firebase_enabled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.BigIntegerField(default=1000)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,110 @@
+from django.db import migrations
+from django.db.utils import DatabaseError
+
+# Frozen copy of the FTS5 schema as of this migration; society.search_index
+# keeps the live definitions (and re-creates missing triggers after migrate)
+
+TABLES = {
+    'society_member_fts': """CREATE VIRTUAL TABLE IF NOT EXISTS society_member_fts USING fts5(
+        member_id, name, surname, house_name,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'
+    )""",
+    'society_house_fts': """CREATE VIRTUAL TABLE IF NOT EXISTS society_house_fts USING fts5(
+        house_name, family_name, location_name,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'
+    )""",
+}
+
+TRIGGERS = {
+    'society_member_fts_insert': """CREATE TRIGGER society_member_fts_insert AFTER INSERT ON society_member BEGIN
+        INSERT INTO society_member_fts (rowid, member_id, name, surname, house_name)
+        VALUES (new.id, new.member_id, new.name, new.surname,
+                (SELECT house_name FROM society_house WHERE id = new.house_id));
+    END""",
+    'society_member_fts_update': """CREATE TRIGGER society_member_fts_update
+    AFTER UPDATE OF member_id, name, surname, house_id ON society_member BEGIN
+        DELETE FROM society_member_fts WHERE rowid = old.id;
+        INSERT INTO society_member_fts (rowid, member_id, name, surname, house_name)
+        VALUES (new.id, new.member_id, new.name, new.surname,
+                (SELECT house_name FROM society_house WHERE id = new.house_id));
+    END""",
+    'society_member_fts_delete': """CREATE TRIGGER society_member_fts_delete AFTER DELETE ON society_member BEGIN
+        DELETE FROM society_member_fts WHERE rowid = old.id;
+    END""",
+    'society_house_fts_insert': """CREATE TRIGGER society_house_fts_insert AFTER INSERT ON society_house BEGIN
+        INSERT INTO society_house_fts (rowid, house_name, family_name, location_name)
+        VALUES (new.id, new.house_name, new.family_name, new.location_name);
+    END""",
+    'society_house_fts_update': """CREATE TRIGGER society_house_fts_update
+    AFTER UPDATE OF house_name, family_name, location_name ON society_house BEGIN
+        DELETE FROM society_house_fts WHERE rowid = old.id;
+        INSERT INTO society_house_fts (rowid, house_name, family_name, location_name)
+        VALUES (new.id, new.house_name, new.family_name, new.location_name);
+    END""",
+    'society_house_fts_rename': """CREATE TRIGGER society_house_fts_rename AFTER UPDATE OF house_name ON society_house
+    WHEN old.house_name IS NOT new.house_name BEGIN
+        UPDATE society_member_fts SET house_name = new.house_name
+        WHERE rowid IN (SELECT id FROM society_member WHERE house_id = new.id);
+    END""",
+    'society_house_fts_delete': """CREATE TRIGGER society_house_fts_delete AFTER DELETE ON society_house BEGIN
+        DELETE FROM society_house_fts WHERE rowid = old.id;
+    END""",
+}
+
+REBUILD_SQL = [
+    "DELETE FROM society_member_fts",
+    """INSERT INTO society_member_fts (rowid, member_id, name, surname, house_name)
+        SELECT m.id, m.member_id, m.name, m.surname, h.house_name
+        FROM society_member m LEFT JOIN society_house h ON h.id = m.house_id""",
+    "DELETE FROM society_house_fts",
+    """INSERT INTO society_house_fts (rowid, house_name, family_name, location_name)
+        SELECT id, house_name, family_name, location_name FROM society_house""",
+]
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE temp.society_fts5_probe USING fts5(value)")
+            cursor.execute("DROP TABLE temp.society_fts5_probe")
+        return True
+    except DatabaseError:
+        return False
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if not fts5_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for sql in TABLES.values():
+            cursor.execute(sql)
+        for name, sql in TRIGGERS.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(sql)
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        for table in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('society', '0012_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of society.kinship.compute_ancestry as of this migration
+def compute_ancestry(parents, outside_ancestry=None):
+    """
+    Compute {member: {ancestor: depth}} for every member in ``parents``.
+
+    ``parents`` maps member pk -> (father pk, mother pk) for the members being
+    computed. Parents outside that set are looked up in ``outside_ancestry``
+    (their own {ancestor: depth} maps). Each member includes itself at depth 0;
+    parent links that would form a cycle are ignored.
+    """
+    outside_ancestry = outside_ancestry or {}
+    ancestry = {}
+    visiting = set()
+
+    def visit(pk):
+        # Iterative post-order walk so long lineages cannot hit the recursion limit
+        stack = [pk]
+        while stack:
+            current = stack[-1]
+            if current in ancestry:
+                stack.pop()
+                continue
+            pending = [p for p in parents[current] if p in parents and p not in ancestry and p not in visiting]
+            if pending and current not in visiting:
+                visiting.add(current)
+                stack.extend(pending)
+                continue
+            visiting.discard(current)
+            stack.pop()
+            result = {current: 0}
+            for parent in parents[current]:
+                if not parent:
+                    continue
+                if parent in parents:
+                    source = ancestry.get(parent)
+                    if source is None:
+                        continue  # Cycle in the parent links
+                else:
+                    source = outside_ancestry.get(parent, {parent: 0})
+                for ancestor, depth in source.items():
+                    if ancestor == current:
+                        continue
+                    if ancestor not in result or depth + 1 < result[ancestor]:
+                        result[ancestor] = depth + 1
+            ancestry[current] = result
+
+    for pk in parents:
+        visit(pk)
+    return ancestry
+
+
+def build_closure(apps, schema_editor):
+    Member = apps.get_model('society', 'Member')
+    MemberAncestry = apps.get_model('society', 'MemberAncestry')
+    parents = {
+        pk: (father_id, mother_id)
+        for pk, father_id, mother_id in Member.objects.values_list('id', 'father_id', 'mother_id')
+    }
+    MemberAncestry.objects.bulk_create([
+        MemberAncestry(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+        for descendant, ancestors in compute_ancestry(parents).items()
+        for ancestor, depth in ancestors.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('society', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberAncestry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='society.member')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='society.member')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='society_mem_descend_7f8122_idx'), models.Index(fields=['ancestor', 'depth'], name='society_mem_ancesto_f38334_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('society', '0014_memberancestry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recentaction',
+            index=models.Index(fields=['timestamp'], name='recentaction_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recentaction',
+            index=models.Index(fields=['is_sync_pending', 'timestamp'], name='recentaction_sync_ts_idx'),
+        ),
+    ]
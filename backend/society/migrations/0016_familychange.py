@@ -0,0 +1,116 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+# Frozen copy of the change-feed triggers as of this migration; society.change_feed
+# keeps the live definitions (and re-creates missing triggers after migrate)
+TRIGGERS = {
+    'society_house_changes_insert': """CREATE TRIGGER society_house_changes_insert
+    AFTER INSERT ON society_house BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = new.id
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_house_changes_update': """CREATE TRIGGER society_house_changes_update
+    AFTER UPDATE ON society_house BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = new.id
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_house_changes_delete': """CREATE TRIGGER society_house_changes_delete
+    AFTER DELETE ON society_house BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        VALUES (old.id, COALESCE(NULLIF(old.firebase_id, ''), old.home_id),
+                (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 1)
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = 1;
+    END""",
+    'society_member_changes_insert': """CREATE TRIGGER society_member_changes_insert
+    AFTER INSERT ON society_member BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = new.house_id
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_member_changes_update': """CREATE TRIGGER society_member_changes_update
+    AFTER UPDATE ON society_member BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = new.house_id
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_member_changes_move': """CREATE TRIGGER society_member_changes_move
+    AFTER UPDATE OF house_id ON society_member WHEN old.house_id IS NOT new.house_id BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = old.house_id
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_member_changes_delete': """CREATE TRIGGER society_member_changes_delete
+    AFTER DELETE ON society_member BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = old.house_id
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_obligation_changes_insert': """CREATE TRIGGER society_obligation_changes_insert
+    AFTER INSERT ON society_memberobligation BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = (SELECT house_id FROM society_member WHERE id = new.member_id)
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_obligation_changes_update': """CREATE TRIGGER society_obligation_changes_update
+    AFTER UPDATE ON society_memberobligation BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = (SELECT house_id FROM society_member WHERE id = new.member_id)
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+    'society_obligation_changes_delete': """CREATE TRIGGER society_obligation_changes_delete
+    AFTER DELETE ON society_memberobligation BEGIN
+        INSERT INTO society_familychange (house_id, doc_id, seq, deleted)
+        SELECT id, COALESCE(NULLIF(firebase_id, ''), home_id), (SELECT COALESCE(MAX(seq), 0) + 1 FROM society_familychange), 0
+        FROM society_house WHERE id = (SELECT house_id FROM society_member WHERE id = old.member_id)
+        ON CONFLICT (house_id) DO UPDATE SET seq = excluded.seq, doc_id = excluded.doc_id, deleted = excluded.deleted;
+    END""",
+}
+
+
+def create_change_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name, sql in TRIGGERS.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(sql)
+
+
+def drop_change_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('society', '0015_recentaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FamilyChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('house_id', models.BigIntegerField(unique=True)),
+                ('doc_id', models.CharField(max_length=100)),
+                ('seq', models.BigIntegerField(db_index=True)),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.RunPython(create_change_triggers, drop_change_triggers),
+    ]
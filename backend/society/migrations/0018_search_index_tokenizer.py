@@ -0,0 +1,71 @@
+from django.db import migrations
+from django.db.utils import DatabaseError
+
+# Frozen copies of the FTS5 tokenizers as of this migration; society.search_index
+# keeps the live definitions. Counting combining marks as word characters keeps
+# Malayalam words whole instead of splitting them at every vowel sign.
+OLD_TOKENIZE = "'unicode61 remove_diacritics 2'"
+NEW_TOKENIZE = '''"unicode61 remove_diacritics 2 categories 'L* N* Co M*'"'''
+
+TABLES = {
+    'society_member_fts': """CREATE VIRTUAL TABLE society_member_fts USING fts5(
+        member_id, name, surname, house_name,
+        tokenize = {tokenize}, prefix = '1 2 3'
+    )""",
+    'society_house_fts': """CREATE VIRTUAL TABLE society_house_fts USING fts5(
+        house_name, family_name, location_name,
+        tokenize = {tokenize}, prefix = '1 2 3'
+    )""",
+}
+
+REBUILD_SQL = [
+    """INSERT INTO society_member_fts (rowid, member_id, name, surname, house_name)
+        SELECT m.id, m.member_id, m.name, m.surname, h.house_name
+        FROM society_member m LEFT JOIN society_house h ON h.id = m.house_id""",
+    """INSERT INTO society_house_fts (rowid, house_name, family_name, location_name)
+        SELECT id, house_name, family_name, location_name FROM society_house""",
+]
+
+
+def tokenizer_supported(connection, tokenize):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE VIRTUAL TABLE temp.society_fts5_probe USING fts5(value, tokenize = {tokenize})")
+            cursor.execute("DROP TABLE temp.society_fts5_probe")
+        return True
+    except DatabaseError:
+        return False
+
+
+def recreate_search_index(connection, tokenize):
+    """Rebuild existing FTS tables with ``tokenize``; the triggers feeding them are kept"""
+    if connection.vendor != 'sqlite':
+        return
+    existing = set(connection.introspection.table_names())
+    if not set(TABLES) <= existing or not tokenizer_supported(connection, tokenize):
+        return
+    with connection.cursor() as cursor:
+        for table, sql in TABLES.items():
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(sql.format(tokenize=tokenize))
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+
+
+def keep_marks_in_words(apps, schema_editor):
+    recreate_search_index(schema_editor.connection, NEW_TOKENIZE)
+
+
+def split_words_at_marks(apps, schema_editor):
+    recreate_search_index(schema_editor.connection, OLD_TOKENIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('society', '0017_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_marks_in_words, split_words_at_marks),
+    ]
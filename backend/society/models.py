@@ -1,7 +1,163 @@
-from django.db import models, transaction
+from django.db import models, transaction, IntegrityError
 from django.core.validators import RegexValidator
-from django.core.exceptions import ValidationError
-from django.db.models import Max
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Max
+from django.db.models.functions import Cast, Greatest
+
+
+class IdSequence(models.Model):
+    """
+    Counter table backing the custom sequential IDs (House.home_id, Member.member_id).
+
+    Each row holds the last value handed out for one sequence. Reserving IDs is a
+    single ``UPDATE ... SET last_value = last_value + n`` which takes the row (or, on
+    SQLite, the database) write lock, so concurrent writers never receive the same
+    value and a bulk import can reserve a whole block in one round trip.
+    """
+    START_VALUE = 1001
+
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.BigIntegerField(default=START_VALUE - 1)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+    @classmethod
+    def reserve(cls, name, count=1):
+        """Reserve ``count`` consecutive IDs for ``name`` and return them as strings"""
+        if count < 1:
+            return []
+        with transaction.atomic():
+            updated = cls.objects.filter(name=name).update(last_value=F('last_value') + count)
+            if not updated:
+                cls._create_sequence(name)
+                cls.objects.filter(name=name).update(last_value=F('last_value') + count)
+            last_value = cls.objects.values_list('last_value', flat=True).get(name=name)
+        return [str(value) for value in range(last_value - count + 1, last_value + 1)]
+
+    @classmethod
+    def next_value(cls, name):
+        return cls.reserve(name, 1)[0]
+
+    @classmethod
+    def advance(cls, name, value):
+        """
+        Move ``name`` past an explicitly chosen ID so it is never handed out later.
+        One ``UPDATE ... SET last_value = MAX(last_value, value)``; non-numeric IDs
+        are outside the sequence and ignored.
+        """
+        value = str(value)
+        if not value.isdigit():
+            return
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(last_value=Greatest(F('last_value'), int(value))):
+                cls._create_sequence(name)
+                cls.objects.filter(name=name).update(last_value=Greatest(F('last_value'), int(value)))
+
+    @classmethod
+    def catch_up(cls):
+        """
+        Advance every sequence past the highest ID stored (e.g. after importing a
+        database). The sequence table must exist: a database file from an older
+        release is migrated first (see data_transfer.refresh_derived_data).
+        """
+        for name, (model, field) in SEQUENCE_SOURCES.items():
+            cls.advance(name, current_max_id(model, field))
+
+    @classmethod
+    def _create_sequence(cls, name):
+        """Create a missing sequence row, seeded from the numeric max of existing IDs"""
+        model, field = SEQUENCE_SOURCES[name]
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, last_value=current_max_id(model, field))
+        except IntegrityError:
+            # Another writer created the row first; its seed is just as good
+            pass
+
+
+def current_max_id(model, field):
+    """Return the highest numeric value stored in ``field``, compared as integers"""
+    numeric_ids = model.objects.filter(**{f'{field}__regex': r'^[0-9]+$'})
+    max_id = numeric_ids.aggregate(max_id=Max(Cast(field, models.BigIntegerField())))['max_id']
+    if max_id is None:
+        return IdSequence.START_VALUE - 1
+    return max(max_id, IdSequence.START_VALUE - 1)
+
+
+class TrackedFieldsMixin:
+    """
+    Remembers the database values of ``tracked_fields`` (attribute names, e.g.
+    'house_id') when an instance is loaded or saved, so change tracking can diff
+    an update without re-reading the row.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields are not in __dict__; tracked_old_values() fills them in if needed
+        instance._tracked_values = {
+            name: instance.__dict__[name] for name in cls.tracked_fields if name in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            saved = {self._meta.get_field(name).attname for name in update_fields}
+            names = [name for name in self.tracked_fields if name in saved]
+        else:
+            names = self.tracked_fields
+        values = getattr(self, '_tracked_values', {})
+        for name in names:
+            values[name] = self.tracked_value(name)
+        self._tracked_values = values
+
+    def tracked_value(self, name):
+        """Current value of a tracked field, normalized (e.g. date strings) like the snapshot"""
+        return self._meta.get_field(name).to_python(getattr(self, name))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # The row may have changed behind the snapshot (queryset.update()); re-snapshot
+        # the reloaded fields so the next save diffs against the current row
+        if fields is None:
+            refreshed = set(self.tracked_fields)
+        else:
+            refreshed = set()
+            for name in fields:
+                try:
+                    refreshed.add(self._meta.get_field(name).attname)
+                except FieldDoesNotExist:
+                    pass
+            refreshed &= set(self.tracked_fields)
+        values = {
+            name: value for name, value in (getattr(self, '_tracked_values', None) or {}).items()
+            if name not in refreshed
+        }
+        values.update({name: self.__dict__[name] for name in refreshed if name in self.__dict__})
+        self._tracked_values = values
+        self.load_tracked_values()
+
+    def tracked_old_values(self):
+        """Tracked values as they were before the current save; None for a new row"""
+        return getattr(self, '_tracked_values', None)
+
+    def load_tracked_values(self):
+        """
+        Fill in the snapshot for instances that were not loaded from the database
+        (or were loaded with deferred tracked fields). Only these need a read.
+        """
+        values = getattr(self, '_tracked_values', None)
+        if values is not None and len(values) == len(self.tracked_fields):
+            return
+        if not self.pk:
+            return
+        row = type(self)._base_manager.filter(pk=self.pk).values(*self.tracked_fields).first()
+        if row is not None:
+            self._tracked_values = {**row, **(values or {})}
 
 
 class Area(models.Model):
@@ -16,7 +172,9 @@ class Area(models.Model):
         return self.name
 
 
-class House(models.Model):
+class House(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('home_id', 'house_name', 'family_name', 'location_name')
+
     home_id = models.CharField(max_length=50, unique=True, db_index=True)  # Custom sequential ID, indexed
     firebase_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)  # Link to Firestore document
     house_name = models.CharField(max_length=100)
@@ -34,17 +192,17 @@ class House(models.Model):
     def save(self, *args, **kwargs):
         if not self.home_id:
             # Auto-generate sequential ID starting from '1001'
-            with transaction.atomic():
-                max_id = House.objects.aggregate(max_id=Max('home_id'))['max_id']
-                if max_id:
-                    next_id = str(int(max_id) + 1)
-                else:
-                    next_id = '1001'
-                self.home_id = next_id
+            self.home_id = IdSequence.next_value('house')
+        elif self._state.adding or self.home_id != (self.tracked_old_values() or {}).get('home_id'):
+            # An explicitly chosen ID must never be generated again
+            IdSequence.advance('house', self.home_id)
         super().save(*args, **kwargs)
 
 
-class Member(models.Model):
+class Member(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('member_id', 'name', 'surname', 'date_of_birth', 'adhar', 'isGuardian', 'status',
+                      'house_id', 'father_id', 'mother_id')
+
     STATUS_CHOICES = [
         ('live', 'Live'),
         ('dead', 'Dead'),
@@ -100,13 +258,10 @@ class Member(models.Model):
         is_new = self._state.adding
         if not self.member_id:
             # Auto-generate sequential ID starting from '1001'
-            with transaction.atomic():
-                max_id = Member.objects.aggregate(max_id=Max('member_id'))['max_id']
-                if max_id:
-                    next_id = str(int(max_id) + 1)
-                else:
-                    next_id = '1001'
-                self.member_id = next_id
+            self.member_id = IdSequence.next_value('member')
+        elif is_new or self.member_id != (self.tracked_old_values() or {}).get('member_id'):
+            # An explicitly chosen ID must never be generated again
+            IdSequence.advance('member', self.member_id)
         
         # Save first to ensure we have an ID (especially for new members)
         super().save(*args, **kwargs)
@@ -129,6 +284,65 @@ class Member(models.Model):
             pass
 
 
+class MemberAncestry(models.Model):
+    """
+    Closure table of Member.father / Member.mother: one row per (ancestor, descendant)
+    pair with the shortest number of generations between them. Every member also has
+    a depth-0 row for itself. Maintained by society.kinship.
+    """
+    ancestor = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),  # For ancestor lookups
+            models.Index(fields=['ancestor', 'depth']),  # For descendant lookups
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
+class FamilyChange(models.Model):
+    """
+    Change log for the Firestore sync: one row per house whose family payload
+    changed. Written by database triggers (see society.change_feed), so every
+    change to a house, its members or their obligations moves the house's row
+    to a ``seq`` above all others. Rows of deleted houses are kept with
+    ``deleted`` set so clients can remove the document.
+    """
+    house_id = models.BigIntegerField(unique=True)  # Not a foreign key: deleted houses keep their row
+    doc_id = models.CharField(max_length=100)  # Firestore document id (firebase_id, else home_id)
+    seq = models.BigIntegerField(db_index=True)
+    deleted = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.doc_id} @ {self.seq}"
+
+
+class SyncCursor(models.Model):
+    """
+    How far a consumer of the FamilyChange feed has got: every change up to
+    ``seq`` has been delivered. The Firestore sync engine keeps its position here
+    so changes still queued when a process stopped are sent after a restart.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    seq = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.seq}"
+
+
+# Sequences handed out by IdSequence: name -> (model, id field)
+SEQUENCE_SOURCES = {
+    'house': (House, 'home_id'),
+    'member': (Member, 'member_id'),
+}
+
+
 # Payments Models
 
 class Collection(models.Model):
@@ -161,7 +375,9 @@ class SubCollection(models.Model):
         return f"{self.name} ({self.year})"
 
 
-class MemberObligation(models.Model):  # The through-table for member-subcollection relations
+class MemberObligation(TrackedFieldsMixin, models.Model):  # The through-table for member-subcollection relations
+    tracked_fields = ('amount', 'paid_status')
+
     PAID_STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('paid', 'Paid'),
@@ -207,7 +423,9 @@ class MemberObligation(models.Model):  # The through-table for member-subcollect
         super().save(*args, **kwargs)
 
 
-class Todo(models.Model):
+class Todo(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('completed',)
+
     PRIORITY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -248,6 +466,19 @@ class AppSettings(models.Model):
         return f"App Settings (Theme: {self.theme})"
 
 
+class DashboardCounter(models.Model):
+    """
+    Materialized row counts shown on the dashboard, keyed by e.g. 'members_count'
+    or 'members_by_status:live'. Maintained incrementally by society.counters.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
 class RecentAction(models.Model):
     ACTION_TYPES = [
         ('CREATE', 'Created'),
@@ -268,6 +499,41 @@ class RecentAction(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='recentaction_timestamp_idx'),
+            models.Index(fields=['is_sync_pending', 'timestamp'], name='recentaction_sync_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.action_type} {self.model_name} ({self.object_id})"
+
+
+class Job(models.Model):
+    """
+    A long-running operation executed by the in-process job runner (see
+    society.jobs). Rows outlive the process, so jobs that were queued or running
+    when the backend stopped are picked up again on the next start.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True)
+    params = models.JSONField(default=dict)
+    progress = models.PositiveSmallIntegerField(default=0)  # Percent
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,274 @@
+from decimal import Decimal, InvalidOperation
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Area, Member, SubCollection, MemberObligation
+from . import audit, counters
+
+# Rows per INSERT statement; keeps SQLite well under its bound-parameter limit
+BULK_BATCH_SIZE = 500
+
+PAID_STATUSES = {choice for choice, _ in MemberObligation.PAID_STATUS_CHOICES}
+MEMBER_STATUSES = {choice for choice, _ in Member.STATUS_CHOICES}
+
+
+def _parse_row(row):
+    """Validate the shape of one incoming obligation row without touching the database"""
+    errors = {}
+    if not isinstance(row, dict):
+        return None, {'non_field_errors': ['Invalid data. Expected a dictionary.']}
+
+    member_id = row.get('member')
+    if member_id in (None, ''):
+        errors['member'] = ['This field is required.']
+
+    subcollection_id = row.get('subcollection')
+    try:
+        subcollection_id = int(subcollection_id)
+    except (TypeError, ValueError):
+        errors['subcollection'] = ['This field is required.' if subcollection_id in (None, '') else 'Incorrect type. Expected pk value.']
+
+    amount = row.get('amount')
+    try:
+        amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+        if not amount.is_finite() or abs(amount) >= 10 ** 8:
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        errors['amount'] = ['This field is required.' if amount in (None, '') else 'A valid number is required.']
+
+    paid_status = row.get('paid_status') or 'pending'
+    if paid_status not in PAID_STATUSES:
+        errors['paid_status'] = [f'"{paid_status}" is not a valid choice.']
+
+    # Optional; defaults to the area of the member's house
+    area_id = row.get('area')
+    if area_id in (None, ''):
+        area_id = None
+    else:
+        try:
+            area_id = int(area_id)
+        except (TypeError, ValueError):
+            errors['area'] = ['Incorrect type. Expected pk value.']
+
+    if errors:
+        return None, errors
+    return {
+        'member': str(member_id),
+        'subcollection': subcollection_id,
+        'amount': amount,
+        'paid_status': paid_status,
+        'area': area_id,
+    }, None
+
+
+def parse_assignment(data):
+    """
+    Validate an assign request (amount, paid_status and member filters) before
+    anything reaches the raw INSERT ... SELECT. Returns (values, errors).
+    """
+    errors = {}
+
+    amount = data.get('amount')
+    if amount in (None, ''):
+        amount = None
+    else:
+        try:
+            amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+            if not amount.is_finite() or amount < 0 or amount >= 10 ** 8:
+                raise InvalidOperation
+        except (InvalidOperation, ValueError):
+            errors['amount'] = ['A valid non-negative number is required.']
+
+    paid_status = data.get('paid_status') or 'pending'
+    if paid_status not in PAID_STATUSES:
+        errors['paid_status'] = [f'"{paid_status}" is not a valid choice.']
+
+    area = data.get('area')
+    if area in (None, ''):
+        area = None
+    else:
+        try:
+            area = int(area)
+        except (TypeError, ValueError):
+            errors['area'] = ['Incorrect type. Expected pk value.']
+
+    member_status = data.get('status') or None
+    if member_status is not None and member_status not in MEMBER_STATUSES:
+        errors['status'] = [f'"{member_status}" is not a valid choice.']
+
+    is_guardian = data.get('is_guardian', data.get('isGuardian'))
+    if is_guardian is not None:
+        is_guardian = str(is_guardian).lower() == 'true'
+
+    houses = data.get('houses') or None
+    if houses is not None:
+        if not isinstance(houses, list) or not all(isinstance(h, (str, int)) for h in houses):
+            errors['houses'] = ['Expected a list of house ids.']
+        else:
+            houses = [str(h) for h in houses]
+
+    if errors:
+        return None, errors
+    return {
+        'amount': amount,
+        'paid_status': paid_status,
+        'area': area,
+        'status': member_status,
+        'is_guardian': is_guardian,
+        'houses': houses,
+    }, None
+
+
+def bulk_create_obligations(rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Create many obligations with a fixed number of queries.
+
+    Members, subcollections and areas are resolved with one query each; a row
+    without an area gets the area of the member's house through the same join.
+    Obligations are inserted in batches and the batch is recorded as one
+    summary audit entry (see society.audit.bulk_operation).
+
+    Returns (created, errors) where created holds the normalized rows that were
+    inserted (with their new 'id') and errors holds {'data': row, 'errors': ...}
+    for rejected rows, including rows another request assigned first.
+    """
+    parsed = []
+    errors = []
+    for row in rows:
+        data, row_errors = _parse_row(row)
+        if row_errors:
+            errors.append({'data': row, 'errors': row_errors})
+        else:
+            parsed.append((row, data))
+
+    if not parsed:
+        return [], errors
+
+    subcollections = SubCollection.objects.in_bulk({data['subcollection'] for _, data in parsed})
+    members = {
+        m['member_id']: m
+        for m in Member.objects.filter(member_id__in={data['member'] for _, data in parsed})
+        .values('id', 'member_id', 'name', 'house__area_id')
+    }
+    areas = set(
+        Area.objects.filter(id__in={data['area'] for _, data in parsed if data['area'] is not None})
+        .values_list('id', flat=True)
+    )
+    existing = set(
+        MemberObligation.objects.filter(
+            subcollection_id__in=subcollections.keys(),
+            member_id__in=[m['id'] for m in members.values()],
+        ).values_list('subcollection_id', 'member_id')
+    )
+
+    duplicate = {'non_field_errors': ['The fields subcollection, member must make a unique set.']}
+    pending = {}
+    for row, data in parsed:
+        subcollection = subcollections.get(data['subcollection'])
+        member = members.get(data['member'])
+        if subcollection is None:
+            errors.append({'data': row, 'errors': {'subcollection': [f'Invalid pk "{data["subcollection"]}" - object does not exist.']}})
+            continue
+        if member is None:
+            errors.append({'data': row, 'errors': {'member': ['Object with member_id={} does not exist.'.format(data['member'])]}})
+            continue
+        if data['area'] is not None and data['area'] not in areas:
+            errors.append({'data': row, 'errors': {'area': [f'Invalid pk "{data["area"]}" - object does not exist.']}})
+            continue
+        key = (subcollection.id, member['id'])
+        if key in existing:
+            errors.append({'data': row, 'errors': duplicate})
+            continue
+        existing.add(key)
+        area_id = member['house__area_id'] if data['area'] is None else data['area']
+        pending[key] = (row, {**data, 'area': area_id}, MemberObligation(
+            subcollection_id=subcollection.id,
+            member_id=member['id'],
+            area_id=area_id,
+            amount=data['amount'],
+            paid_status=data['paid_status'],
+        ))
+
+    if not pending:
+        return [], errors
+
+    def obligation_ids():
+        return {
+            (subcollection_id, member_id): pk
+            for pk, subcollection_id, member_id in MemberObligation.objects.filter(
+                subcollection_id__in={key[0] for key in pending},
+                member_id__in={key[1] for key in pending},
+            ).values_list('id', 'subcollection_id', 'member_id')
+        }
+
+    created = []
+    with transaction.atomic(), audit.bulk_operation('Obligation', 'bulk', 'CREATE') as summary:
+        # Rows assigned by another request since the check above are skipped by
+        # ignore_conflicts; compare the keys before and after (ignore_conflicts
+        # also leaves primary keys unset) so only rows inserted here are counted
+        assigned_before = obligation_ids()
+        MemberObligation.objects.bulk_create(
+            [obligation for *_, obligation in pending.values()], batch_size=batch_size, ignore_conflicts=True
+        )
+        inserted = {key: pk for key, pk in obligation_ids().items() if key not in assigned_before}
+        for key, (row, data, obligation) in pending.items():
+            if key in inserted:
+                created.append({'id': inserted[key], **data})
+            else:
+                errors.append({'data': row, 'errors': duplicate})
+
+        # bulk_create sends no signals, so the batch is one audit entry
+        summary.record_ids(inserted.values())
+        summary.description = f"Bulk assignment: {summary.rows} obligations created"
+        counters.record_obligations_created(pending[key][2].paid_status for key in inserted)
+
+    return created, errors
+
+
+def assign_subcollection(subcollection, members, amount=None, paid_status='pending'):
+    """
+    Assign ``subcollection`` to every member in the ``members`` queryset with a single
+    INSERT ... SELECT, skipping members that already hold an obligation for it.
+
+    Returns (matched, created): how many members the filter selected and how many
+    obligations were inserted.
+    """
+    if amount is None:
+        amount = subcollection.amount
+    now = timezone.now()
+    ops = connection.ops
+    amount_field = MemberObligation._meta.get_field('amount')
+
+    candidates = members.exclude(
+        id__in=MemberObligation.objects.filter(subcollection=subcollection).values('member_id')
+    ).values(candidate_member=F('id'), candidate_area=F('house__area_id'))
+    select_sql, select_params = candidates.query.sql_with_params()
+
+    table = ops.quote_name(MemberObligation._meta.db_table)
+    columns = ', '.join(
+        ops.quote_name(MemberObligation._meta.get_field(name).column)
+        for name in ('subcollection', 'member', 'area', 'amount', 'paid_status', 'created_at', 'updated_at')
+    )
+    sql = (
+        f"INSERT INTO {table} ({columns}) "
+        f"SELECT %s, candidate.candidate_member, candidate.candidate_area, %s, %s, %s, %s FROM ({select_sql}) candidate"
+    )
+    params = (
+        subcollection.id,
+        ops.adapt_decimalfield_value(amount, amount_field.max_digits, amount_field.decimal_places),
+        paid_status,
+        ops.adapt_datetimefield_value(now),
+        ops.adapt_datetimefield_value(now),
+    ) + tuple(select_params)
+
+    # One summary entry, logged against the subcollection rather than an obligation
+    with transaction.atomic(), audit.bulk_operation('SubCollection', subcollection.id, 'UPDATE') as summary:
+        matched = members.count()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            created = cursor.rowcount
+        if created:
+            counters.record_obligations_created([paid_status] * created)
+        summary.rows = created
+        summary.description = f"Subcollection assigned: {subcollection.name} to {created} members"
+    return matched, created
@@ -0,0 +1,121 @@
+"""
+Retention for the RecentAction audit log.
+
+Entries that were synced more than RECENT_ACTION_RETENTION_DAYS ago are folded
+into one summary row per day, model and action type, so the table only keeps
+full detail for recent and still-pending work. The detailed rows can first be
+copied to a separate SQLite archive file. Run with
+``manage.py compact_recent_actions``.
+"""
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import RecentAction
+
+SUMMARY_OBJECT_ID = 'daily'
+BATCH_SIZE = 1000
+
+ARCHIVE_SCHEMA = """CREATE TABLE IF NOT EXISTS recent_action (
+    id INTEGER PRIMARY KEY,
+    model_name TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    action_type TEXT NOT NULL,
+    description TEXT NOT NULL,
+    fields_changed TEXT NOT NULL,
+    is_sync_pending INTEGER NOT NULL,
+    timestamp TEXT NOT NULL
+)"""
+
+
+def retention_days():
+    return getattr(settings, 'RECENT_ACTION_RETENTION_DAYS', 90)
+
+
+def expired_actions(days=None):
+    """Synced, not yet compacted entries older than the retention period"""
+    cutoff = timezone.now() - timedelta(days=retention_days() if days is None else days)
+    return RecentAction.objects.filter(
+        is_sync_pending=False, timestamp__lt=cutoff
+    ).exclude(object_id=SUMMARY_OBJECT_ID)
+
+
+def archive(queryset, path):
+    """Copy the rows of ``queryset`` into the SQLite file at ``path``; returns the number copied"""
+    copied = 0
+    # The connection's own context manager only commits; closing() releases the file
+    with closing(sqlite3.connect(path)) as archive_db, archive_db:
+        archive_db.execute(ARCHIVE_SCHEMA)
+        rows = queryset.order_by('id').values_list(
+            'id', 'model_name', 'object_id', 'action_type', 'description',
+            'fields_changed', 'is_sync_pending', 'timestamp'
+        )
+        batch = []
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            pk, model_name, object_id, action_type, description, fields_changed, pending, timestamp = row
+            batch.append((pk, model_name, object_id, action_type, description,
+                          json.dumps(fields_changed), int(pending), timestamp.isoformat()))
+            if len(batch) >= BATCH_SIZE:
+                archive_db.executemany("INSERT OR REPLACE INTO recent_action VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            archive_db.executemany("INSERT OR REPLACE INTO recent_action VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            copied += len(batch)
+    return copied
+
+
+def compact(days=None, archive_path=None):
+    """
+    Replace expired entries with daily summaries. With ``archive_path`` the
+    detailed rows are copied there first. Returns (rows removed, summaries created).
+    """
+    expired = expired_actions(days)
+    with transaction.atomic():
+        if archive_path:
+            archive(expired, archive_path)
+
+        groups = list(
+            expired.annotate(day=TruncDate('timestamp', tzinfo=dt_timezone.utc))
+            .values('day', 'model_name', 'action_type')
+            .annotate(rows=Count('id'), objects=Count('object_id', distinct=True))
+            .order_by('day', 'model_name', 'action_type')
+        )
+        if not groups:
+            return 0, 0
+
+        summaries = RecentAction.objects.bulk_create([
+            RecentAction(
+                model_name=group['model_name'],
+                object_id=SUMMARY_OBJECT_ID,
+                action_type=group['action_type'],
+                description=(
+                    f"{group['rows']} {group['model_name']} {group['action_type'].lower()} actions "
+                    f"on {group['day'].isoformat()}"
+                ),
+                fields_changed={'rows': group['rows'], 'objects': group['objects']},
+                is_sync_pending=False,
+            )
+            for group in groups
+        ], batch_size=BATCH_SIZE)
+
+        removed, _ = expired.delete()
+
+        # auto_now_add stamps the summaries with the current time; move each one
+        # back to the day it summarises so the listing order stays meaningful
+        for summary, group in zip(summaries, groups):
+            day_start = datetime.combine(group['day'], time.min, tzinfo=dt_timezone.utc)
+            RecentAction.objects.filter(pk=summary.pk).update(timestamp=day_start)
+    return removed, len(summaries)
+
+
+def vacuum():
+    """Give the space freed by compaction back to the filesystem"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM")
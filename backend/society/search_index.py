@@ -0,0 +1,332 @@
+"""
+SQLite FTS5 search index for members and houses.
+
+The FTS tables use the model primary key as rowid and are kept in sync by
+triggers, so bulk inserts and queryset.update() calls are indexed as well.
+On databases without FTS5 nothing is installed and the search helpers fall
+back to the icontains filters the viewsets used before.
+"""
+import threading
+import unicodedata
+from collections import OrderedDict
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.utils import DatabaseError
+
+MEMBER_FTS = 'society_member_fts'
+HOUSE_FTS = 'society_house_fts'
+# Single-row counter bumped by triggers on every write the index sees; keys the suggestion cache
+VERSION_TABLE = 'society_search_version'
+
+# Combining marks (category M) are word characters, otherwise Malayalam and other
+# Indic words are split at every vowel sign and prefix searches miss them
+TOKENIZE = '''"unicode61 remove_diacritics 2 categories 'L* N* Co M*'"'''
+
+TABLES = {
+    MEMBER_FTS: f"""CREATE VIRTUAL TABLE IF NOT EXISTS society_member_fts USING fts5(
+        member_id, name, surname, house_name,
+        tokenize = {TOKENIZE}, prefix = '1 2 3'
+    )""",
+    HOUSE_FTS: f"""CREATE VIRTUAL TABLE IF NOT EXISTS society_house_fts USING fts5(
+        house_name, family_name, location_name,
+        tokenize = {TOKENIZE}, prefix = '1 2 3'
+    )""",
+    VERSION_TABLE: """CREATE TABLE IF NOT EXISTS society_search_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL DEFAULT 0
+    )""",
+}
+
+TRIGGERS = {
+    'society_member_fts_insert': """CREATE TRIGGER society_member_fts_insert AFTER INSERT ON society_member BEGIN
+        INSERT INTO society_member_fts (rowid, member_id, name, surname, house_name)
+        VALUES (new.id, new.member_id, new.name, new.surname,
+                (SELECT house_name FROM society_house WHERE id = new.house_id));
+    END""",
+    'society_member_fts_update': """CREATE TRIGGER society_member_fts_update
+    AFTER UPDATE OF member_id, name, surname, house_id ON society_member BEGIN
+        DELETE FROM society_member_fts WHERE rowid = old.id;
+        INSERT INTO society_member_fts (rowid, member_id, name, surname, house_name)
+        VALUES (new.id, new.member_id, new.name, new.surname,
+                (SELECT house_name FROM society_house WHERE id = new.house_id));
+    END""",
+    'society_member_fts_delete': """CREATE TRIGGER society_member_fts_delete AFTER DELETE ON society_member BEGIN
+        DELETE FROM society_member_fts WHERE rowid = old.id;
+    END""",
+    'society_house_fts_insert': """CREATE TRIGGER society_house_fts_insert AFTER INSERT ON society_house BEGIN
+        INSERT INTO society_house_fts (rowid, house_name, family_name, location_name)
+        VALUES (new.id, new.house_name, new.family_name, new.location_name);
+    END""",
+    'society_house_fts_update': """CREATE TRIGGER society_house_fts_update
+    AFTER UPDATE OF house_name, family_name, location_name ON society_house BEGIN
+        DELETE FROM society_house_fts WHERE rowid = old.id;
+        INSERT INTO society_house_fts (rowid, house_name, family_name, location_name)
+        VALUES (new.id, new.house_name, new.family_name, new.location_name);
+    END""",
+    'society_house_fts_rename': """CREATE TRIGGER society_house_fts_rename AFTER UPDATE OF house_name ON society_house
+    WHEN old.house_name IS NOT new.house_name BEGIN
+        UPDATE society_member_fts SET house_name = new.house_name
+        WHERE rowid IN (SELECT id FROM society_member WHERE house_id = new.id);
+    END""",
+    'society_house_fts_delete': """CREATE TRIGGER society_house_fts_delete AFTER DELETE ON society_house BEGIN
+        DELETE FROM society_house_fts WHERE rowid = old.id;
+    END""",
+}
+
+_BUMP_VERSION = f"UPDATE {VERSION_TABLE} SET version = version + 1;"
+TRIGGERS.update({
+    'society_member_fts_version_insert': f"""CREATE TRIGGER society_member_fts_version_insert
+    AFTER INSERT ON society_member BEGIN {_BUMP_VERSION} END""",
+    'society_member_fts_version_update': f"""CREATE TRIGGER society_member_fts_version_update
+    AFTER UPDATE OF member_id, name, surname, house_id ON society_member BEGIN {_BUMP_VERSION} END""",
+    'society_member_fts_version_delete': f"""CREATE TRIGGER society_member_fts_version_delete
+    AFTER DELETE ON society_member BEGIN {_BUMP_VERSION} END""",
+    'society_house_fts_version_insert': f"""CREATE TRIGGER society_house_fts_version_insert
+    AFTER INSERT ON society_house BEGIN {_BUMP_VERSION} END""",
+    'society_house_fts_version_update': f"""CREATE TRIGGER society_house_fts_version_update
+    AFTER UPDATE OF home_id, house_name, family_name, location_name ON society_house BEGIN {_BUMP_VERSION} END""",
+    'society_house_fts_version_delete': f"""CREATE TRIGGER society_house_fts_version_delete
+    AFTER DELETE ON society_house BEGIN {_BUMP_VERSION} END""",
+})
+
+REBUILD_SQL = [
+    "DELETE FROM society_member_fts",
+    """INSERT INTO society_member_fts (rowid, member_id, name, surname, house_name)
+        SELECT m.id, m.member_id, m.name, m.surname, h.house_name
+        FROM society_member m LEFT JOIN society_house h ON h.id = m.house_id""",
+    "DELETE FROM society_house_fts",
+    """INSERT INTO society_house_fts (rowid, house_name, family_name, location_name)
+        SELECT id, house_name, family_name, location_name FROM society_house""",
+]
+
+# Per-process cache of whether the index exists, keyed by database alias
+_available = {}
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE VIRTUAL TABLE temp.society_fts5_probe USING fts5(value, tokenize = {TOKENIZE})")
+            cursor.execute("DROP TABLE temp.society_fts5_probe")
+        return True
+    except DatabaseError:
+        return False
+
+
+def ensure_search_index(connection=default_connection):
+    """
+    Create the FTS tables and triggers if they are missing. SQLite drops triggers
+    when Django remakes a table during a migration, so this runs after every
+    migrate; if any trigger had to be recreated the index is rebuilt from scratch.
+    """
+    _available.pop(connection.alias, None)
+    if not fts5_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'society_%_fts_%'")
+        existing = {row[0] for row in cursor.fetchall()}
+        for sql in TABLES.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT OR IGNORE INTO {VERSION_TABLE} (id) VALUES (1)")
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        if missing:
+            for sql in REBUILD_SQL:
+                cursor.execute(sql)
+    return True
+
+
+def drop_search_index(connection=default_connection):
+    _available.pop(connection.alias, None)
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        for table in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def is_available(connection=default_connection):
+    if connection.alias not in _available:
+        if connection.vendor != 'sqlite':
+            _available[connection.alias] = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s, %s)",
+                    [MEMBER_FTS, HOUSE_FTS, VERSION_TABLE]
+                )
+                _available[connection.alias] = cursor.fetchone()[0] == len(TABLES)
+    return _available[connection.alias]
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    Returns None when the text has no searchable words.
+    """
+    # Split words the way TOKENIZE does: \w alone would break at combining marks
+    text = ''.join(
+        ch if ch.isalnum() or unicodedata.category(ch).startswith('M') else ' ' for ch in text or ''
+    )
+    words = text.split()
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _ranked_search(queryset, fts_table, match):
+    table = queryset.model._meta.db_table
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s", [match])
+    ).annotate(
+        search_rank=RawSQL(
+            f"SELECT rank FROM {fts_table} WHERE {fts_table} MATCH %s AND rowid = {table}.id", [match]
+        )
+    ).order_by('search_rank', 'pk')
+
+
+def search_members(queryset, text):
+    """Filter a Member queryset by ``text``, best matches first"""
+    match = build_match_query(text)
+    if match and is_available():
+        return _ranked_search(queryset, MEMBER_FTS, match)
+    return queryset.filter(
+        Q(name__icontains=text) |
+        Q(surname__icontains=text) |
+        Q(house__house_name__icontains=text) |
+        Q(member_id__icontains=text)
+    )
+
+
+def search_houses(queryset, text):
+    """Filter a House queryset by ``text``, best matches first"""
+    match = build_match_query(text)
+    if match and is_available():
+        return _ranked_search(queryset, HOUSE_FTS, match)
+    return queryset.filter(
+        Q(house_name__icontains=text) |
+        Q(family_name__icontains=text) |
+        Q(location_name__icontains=text)
+    )
+
+
+# Per-process LRU cache of recent suggestion lookups. Entries are keyed on the
+# search version, which the index triggers bump on every member or house write
+# (members without a house included), so queryset.update(), bulk_create and
+# writes from other processes invalidate it too. Signals in society.signals also
+# clear it for databases without the triggers.
+SUGGEST_CACHE_SIZE = 512
+
+# Only the best-ranked prefix matches are returned; FTS5 keeps just the top
+# SUGGEST_CANDIDATES while ranking, so short prefixes stay cheap
+SUGGEST_CANDIDATES = 200
+_suggest_cache = OrderedDict()
+_suggest_lock = threading.Lock()
+
+
+def clear_suggestion_cache():
+    with _suggest_lock:
+        _suggest_cache.clear()
+
+
+def clear_caches():
+    """Forget everything cached about the database; call after it was replaced (import)"""
+    _available.clear()
+    clear_suggestion_cache()
+
+
+def _data_version():
+    if not is_available():
+        from .change_feed import current_watermark
+
+        return current_watermark()
+    with default_connection.cursor() as cursor:
+        cursor.execute(f"SELECT version FROM {VERSION_TABLE} WHERE id = 1")
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _cached(key, compute):
+    key = (_data_version(),) + key
+    with _suggest_lock:
+        if key in _suggest_cache:
+            _suggest_cache.move_to_end(key)
+            return _suggest_cache[key]
+    result = compute()
+    with _suggest_lock:
+        _suggest_cache[key] = result
+        if len(_suggest_cache) > SUGGEST_CACHE_SIZE:
+            _suggest_cache.popitem(last=False)
+    return result
+
+
+def _member_suggestions(text, match, limit):
+    from .models import Member
+
+    if match and is_available():
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT m.member_id, m.name, m.surname, h.house_name
+                FROM (SELECT rowid, rank FROM {MEMBER_FTS} WHERE {MEMBER_FTS} MATCH %s ORDER BY rank LIMIT %s) f
+                JOIN society_member m ON m.id = f.rowid
+                LEFT JOIN society_house h ON h.id = m.house_id
+                ORDER BY f.rank
+                LIMIT %s""",
+                [match, SUGGEST_CANDIDATES, limit]
+            )
+            rows = cursor.fetchall()
+    else:
+        rows = Member.objects.filter(
+            Q(name__istartswith=text) | Q(surname__istartswith=text) | Q(member_id__startswith=text)
+        ).order_by('name').values_list('member_id', 'name', 'surname', 'house__house_name')[:limit]
+    return [
+        {'id': member_id, 'name': f"{name} {surname or ''}".strip(), 'house': house_name}
+        for member_id, name, surname, house_name in rows
+    ]
+
+
+def _house_suggestions(text, match, limit):
+    from .models import House
+
+    if match and is_available():
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT h.home_id, h.house_name, h.family_name, h.location_name
+                FROM (SELECT rowid, rank FROM {HOUSE_FTS} WHERE {HOUSE_FTS} MATCH %s ORDER BY rank LIMIT %s) f
+                JOIN society_house h ON h.id = f.rowid
+                ORDER BY f.rank
+                LIMIT %s""",
+                [match, SUGGEST_CANDIDATES, limit]
+            )
+            rows = cursor.fetchall()
+    else:
+        rows = House.objects.filter(
+            Q(house_name__istartswith=text) | Q(family_name__istartswith=text) | Q(location_name__istartswith=text)
+        ).order_by('house_name').values_list('home_id', 'house_name', 'family_name', 'location_name')[:limit]
+    return [
+        {'id': home_id, 'name': f"{house_name} ({family_name})", 'house': house_name, 'location': location_name}
+        for home_id, house_name, family_name, location_name in rows
+    ]
+
+
+def suggest_members(text, limit=10):
+    """Top ``limit`` members matching the typed prefix, as {'id', 'name', 'house'} dicts"""
+    text = (text or '').strip()
+    if not text:
+        return []
+    match = build_match_query(text)
+    return _cached(('member', text.lower(), limit), lambda: _member_suggestions(text, match, limit))
+
+
+def suggest_houses(text, limit=10):
+    """Top ``limit`` houses matching the typed prefix, as {'id', 'name', 'house', 'location'} dicts"""
+    text = (text or '').strip()
+    if not text:
+        return []
+    match = build_match_query(text)
+    return _cached(('house', text.lower(), limit), lambda: _house_suggestions(text, match, limit))
@@ -12,10 +12,15 @@ class AreaSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'created_at', 'updated_at', 'total_houses', 'total_live_members']
     
     def get_total_houses(self, obj: Any) -> int:
+        # Prefer the count annotated by AreaViewSet.get_queryset
+        if hasattr(obj, 'total_houses'):
+            return obj.total_houses
         return obj.houses.count()
     
     def get_total_live_members(self, obj: Any) -> int:
         # Count only live members in this area
+        if hasattr(obj, 'total_live_members'):
+            return obj.total_live_members
         return Member.objects.filter(house__area=obj, status='live').count()
 
 
@@ -30,10 +35,13 @@ class HouseListSerializer(serializers.ModelSerializer):
     """Serializer for house listing that includes area name and member count"""
     area_name = serializers.SerializerMethodField()
     member_count = serializers.SerializerMethodField()
+    live_member_count = serializers.SerializerMethodField()
+    guardian_name = serializers.SerializerMethodField()
     
     class Meta:
         model = House
-        fields = ['home_id', 'house_name', 'family_name', 'location_name', 'area_name', 'member_count']
+        fields = ['home_id', 'house_name', 'family_name', 'location_name', 'area_name', 'member_count',
+                  'live_member_count', 'guardian_name']
     
     def get_area_name(self, obj):
         try:
@@ -42,9 +50,22 @@ class HouseListSerializer(serializers.ModelSerializer):
             return None
             
     def get_member_count(self, obj):
-        # Use the related manager to count members
+        # Prefer the count annotated by HouseViewSet.get_queryset
+        if hasattr(obj, 'member_count'):
+            return obj.member_count
         return obj.members.count()
 
+    def get_live_member_count(self, obj):
+        if hasattr(obj, 'live_member_count'):
+            return obj.live_member_count
+        return obj.members.filter(status='live').count()
+
+    def get_guardian_name(self, obj):
+        if hasattr(obj, 'guardian_name'):
+            return obj.guardian_name
+        guardian = obj.members.filter(isGuardian=True).order_by('id').first()
+        return guardian.name if guardian else None
+
 
 class HouseDetailSerializer(serializers.ModelSerializer):
     area_name = serializers.SerializerMethodField()
@@ -146,13 +167,22 @@ class MemberObligationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class MemberObligationDetailSerializer(serializers.ModelSerializer):
-    """Serializer that includes full member details for listing"""
-    
+class MemberObligationListSerializer(serializers.ModelSerializer):
+    """Flat read-only serializer for obligation listings; expects MemberObligationViewSet's list queryset"""
+    member = serializers.CharField(source='member.member_id', read_only=True)
+    member_name = serializers.CharField(source='member.name', read_only=True)
+    member_surname = serializers.CharField(source='member.surname', read_only=True)
+    house_name = serializers.CharField(source='member.house.house_name', read_only=True, allow_null=True)
+    subcollection_name = serializers.CharField(source='subcollection.name', read_only=True)
+    subcollection_year = serializers.CharField(source='subcollection.year', read_only=True)
+    area_name = serializers.CharField(source='area.name', read_only=True, allow_null=True)
+
     class Meta:
         model = MemberObligation
-        fields = '__all__'
-        depth = 1
+        fields = ['id', 'member', 'member_name', 'member_surname', 'house_name', 'subcollection',
+                  'subcollection_name', 'subcollection_year', 'area', 'area_name', 'amount', 'paid_status',
+                  'created_at', 'updated_at']
+        read_only_fields = fields
 
 
 class TodoSerializer(serializers.ModelSerializer):
@@ -176,3 +206,12 @@ class RecentActionSerializer(serializers.ModelSerializer):
         model = RecentAction
         fields = '__all__'
 
+
+from .models import Job
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'progress', 'message', 'result', 'error',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
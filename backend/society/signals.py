@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
 from django.dispatch import receiver
-from .models import House, Member, RecentAction
+from django.db import transaction
+from django.db.models import Q
+from .models import House, Member, Todo
+from . import audit, counters, firebase_service, kinship, search_index
 from django.forms.models import model_to_dict
 import datetime
 
@@ -11,18 +14,16 @@ def serialize_val(val):
 
 @receiver(pre_save, sender=House)
 @receiver(pre_save, sender=Member)
+@receiver(pre_save, sender=Todo)
 def capture_old_state(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old = sender.objects.get(pk=instance.pk)
-            instance._old_instance = old
-        except sender.DoesNotExist:
-            pass
+    # Instances loaded from the database already carry a snapshot of their tracked
+    # fields (TrackedFieldsMixin); only hand-built instances need a read here
+    instance.load_tracked_values()
 
 @receiver(post_save, sender=House)
 def log_house_save(sender, instance, created, **kwargs):
     if created:
-        RecentAction.objects.create(
+        audit.record(
             model_name='House',
             object_id=str(instance.home_id),
             action_type='CREATE',
@@ -30,20 +31,20 @@ def log_house_save(sender, instance, created, **kwargs):
             fields_changed={}
         )
     else:
-        old = getattr(instance, '_old_instance', None)
+        old = instance.tracked_old_values()
         if old:
             changes = {}
             # Fields to track for House
             fields = ['home_id', 'house_name', 'family_name', 'location_name']
             
             for f in fields:
-                old_val = getattr(old, f)
-                new_val = getattr(instance, f)
+                old_val = old[f]
+                new_val = instance.tracked_value(f)
                 if old_val != new_val:
                     changes[f] = {'old': serialize_val(old_val), 'new': serialize_val(new_val)}
             
             if changes:
-                RecentAction.objects.create(
+                audit.record(
                     model_name='House',
                     object_id=str(instance.home_id),
                     action_type='UPDATE',
@@ -54,7 +55,7 @@ def log_house_save(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Member)
 def log_member_save(sender, instance, created, **kwargs):
     if created:
-        RecentAction.objects.create(
+        audit.record(
             model_name='Member',
             object_id=str(instance.member_id),
             action_type='CREATE',
@@ -62,21 +63,21 @@ def log_member_save(sender, instance, created, **kwargs):
             fields_changed={}
         )
     else:
-        old = getattr(instance, '_old_instance', None)
+        old = instance.tracked_old_values()
         if old:
             changes = {}
             # Fields to track for Member
             fields = ['member_id', 'name', 'surname', 'date_of_birth', 'adhar', 'isGuardian', 'status']
             
             # Helper to check foreign keys if needed (e.g. house change)
-            if old.house != instance.house:
-                old_h = old.house.home_id if old.house else None
+            if old['house_id'] != instance.house_id:
+                old_h = House.objects.filter(pk=old['house_id']).values_list('home_id', flat=True).first() if old['house_id'] else None
                 new_h = instance.house.home_id if instance.house else None
                 changes['house'] = {'old': old_h, 'new': new_h}
 
             for f in fields:
-                old_val = getattr(old, f)
-                new_val = getattr(instance, f)
+                old_val = old[f]
+                new_val = instance.tracked_value(f)
                 if old_val != new_val:
                     changes[f] = {'old': serialize_val(old_val), 'new': serialize_val(new_val)}
             
@@ -86,7 +87,7 @@ def log_member_save(sender, instance, created, **kwargs):
                 if 'isGuardian' in changes:
                     desc += " (Guardian Status Changed)"
                 
-                RecentAction.objects.create(
+                audit.record(
                     model_name='Member',
                     object_id=str(instance.member_id),
                     action_type='UPDATE',
@@ -96,7 +97,7 @@ def log_member_save(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=House)
 def log_house_delete(sender, instance, **kwargs):
-    RecentAction.objects.create(
+    audit.record(
         model_name='House',
         object_id=str(instance.home_id),
         action_type='DELETE',
@@ -106,7 +107,7 @@ def log_house_delete(sender, instance, **kwargs):
 
 @receiver(post_delete, sender=Member)
 def log_member_delete(sender, instance, **kwargs):
-    RecentAction.objects.create(
+    audit.record(
         model_name='Member',
         object_id=str(instance.member_id),
         action_type='DELETE',
@@ -118,17 +119,12 @@ from .models import MemberObligation
 
 @receiver(pre_save, sender=MemberObligation)
 def capture_obligation_old_state(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old = sender.objects.get(pk=instance.pk)
-            instance._old_instance = old
-        except sender.DoesNotExist:
-            pass
+    instance.load_tracked_values()
 
 @receiver(post_save, sender=MemberObligation)
 def log_obligation_save(sender, instance, created, **kwargs):
     if created:
-        RecentAction.objects.create(
+        audit.record(
             model_name='Obligation',
             object_id=str(instance.id),
             action_type='CREATE',
@@ -136,19 +132,19 @@ def log_obligation_save(sender, instance, created, **kwargs):
             fields_changed={}
         )
     else:
-        old = getattr(instance, '_old_instance', None)
+        old = instance.tracked_old_values()
         if old:
             changes = {}
             fields = ['amount', 'paid_status']
             
             for f in fields:
-                old_val = getattr(old, f)
-                new_val = getattr(instance, f)
+                old_val = old[f]
+                new_val = instance.tracked_value(f)
                 if old_val != new_val:
                     changes[f] = {'old': serialize_val(old_val), 'new': serialize_val(new_val)}
             
             if changes:
-                RecentAction.objects.create(
+                audit.record(
                     model_name='Obligation',
                     object_id=str(instance.id),
                     action_type='UPDATE',
@@ -156,3 +152,78 @@ def log_obligation_save(sender, instance, created, **kwargs):
                     fields_changed=changes
                 )
 
+
+def update_counters_on_save(sender, instance, created, **kwargs):
+    counters.record_save(instance, instance.tracked_old_values() if hasattr(instance, 'tracked_old_values') else None, created)
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    counters.record_delete(instance)
+
+
+# Keep the dashboard counters in step with every counted model
+for counted_model in counters.COUNTED_MODELS:
+    post_save.connect(update_counters_on_save, sender=counted_model, dispatch_uid=f'counters_save_{counted_model.__name__}')
+    post_delete.connect(update_counters_on_delete, sender=counted_model, dispatch_uid=f'counters_delete_{counted_model.__name__}')
+
+
+@receiver(post_save, sender=House)
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=House)
+@receiver(post_delete, sender=Member)
+def clear_suggestions(sender, instance, **kwargs):
+    search_index.clear_suggestion_cache()
+
+
+@receiver(post_save, sender=Member)
+def update_lineage(sender, instance, created, **kwargs):
+    old = instance.tracked_old_values()
+    if created or (old and (old['father_id'], old['mother_id']) != (instance.father_id, instance.mother_id)):
+        kinship.refresh_lineage(instance.pk)
+
+
+@receiver(pre_delete, sender=Member)
+def remember_children(sender, instance, **kwargs):
+    # Children get father/mother set to NULL without signals, so refresh them after the delete
+    instance._kinship_children = list(
+        Member.objects.filter(Q(father=instance) | Q(mother=instance)).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Member)
+def update_children_lineage(sender, instance, **kwargs):
+    for child_pk in getattr(instance, '_kinship_children', []):
+        kinship.refresh_lineage(child_pk)
+
+
+# Firestore sync: changes are queued once the transaction commits, so the background
+# flush reads committed rows and rolled-back edits are never pushed. Writes that send
+# no signals (queryset.update(), bulk_create) are not queued here.
+@receiver(post_save, sender=House)
+def queue_house_sync(sender, instance, **kwargs):
+    transaction.on_commit(lambda: firebase_service.sync_house_to_firebase(instance))
+
+
+@receiver(post_save, sender=Member)
+def queue_member_sync(sender, instance, created, **kwargs):
+    old = None if created else instance.tracked_old_values()
+    # A member who moved house (or was renumbered) leaves the old family document.
+    # Copy the old values now: the snapshot is updated in place once save() returns.
+    departed = None
+    if old and (old['house_id'], old['member_id']) != (instance.house_id, instance.member_id):
+        departed = (old['house_id'], old['member_id'])
+
+    def queue():
+        firebase_service.sync_member_to_firebase(instance)
+        if departed:
+            house_id, member_id = departed
+            firebase_service.remove_member_from_firebase(member_id, House.objects.filter(pk=house_id).first())
+    transaction.on_commit(queue)
+
+
+@receiver(post_delete, sender=Member)
+def queue_member_removal(sender, instance, **kwargs):
+    house_id, member_id = instance.house_id, instance.member_id
+    transaction.on_commit(
+        lambda: firebase_service.remove_member_from_firebase(member_id, House.objects.filter(pk=house_id).first())
+    )
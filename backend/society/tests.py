@@ -1,3 +1,1682 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import closing, contextmanager
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+import backup_restore
+
+from . import audit, change_feed, counters, data_transfer, firebase_service, jobs, kinship, retention, search_index
+from .firebase_service import FirestoreSyncEngine
+from .obligation_service import bulk_create_obligations
+from .models import Area, Collection, House, IdSequence, Job, Member, MemberObligation, RecentAction, SubCollection
+
+
+def create_house(area, house_name='House', **fields):
+    return House.objects.create(
+        house_name=house_name, family_name='Family', location_name='Location', area=area, address='Address', **fields
+    )
+
+
+def create_member(house, name='Member', **fields):
+    fields.setdefault('date_of_birth', datetime.date(1990, 1, 1))
+    return Member.objects.create(name=name, house=house, **fields)
+
+
+def create_subcollection(collection=None, year='2025', **fields):
+    fields.setdefault('amount', 100)
+    return SubCollection.objects.create(
+        collection=collection or Collection.objects.create(name='Eid'), year=year, name=f'Eid {year}',
+        due_date=datetime.date(2025, 6, 1), **fields
+    )
+
+
+class FamilyFixture:
+    """One area with one house, shared by the tests of a class; classes add what else they need"""
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.area = Area.objects.create(name='Area')
+        cls.house = create_house(cls.area)
+
+
+class AreaListQueryCountTests(TestCase):
+    client_class = APIClient
+
+    def create_area(self, index):
+        area = Area.objects.create(name=f'Area {index}')
+        for h in range(2):
+            house = create_house(area, f'House {index}-{h}')
+            create_member(house, 'Live')
+            create_member(house, 'Dead', status='dead', date_of_birth=datetime.date(1950, 1, 1))
+        return area
+
+    def list_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/areas/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_query_count_does_not_grow_with_areas(self):
+        self.create_area(0)
+        few_queries, _ = self.list_query_count()
+
+        for index in range(1, 6):
+            self.create_area(index)
+        many_queries, data = self.list_query_count()
+
+        self.assertEqual(len(data), 6)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_counts_are_distinct(self):
+        area = self.create_area(0)
+        Area.objects.create(name='Empty')
+
+        _, data = self.list_query_count()
+        counts = {row['name']: (row['total_houses'], row['total_live_members']) for row in data}
+
+        self.assertEqual(counts[area.name], (2, 2))
+        self.assertEqual(counts['Empty'], (0, 0))
+
+
+class HouseListQueryCountTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for index in range(20):
+            house = create_house(cls.area, f'Rosewood {index}')
+            create_member(house, 'Child')
+            create_member(house, 'Parent', isGuardian=True)
+            create_member(house, 'Elder', isGuardian=True, status='dead', date_of_birth=datetime.date(1930, 1, 1))
+
+    def setUp(self):
+        # The first request starts the job runner and caches the FTS check; keep both out of the counts
+        self.client.get('/api/houses/search/', {'search': 'rosewood'})
+
+    def test_list_and_search_cost_a_fixed_number_of_queries(self):
+        requests = [
+            ('/api/houses/', {}),
+            ('/api/houses/search/', {}),
+            ('/api/houses/search/', {'search': 'rosewood', 'area': self.area.id}),
+        ]
+        for url, params in requests:
+            for page_size in (5, 15):
+                with self.subTest(url=url, params=params, page_size=page_size), self.assertNumQueries(2):
+                    response = self.client.get(url, {**params, 'page_size': page_size})
+                self.assertEqual(len(response.data['results']), page_size)
+                self.assertEqual(response.data['count'], 21 if not params else 20)
+
+    def test_rows_carry_the_annotated_counts_and_guardian(self):
+        response = self.client.get('/api/houses/search/', {'search': 'rosewood 3'})
+        [row] = [row for row in response.data['results'] if row['house_name'] == 'Rosewood 3']
+        self.assertEqual(
+            {key: row[key] for key in ('area_name', 'member_count', 'live_member_count', 'guardian_name')},
+            {'area_name': 'Area', 'member_count': 3, 'live_member_count': 2, 'guardian_name': 'Parent'},
+        )
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDocument:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeDocument(self, doc_id)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def update(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        if self.client.failing_commits:
+            self.client.failing_commits -= 1
+            raise ConnectionError('Firestore unavailable')
+        self.client.commits.append(len(self.writes))
+        for ref, data in self.writes:
+            doc = self.client.docs[ref.id]
+            for path, value in data.items():
+                target = doc
+                *parents, field = path.split('.')
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                if value is FakeFirestore.DELETE_FIELD:
+                    target.pop(field, None)
+                else:
+                    target[field] = value
+
+
+class FakeFirestore:
+    """In-memory stand-in for the parts of the Firestore client the sync engine uses"""
+
+    DELETE_FIELD = object()
+
+    def __init__(self, docs=None):
+        self.docs = docs or {}
+        self.commits = []
+        self.reads = 0
+        self.failing_commits = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, refs):
+        self.reads += 1
+        return [FakeSnapshot(ref.id, self.docs.get(ref.id)) for ref in refs]
+
+
+class FirestoreSyncEngineTests(FamilyFixture, TestCase):
+    def setUp(self):
+        self.client = FakeFirestore()
+        self.engine = FirestoreSyncEngine(
+            client_factory=lambda: self.client, delay=None, batch_limit=2, delete_field=FakeFirestore.DELETE_FIELD
+        )
+
+    def create_house(self, index):
+        house = create_house(self.area, f'House {index}', firebase_id=f'fam{index}')
+        self.client.docs[house.firebase_id] = {'members': [{'fullName': 'Old', 'surname': 'Member', 'role': 'member'}]}
+        return house
+
+    def test_changes_are_coalesced_per_document(self):
+        house = self.create_house(0)
+        guardian = create_member(house, 'Head', isGuardian=True, date_of_birth=datetime.date(1970, 1, 1))
+        old = create_member(house, 'Old', surname='Member', phone='123')
+        self.engine.enqueue_house(house.pk)
+        for member in (guardian, old, old):
+            self.engine.enqueue_member(member.pk)
+
+        result = self.engine.flush()
+
+        self.assertEqual(result, {'documents': 1, 'batches': 1, 'missing': []})
+        self.assertEqual(self.client.commits, [1])
+        self.assertEqual(self.client.reads, 1)
+        doc = self.client.docs['fam0']
+        self.assertEqual(doc['houseName'], 'House 0')
+        self.assertEqual(doc['guardian']['memberId'], guardian.member_id)
+        self.assertEqual(doc['membersById'][old.member_id]['phone'], '123')
+        self.assertEqual(self.engine.pending(), 0)
+
+    def test_legacy_members_array_is_converted_to_keyed_map(self):
+        house = self.create_house(0)
+        self.client.docs['fam0']['members'][0]['photoUrl'] = 'old.jpg'
+        old = create_member(house, 'Old', surname='Member')
+        other = create_member(house, 'Other', date_of_birth=datetime.date(1995, 1, 1))
+        self.engine.enqueue_member(old.pk)
+
+        self.engine.flush()
+
+        entries = self.client.docs['fam0']['membersById']
+        self.assertEqual(set(entries), {old.member_id, other.member_id})
+        self.assertEqual(entries[old.member_id]['photoUrl'], 'old.jpg')
+        self.assertNotIn('members', self.client.docs['fam0'])
+
+    def test_member_change_touches_only_its_own_entry(self):
+        house = self.create_house(0)
+        first = create_member(house, 'First')
+        second = create_member(house, 'Second')
+        self.client.docs['fam0']['membersById'] = {first.member_id: {'memberId': first.member_id, 'fullName': 'First'}}
+        self.engine.enqueue_member(second.pk)
+
+        batches = []
+        original_batch = self.client.batch
+        self.client.batch = lambda: batches.append(original_batch()) or batches[-1]
+        self.engine.flush()
+
+        [(_, data)] = batches[0].writes
+        self.assertEqual(list(data), [f'membersById.{second.member_id}'])
+        self.assertEqual(set(self.client.docs['fam0']['membersById']), {first.member_id, second.member_id})
+
+    def keyed_family(self, index, *names):
+        house = self.create_house(index)
+        members = [create_member(house, name) for name in names]
+        self.client.docs[house.firebase_id] = {
+            'membersById': {member.member_id: {'memberId': member.member_id, 'fullName': member.name} for member in members}
+        }
+        return house, members
+
+    def test_deleted_member_is_removed_from_the_map(self):
+        house, (stays, leaves) = self.keyed_family(0, 'Stays', 'Leaves')
+        member_id = leaves.member_id
+        leaves.delete()
+        self.engine.enqueue_member_removal(house.pk, member_id)
+
+        self.engine.flush()
+
+        self.assertEqual(set(self.client.docs['fam0']['membersById']), {stays.member_id})
+
+    def test_moved_member_leaves_the_old_family_and_joins_the_new_one(self):
+        old_house, (mover,) = self.keyed_family(0, 'Mover')
+        new_house, _ = self.keyed_family(1)
+        mover.house = new_house
+        mover.save()
+        self.engine.enqueue_member_removal(old_house.pk, mover.member_id)
+        self.engine.enqueue_member(mover.pk)
+
+        self.engine.flush()
+
+        self.assertEqual(self.client.docs['fam0']['membersById'], {})
+        self.assertEqual(set(self.client.docs['fam1']['membersById']), {mover.member_id})
+
+    def test_member_promoted_to_guardian_leaves_the_map(self):
+        _, (member, other) = self.keyed_family(0, 'Promoted', 'Other')
+        member.isGuardian = True
+        member.save()
+        self.engine.enqueue_member(member.pk)
+
+        self.engine.flush()
+
+        doc = self.client.docs['fam0']
+        self.assertEqual(set(doc['membersById']), {other.member_id})
+        self.assertEqual(doc['guardian']['memberId'], member.member_id)
+
+    def test_writes_are_split_into_batches_and_missing_documents_skipped(self):
+        houses = [self.create_house(index) for index in range(5)]
+        del self.client.docs['fam4']
+        for house in houses:
+            self.engine.enqueue_house(house.pk)
+
+        result = self.engine.flush()
+
+        self.assertEqual(result['documents'], 4)
+        self.assertEqual(result['missing'], ['fam4'])
+        self.assertEqual(self.client.commits, [2, 2])
+
+
+    def test_failed_flush_requeues_its_changes(self):
+        houses = [self.create_house(index) for index in range(3)]
+        self.engine.enqueue_house(houses[0].pk)
+        self.engine.enqueue_house(houses[1].pk)
+        self.client.failing_commits = 1
+
+        with self.assertRaises(ConnectionError):
+            self.engine.flush()
+        self.assertEqual(self.engine.pending(), 2)
+
+        self.engine.enqueue_house(houses[2].pk)
+        result = self.engine.flush()
+
+        self.assertEqual(result['documents'], 3)
+        self.assertEqual(self.engine.pending(), 0)
+        self.assertEqual({self.client.docs[f'fam{index}']['houseName'] for index in range(3)},
+                         {'House 0', 'House 1', 'House 2'})
+
+    def restarted_engine(self):
+        return FirestoreSyncEngine(client_factory=lambda: self.client, delay=None, delete_field=FakeFirestore.DELETE_FIELD)
+
+    def test_recover_requeues_families_changed_since_the_last_flush(self):
+        house, (stays, leaves) = self.keyed_family(0, 'Stays', 'Leaves')
+        # The first run starts tracking at the current watermark
+        self.assertEqual(self.engine.recover(), 0)
+        self.engine.enqueue_house(house.pk)
+        self.engine.flush()
+
+        # Changes that were still queued in memory when the process stopped
+        Member.objects.filter(pk=stays.pk).update(name='Renamed')
+        leaves.delete()
+        restarted = self.restarted_engine()
+        self.assertEqual(restarted.recover(), 1)
+        restarted.flush()
+
+        entries = self.client.docs['fam0']['membersById']
+        self.assertEqual(set(entries), {stays.member_id})
+        self.assertEqual(entries[stays.member_id]['fullName'], 'Renamed')
+        self.assertEqual(self.restarted_engine().recover(), 0)
+
+    def test_failed_flush_keeps_the_cursor(self):
+        house = self.create_house(0)
+        self.engine.recover()
+        house.house_name = 'Renamed'
+        house.save()
+        self.engine.enqueue_house(house.pk)
+        self.client.failing_commits = 1
+        with self.assertRaises(ConnectionError):
+            self.engine.flush()
+
+        restarted = self.restarted_engine()
+        self.assertEqual(restarted.recover(), 1)
+        restarted.flush()
+        self.assertEqual(self.client.docs['fam0']['houseName'], 'Renamed')
+
+class FirestoreSignalTests(FamilyFixture, TestCase):
+    """Model saves and deletes queue Firestore changes through the sync wrappers"""
+
+    def setUp(self):
+        self.client = FakeFirestore()
+        self.engine = FirestoreSyncEngine(
+            client_factory=lambda: self.client, delay=None, delete_field=FakeFirestore.DELETE_FIELD
+        )
+        patcher = mock.patch.object(firebase_service, 'sync_engine', self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.families = [create_house(self.area, f'Family {index}', firebase_id=f'fam{index}') for index in range(2)]
+        for house in self.families:
+            self.client.docs[house.firebase_id] = {'membersById': {}}
+
+    def committed(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = change()
+        self.engine.flush()
+        return result
+
+    def test_house_save_is_synced(self):
+        house = self.families[0]
+        house.house_name = 'Renamed'
+        self.committed(house.save)
+        self.assertEqual(self.client.docs['fam0']['houseName'], 'Renamed')
+
+    def test_member_create_move_and_delete_are_synced(self):
+        old, new = self.families
+        member = self.committed(lambda: create_member(old, 'Mover'))
+        self.assertEqual(set(self.client.docs['fam0']['membersById']), {member.member_id})
+
+        member.house = new
+        self.committed(member.save)
+        self.assertEqual(self.client.docs['fam0']['membersById'], {})
+        self.assertEqual(set(self.client.docs['fam1']['membersById']), {member.member_id})
+
+        self.committed(member.delete)
+        self.assertEqual(self.client.docs['fam1']['membersById'], {})
+
+    def test_unlinked_houses_and_rolled_back_changes_are_not_queued(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_member(self.house, 'Unlinked')
+            try:
+                with transaction.atomic():
+                    self.families[0].save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(self.engine.pending(), 0)
+
+
+class ObligationAssignTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ('One', 'Two'):
+            create_member(cls.house, name)
+        cls.subcollection = create_subcollection()
+
+    def assign(self, **data):
+        return self.client.post(
+            '/api/obligations/assign/', {'subcollection': self.subcollection.id, **data}, format='json'
+        )
+
+    def test_invalid_input_is_rejected_before_inserting(self):
+        for data in ({'amount': 'NaN'}, {'amount': -5}, {'amount': 'abc'},
+                     {'paid_status': 'bogus'}, {'area': 'x'}, {'status': 'unknown'}):
+            response = self.assign(**data)
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(MemberObligation.objects.count(), 0)
+
+    def test_assigns_each_member_once_and_logs_against_subcollection(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.assign(area=str(self.area.id), amount='50')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'matched': 2, 'created': 2, 'already_assigned': 0})
+        self.assertEqual(set(MemberObligation.objects.values_list('amount', flat=True)), {50})
+
+        response = self.assign()
+        self.assertEqual(response.data, {'matched': 2, 'created': 0, 'already_assigned': 2})
+
+        action = RecentAction.objects.get(model_name='SubCollection')
+        self.assertEqual(action.object_id, str(self.subcollection.id))
+        self.assertEqual(action.fields_changed, {'rows': 2})
+
+
+class ObligationBulkPayTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        subcollection = create_subcollection()
+        cls.obligations = {
+            paid_status: [
+                MemberObligation.objects.create(
+                    member=create_member(cls.house, f'{paid_status} {i}'), subcollection=subcollection,
+                    amount=100, paid_status=paid_status
+                ).id
+                for i in range(count)
+            ]
+            for paid_status, count in (('pending', 3), ('overdue', 2), ('paid', 1))
+        }
+
+    def test_one_summary_entry_and_consistent_counters(self):
+        counters.reconcile()
+        untouched = self.obligations['pending'].pop()
+        ids = [pk for pks in self.obligations.values() for pk in pks]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/obligations/bulk_pay/', {'obligation_ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated_count'], 5)
+
+        action = RecentAction.objects.get()
+        self.assertEqual((action.model_name, action.object_id, action.action_type), ('Obligation', 'bulk', 'UPDATE'))
+        self.assertEqual(action.fields_changed, {
+            'rows': 5,
+            'ids': sorted(ids),
+            'paid_status': {'old': {'pending': 2, 'overdue': 2, 'paid': 1}, 'new': 'paid'},
+        })
+        self.assertEqual(MemberObligation.objects.get(pk=untouched).paid_status, 'pending')
+
+        incremental = counters.snapshot()
+        counters.reconcile()
+        self.assertEqual(incremental, counters.snapshot())
+
+
+class ObligationListTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.subcollection = create_subcollection()
+        cls.member = create_member(cls.house, 'Rahim', surname='Khan', photo='members/photos/rahim.jpg')
+        MemberObligation.objects.create(member=cls.member, subcollection=cls.subcollection, amount=100)
+
+    def setUp(self):
+        # The first request starts the job runner; keep it out of the counts
+        self.client.get('/api/obligations/search/')
+
+    def add_obligations(self, count):
+        for index in range(count):
+            member = create_member(self.house, f'Member {index}')
+            MemberObligation.objects.create(
+                member=member, subcollection=self.subcollection, amount=50, paid_status='overdue'
+            )
+
+    def test_list_and_search_cost_one_query_however_many_rows(self):
+        requests = (('/api/obligations/', {}), ('/api/obligations/search/', {'subcollection': self.subcollection.id}))
+        for url, params in requests:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as few:
+                self.client.get(url, params)
+            self.assertEqual(len(few), 1)
+        self.add_obligations(5)
+        for url, params in requests:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as many:
+                response = self.client.get(url, params)
+            self.assertEqual(len(many), 1)
+            self.assertEqual(len(response.data), 6)
+        # only() keeps the member's other columns (photo, free text) out of the query
+        self.assertNotIn('"society_member"."photo"', many[0]['sql'])
+        self.assertNotIn('"society_house"."address"', many[0]['sql'])
+
+    def test_rows_are_flat(self):
+        response = self.client.get('/api/obligations/search/', {'search': 'rahim'})
+        [row] = response.data
+        created_at, updated_at = row.pop('created_at'), row.pop('updated_at')
+        self.assertTrue(created_at and updated_at)
+        self.assertEqual(row, {
+            'id': MemberObligation.objects.get(member=self.member).id,
+            'member': self.member.member_id,
+            'member_name': 'Rahim',
+            'member_surname': 'Khan',
+            'house_name': 'House',
+            'subcollection': self.subcollection.id,
+            'subcollection_name': 'Eid 2025',
+            'subcollection_year': '2025',
+            'area': self.area.id,
+            'area_name': 'Area',
+            'amount': '100.00',
+            'paid_status': 'pending',
+        })
+
+
+class ObligationStatisticsTests(TestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = Collection.objects.create(name='Eid')
+        for year in ('2024', '2025'):
+            create_subcollection(cls.collection, year)
+
+    def test_collection_must_be_an_id(self):
+        response = self.client.get('/api/obligations/statistics/', {'collection': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_collection_returns_every_subcollection(self):
+        response = self.client.get('/api/obligations/statistics/', {'collection': str(self.collection.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['subcollections']), 2)
+
+
+class RecentActionPaginationTests(TestCase):
+    client_class = APIClient
+
+    def test_pages_cover_actions_sharing_a_timestamp_exactly_once(self):
+        RecentAction.objects.bulk_create(
+            RecentAction(model_name='Member', object_id=str(i), action_type='UPDATE', description='')
+            for i in range(7)
+        )
+        RecentAction.objects.update(timestamp=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc))
+
+        seen = []
+        url = '/api/recent-actions/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(action['id'] for action in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted(RecentAction.objects.values_list('id', flat=True), reverse=True))
+
+
+class AuditBatchingTests(TransactionTestCase):
+    def recent_action_inserts(self, queries):
+        return [q for q in queries if q['sql'].startswith('INSERT INTO "society_recentaction"')]
+
+    def test_committed_entries_are_written_with_one_insert_outside_a_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                for i in range(3):
+                    audit.record('Member', i, 'UPDATE', f'Member {i} updated')
+        self.assertEqual(len(self.recent_action_inserts(queries)), 1)
+        self.assertEqual(RecentAction.objects.count(), 3)
+
+    def test_rolled_back_savepoint_entries_are_dropped(self):
+        with transaction.atomic():
+            audit.record('Member', 'kept-1', 'UPDATE', 'kept')
+            try:
+                with transaction.atomic():
+                    audit.record('Member', 'dropped', 'UPDATE', 'dropped')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            audit.record('Member', 'kept-2', 'UPDATE', 'kept')
+            with transaction.atomic():
+                audit.record('Member', 'kept-3', 'UPDATE', 'kept')
+        self.assertEqual(
+            sorted(RecentAction.objects.values_list('object_id', flat=True)), ['kept-1', 'kept-2', 'kept-3']
+        )
+
+    def test_commit_after_a_rolled_back_transaction_writes_all_its_entries(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                for i in range(5):
+                    audit.record('Member', f'dropped-{i}', 'UPDATE', 'dropped')
+                raise RuntimeError
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                with transaction.atomic():
+                    audit.record('Member', 'kept-1', 'UPDATE', 'kept')
+                audit.record('Member', 'kept-2', 'UPDATE', 'kept')
+        self.assertEqual(len(self.recent_action_inserts(queries)), 1)
+        self.assertEqual(sorted(RecentAction.objects.values_list('object_id', flat=True)), ['kept-1', 'kept-2'])
+        self.assertEqual(audit._stack('committed'), [])
+
+    def test_nested_savepoints_keep_only_surviving_entries(self):
+        with transaction.atomic():
+            audit.record('Member', 'outer', 'UPDATE', 'kept')
+            with transaction.atomic():
+                audit.record('Member', 'savepoint', 'UPDATE', 'kept')
+                try:
+                    with transaction.atomic():
+                        audit.record('Member', 'nested', 'UPDATE', 'dropped')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                with transaction.atomic():
+                    audit.record('Member', 'nested-kept', 'UPDATE', 'kept')
+        with transaction.atomic():
+            with transaction.atomic():
+                audit.record('Member', 'next', 'UPDATE', 'kept')
+        self.assertEqual(
+            sorted(RecentAction.objects.values_list('object_id', flat=True)),
+            ['nested-kept', 'next', 'outer', 'savepoint'],
+        )
+        self.assertEqual(audit._stack('committed'), [])
+
+    def test_bulk_operation_replaces_per_row_entries_with_one_summary(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic(), audit.bulk_operation('Member', 'bulk', 'UPDATE', 'Members renamed') as summary:
+                for i in range(3):
+                    audit.record('Member', i, 'UPDATE', f'Member {i} updated')
+                summary.fields_changed['reason'] = 'import'
+        self.assertEqual(len(self.recent_action_inserts(queries)), 1)
+        action = RecentAction.objects.get()
+        self.assertEqual((action.object_id, action.description), ('bulk', 'Members renamed'))
+        self.assertEqual(action.fields_changed, {'rows': 3, 'reason': 'import'})
+
+    def test_bulk_operation_that_fails_or_touches_nothing_records_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic(), audit.bulk_operation('Member', 'bulk', 'UPDATE'):
+                audit.record('Member', 1, 'UPDATE', 'updated')
+                raise RuntimeError
+        with audit.bulk_operation('Member', 'bulk', 'UPDATE'):
+            pass
+        audit.record('Member', 'after', 'UPDATE', 'updated')
+        self.assertEqual(list(RecentAction.objects.values_list('object_id', flat=True)), ['after'])
+
+    def test_rolled_back_transaction_writes_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                audit.record('Member', 'dropped', 'UPDATE', 'dropped')
+                raise RuntimeError
+        audit.record('Member', 'kept', 'UPDATE', 'kept')
+        self.assertEqual(list(RecentAction.objects.values_list('object_id', flat=True)), ['kept'])
+
+
+class JobTests(TestCase):
+    client_class = APIClient
+
+    def test_import_is_not_a_job_kind(self):
+        response = self.client.post('/api/jobs/', {'kind': 'import_data'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_export_jobs_get_a_file(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(JOBS_DIR=os.path.join(tmp, 'jobs')):
+            response = self.client.post('/api/jobs/', {'kind': 'firebase_sync'}, format='json')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(Job.objects.get(pk=response.data['id']).params, {})
+            self.assertFalse(os.path.exists(settings.JOBS_DIR))
+
+            response = self.client.post('/api/jobs/', {'kind': 'export_data'}, format='json')
+            self.assertRegex(Job.objects.get(pk=response.data['id']).params['filename'], r'^mahall_data_[0-9a-f]{32}\.zip$')
+
+    def test_import_is_refused_while_jobs_are_active(self):
+        Job.objects.create(kind='export_data', status='running')
+        upload = SimpleUploadedFile('data.zip', b'', content_type='application/zip')
+        response = self.client.post('/api/obligations/import_data/', {'zip_file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 409)
+
+
+class JobRunnerTests(TransactionTestCase):
+    def test_handler_audit_entries_are_written_together(self):
+        self.addCleanup(jobs._handlers.pop, 'test_audit', None)
+
+        @jobs.register('test_audit')
+        def handler(params, progress):
+            for i in range(3):
+                audit.record('Member', i, 'UPDATE', 'updated')
+            return {}
+
+        job = Job.objects.create(kind='test_audit')
+        with mock.patch.object(jobs.connection, 'close'):
+            with CaptureQueriesContext(connection) as queries:
+                jobs._execute(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "society_recentaction"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(RecentAction.objects.count(), 3)
+
+
+class TrackedFieldsTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.member = create_member(cls.house, 'Old', surname='Before')
+
+    def saved_changes(self, instance, model_name='Member'):
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+        return RecentAction.objects.filter(model_name=model_name, action_type='UPDATE').latest('id').fields_changed
+
+    def test_refresh_after_queryset_update_diffs_against_the_current_row(self):
+        member = Member.objects.get(pk=self.member.pk)
+        Member.objects.filter(pk=member.pk).update(surname='After')
+        member.refresh_from_db()
+        member.name = 'New'
+        self.assertEqual(self.saved_changes(member), {'name': {'old': 'Old', 'new': 'New'}})
+
+    def test_house_update(self):
+        house = House.objects.get(pk=self.house.pk)
+        house.house_name = 'Renamed'
+        house.location_name = 'Elsewhere'
+        self.assertEqual(self.saved_changes(house, 'House'), {
+            'house_name': {'old': 'House', 'new': 'Renamed'},
+            'location_name': {'old': 'Location', 'new': 'Elsewhere'},
+        })
+
+    def test_member_update(self):
+        other = create_house(self.area, 'Other')
+        member = Member.objects.get(pk=self.member.pk)
+        member.house = other
+        member.date_of_birth = datetime.date(1991, 2, 3)
+        member.isGuardian = True
+        self.assertEqual(self.saved_changes(member), {
+            'house': {'old': self.house.home_id, 'new': other.home_id},
+            'date_of_birth': {'old': '1990-01-01', 'new': '1991-02-03'},
+            'isGuardian': {'old': 'False', 'new': 'True'},
+        })
+
+    def test_obligation_update(self):
+        obligation = MemberObligation.objects.create(
+            member=self.member, subcollection=create_subcollection(), amount=Decimal('100.00')
+        )
+        obligation = MemberObligation.objects.get(pk=obligation.pk)
+        obligation.amount = Decimal('150.00')
+        obligation.paid_status = 'partial'
+        self.assertEqual(self.saved_changes(obligation, 'Obligation'), {
+            'amount': {'old': '100.00', 'new': '150.00'},
+            'paid_status': {'old': 'pending', 'new': 'partial'},
+        })
+
+    def test_created_instance_saved_twice(self):
+        # Never loaded through from_db: the snapshot comes from create() and each save()
+        member = create_member(self.house, 'Fresh', date_of_birth='1990-01-01')
+        member.name = 'Renamed'
+        self.assertEqual(self.saved_changes(member), {'name': {'old': 'Fresh', 'new': 'Renamed'}})
+        member.surname = 'Second'
+        self.assertEqual(self.saved_changes(member), {'surname': {'old': '', 'new': 'Second'}})
+
+
+class SuggestionTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.member = create_member(cls.house, 'Rahim')
+
+    def setUp(self):
+        search_index.clear_caches()
+
+    def test_cache_follows_queryset_updates(self):
+        self.assertEqual([s['name'] for s in search_index.suggest_members('Rah')], ['Rahim'])
+        Member.objects.filter(pk=self.member.pk).update(name='Karim')
+        self.assertEqual(search_index.suggest_members('Rah'), [])
+        self.assertEqual([s['name'] for s in search_index.suggest_members('Kar')], ['Karim'])
+
+    def test_cache_follows_updates_to_members_without_a_house(self):
+        member = Member.objects.create(name='Hamid', date_of_birth=datetime.date(1990, 1, 1))
+        self.assertEqual([s['name'] for s in search_index.suggest_members('Ham')], ['Hamid'])
+        Member.objects.filter(pk=member.pk).update(name='Zahid')
+        self.assertEqual(search_index.suggest_members('Ham'), [])
+
+    def test_best_ranked_candidates_are_kept(self):
+        for i in range(search_index.SUGGEST_CANDIDATES + 5):
+            create_member(self.house, f'Rahman {i}', surname='Rahman Rahman')
+        best = create_member(self.house, 'Zed', surname='Rahman')
+        Member.objects.filter(pk=best.pk).update(name='Rahman', surname='Rahman Rahman Rahman')
+        self.assertEqual(search_index.suggest_members('Rahman', limit=1)[0]['id'], best.member_id)
+
+
+class SearchIndexTests(FamilyFixture, TestCase):
+    def setUp(self):
+        search_index.clear_caches()
+
+    def member_names(self, text):
+        return [member.name for member in search_index.search_members(Member.objects.all(), text)]
+
+    def house_names(self, text):
+        return [house.house_name for house in search_index.search_houses(House.objects.all(), text)]
+
+    def test_index_follows_inserts_and_updates(self):
+        member = create_member(self.house, 'Rahim', surname='Kutty')
+        house = create_house(self.area, 'Rosewood')
+        self.assertEqual(self.member_names('rah kut'), ['Rahim'])
+        self.assertEqual(self.house_names('rose'), ['Rosewood'])
+
+        member.name = 'Karim'
+        member.save()
+        House.objects.filter(pk=house.pk).update(house_name='Hillside')
+        self.assertEqual(self.member_names('rah'), [])
+        self.assertEqual(self.member_names('kar'), ['Karim'])
+        self.assertEqual(self.house_names('rose'), [])
+        self.assertEqual(self.house_names('hill'), ['Hillside'])
+
+    def test_house_rename_reindexes_its_members(self):
+        create_member(self.house, 'Rahim')
+        House.objects.filter(pk=self.house.pk).update(house_name='Thekkeppuram')
+        self.assertEqual(self.member_names('thekke'), ['Rahim'])
+
+    def test_malayalam_text(self):
+        create_member(self.house, 'മുഹമ്മദ്', surname='കുട്ടി')
+        create_house(self.area, 'പുത്തൻപുര')
+        self.assertEqual(self.member_names('മുഹ'), ['മുഹമ്മദ്'])
+        self.assertEqual(self.member_names('മുഹമ്മദ് കുട്ടി'), ['മുഹമ്മദ്'])
+        # A fragment after a vowel sign is not the start of a word
+        self.assertEqual(self.member_names('ഹമ'), [])
+        self.assertEqual(self.house_names('പുത്ത'), ['പുത്തൻപുര'])
+
+    def test_stronger_matches_rank_first(self):
+        create_member(self.house, 'Weak', surname='Rahman Kutty Ali Hassan')
+        create_member(self.house, 'Rahman', surname='Rahman')
+        create_member(self.house, 'Middle', surname='Rahman')
+        self.assertEqual(self.member_names('rahman'), ['Rahman', 'Middle', 'Weak'])
+
+    def test_falls_back_to_icontains_without_the_index(self):
+        create_member(self.house, 'Rahim', surname='Kutty')
+        create_house(self.area, 'Rosewood')
+        with mock.patch.object(search_index, 'is_available', return_value=False):
+            members = search_index.search_members(Member.objects.all(), 'him')
+            houses = search_index.search_houses(House.objects.all(), 'wood')
+            self.assertNotIn('MATCH', str(members.query))
+            self.assertEqual([member.name for member in members], ['Rahim'])
+            self.assertEqual([house.house_name for house in houses], ['Rosewood'])
+
+    def test_text_without_words_falls_back(self):
+        self.assertIsNone(search_index.build_match_query('- !'))
+        self.assertEqual(self.house_names('-'), [])
+
+
+class KinshipTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.grandfather = create_member(cls.house, 'Grandfather')
+        cls.parent = create_member(cls.house, 'Parent', father=cls.grandfather)
+        cls.child = create_member(cls.house, 'Child', father=cls.parent)
+
+    def member(self, name, **parents):
+        return create_member(self.house, name, **parents)
+
+    def ancestor_names(self, member):
+        return [link.ancestor.name for link in kinship.ancestors(member)]
+
+    def test_unlinking_a_parent_cuts_the_lineage(self):
+        self.parent.father = None
+        self.parent.save()
+        self.assertEqual(self.ancestor_names(self.child), ['Parent'])
+        self.assertFalse(kinship.descendants(self.grandfather).exists())
+
+    def test_deleting_a_member_detaches_its_children(self):
+        self.parent.delete()
+        self.assertEqual(self.ancestor_names(self.child), [])
+        self.assertFalse(kinship.descendants(self.grandfather).exists())
+
+    def test_reparenting_moves_the_subtree(self):
+        other = self.member('Other')
+        self.parent.father = other
+        self.parent.save()
+        self.assertEqual(self.ancestor_names(self.child), ['Parent', 'Other'])
+        self.assertEqual([link.descendant.name for link in kinship.descendants(other)], ['Parent', 'Child'])
+
+    def test_rebuild_catches_up_with_queryset_updates(self):
+        Member.objects.filter(pk=self.parent.pk).update(father=None)
+        kinship.rebuild()
+        self.assertEqual(self.ancestor_names(self.child), ['Parent'])
+
+    def common_ancestor_names(self, member, other):
+        names = dict(Member.objects.values_list('id', 'name'))
+        return [(names[pk], depth, other_depth) for pk, depth, other_depth in kinship.common_ancestors(member, other)]
+
+    def kinship_response(self, member, **params):
+        response = self.client.get(f'/api/members/{member.member_id}/kinship/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_common_ancestors(self):
+        uncle = self.member('Uncle', father=self.grandfather)
+        cousin = create_member(create_house(self.area, 'Other'), 'Cousin', father=uncle)
+        stranger = self.member('Stranger')
+
+        self.assertEqual(self.common_ancestor_names(self.child, cousin), [('Grandfather', 2, 2)])
+        self.assertEqual(self.common_ancestor_names(cousin, self.child), [('Grandfather', 2, 2)])
+        self.assertEqual(
+            self.common_ancestor_names(self.child, self.parent), [('Parent', 1, 0), ('Grandfather', 2, 1)]
+        )
+        self.assertEqual(self.common_ancestor_names(self.child, stranger), [])
+
+    def test_kinship_endpoint_with_another_member(self):
+        uncle = self.member('Uncle', father=self.grandfather)
+        cousin = create_member(create_house(self.area, 'Other'), 'Cousin', father=uncle)
+
+        data = self.kinship_response(self.child, **{'with': cousin.member_id})
+        self.assertEqual(data, {'related': True, 'common_ancestors': [{
+            'id': self.grandfather.member_id, 'name': 'Grandfather', 'surname': '',
+            'generations_from_member': 2, 'generations_from_other': 2,
+        }]})
+
+        data = self.kinship_response(self.child, **{'with': self.member('Stranger').member_id})
+        self.assertEqual(data, {'related': False, 'common_ancestors': []})
+
+        response = self.client.get(f'/api/members/{self.child.member_id}/kinship/', {'with': 'missing'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_kinship_endpoint_lists_ancestors_and_descendants(self):
+        data = self.kinship_response(self.parent)
+        self.assertEqual([(row['name'], row['generations']) for row in data['ancestors']], [('Grandfather', 1)])
+        self.assertEqual([(row['name'], row['generations']) for row in data['descendants']], [('Child', 1)])
+
+        data = self.kinship_response(self.grandfather, depth=1)
+        self.assertEqual([row['name'] for row in data['descendants']], ['Parent'])
+        self.assertEqual(data['ancestors'], [])
+
+        response = self.client.get(f'/api/members/{self.child.member_id}/kinship/', {'depth': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FamilyTreeApiTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.grandfather = create_member(cls.house, 'Grandfather', gender='male')
+        cls.grandmother = create_member(cls.house, 'Grandmother', gender='female', married_to=cls.grandfather)
+        cls.parent = create_member(cls.house, 'Parent', father=cls.grandfather, mother=cls.grandmother)
+        cls.child = create_member(cls.house, 'Child', surname='Kutty', father=cls.parent)
+        cls.spouse = create_member(create_house(cls.area, 'Other'), 'Spouse', married_to=cls.child)
+        create_member(cls.house, 'Unrelated')
+
+    def tree(self, member, **params):
+        response = self.client.get(f'/api/members/{member.member_id}/tree/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_three_generation_tree(self):
+        data = self.tree(self.child)
+        names = {node['id']: node['name'] for node in data['nodes']}
+
+        self.assertEqual((data['root'], data['up'], data['down']), (self.child.member_id, 2, 2))
+        self.assertEqual(
+            {node['name']: node['generation'] for node in data['nodes']},
+            {'Grandfather': -2, 'Grandmother': -2, 'Parent': -1, 'Child': 0, 'Spouse': 0}
+        )
+        self.assertEqual([node['generation'] for node in data['nodes']], [-2, -2, -1, 0, 0])
+        self.assertEqual(next(node for node in data['nodes'] if node['name'] == 'Child'), {
+            'id': self.child.member_id, 'name': 'Child', 'surname': 'Kutty', 'gender': None, 'status': 'live',
+            'date_of_birth': '1990-01-01', 'house': self.house.home_id, 'generation': 0,
+        })
+        # Spouse edges are undirected and listed once per couple
+        self.assertCountEqual(
+            [
+                (*sorted((names[edge['from']], names[edge['to']])), edge['type']) if edge['type'] == 'spouse'
+                else (names[edge['from']], names[edge['to']], edge['type'])
+                for edge in data['edges']
+            ],
+            [
+                ('Grandfather', 'Parent', 'father'),
+                ('Grandmother', 'Parent', 'mother'),
+                ('Parent', 'Child', 'father'),
+                ('Grandfather', 'Grandmother', 'spouse'),
+                ('Child', 'Spouse', 'spouse'),
+            ]
+        )
+
+    def test_depth_limits(self):
+        data = self.tree(self.parent, up=0, down=1)
+        self.assertEqual(
+            {node['name']: node['generation'] for node in data['nodes']},
+            {'Parent': 0, 'Child': 1, 'Spouse': 1}
+        )
+        self.assertEqual((data['up'], data['down']), (0, 1))
+
+        data = self.tree(self.grandfather, down=99)
+        self.assertEqual(data['down'], kinship.MAX_TREE_DEPTH)
+        self.assertEqual(len(data['nodes']), 5)
+
+    def test_invalid_depth(self):
+        response = self.client.get(f'/api/members/{self.child.member_id}/tree/', {'up': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CounterDriftTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.members = [create_member(cls.house, f'Member {i}') for i in range(4)]
+        collection = Collection.objects.create(name='Eid')
+        cls.subcollections = [create_subcollection(collection, year) for year in ('2024', '2025')]
+
+    def test_counters_match_a_full_reconcile_after_bulk_paths(self):
+        counters.reconcile()
+        response = self.client.post('/api/obligations/bulk_create/', {'obligations': [
+            {'member': m.member_id, 'subcollection': self.subcollections[0].id, 'amount': '100'}
+            for m in self.members
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.post('/api/obligations/assign/', {
+            'subcollection': self.subcollections[1].id, 'paid_status': 'overdue'
+        }, format='json')
+        paid = list(MemberObligation.objects.values_list('id', flat=True)[:3])
+        self.client.patch('/api/obligations/bulk_pay/', {'obligation_ids': paid}, format='json')
+        self.members[0].delete()
+        self.subcollections[1].delete()
+        Member.objects.filter(pk=self.members[1].pk).first().delete()
+
+        incremental = counters.snapshot()
+        counters.reconcile()
+        self.assertEqual(incremental, counters.snapshot())
+        self.assertEqual(incremental['obligations_count'], MemberObligation.objects.count())
+
+
+class IdSequenceTests(FamilyFixture, TestCase):
+    def member(self, **kwargs):
+        return create_member(self.house, **kwargs)
+
+    def test_explicit_ids_advance_the_sequence_by_numeric_value(self):
+        self.member(member_id='999')
+        self.member(member_id='10000')
+        self.member(member_id='X-77')
+        self.assertEqual(self.member().member_id, '10001')
+
+    def test_explicit_id_below_the_sequence_leaves_it_alone(self):
+        first = self.member()
+        self.member(member_id='1000')
+        self.assertEqual(int(self.member().member_id), int(first.member_id) + 1)
+
+    def test_changing_an_id_advances_the_sequence(self):
+        house = House.objects.get(pk=self.house.pk)
+        house.home_id = '7000'
+        house.save()
+        self.assertEqual(create_house(self.area, 'Next').home_id, '7001')
+
+    def test_catch_up_covers_ids_written_without_save(self):
+        member = self.member()
+        Member.objects.filter(pk=member.pk).update(member_id='20000')
+        IdSequence.catch_up()
+        self.assertEqual(self.member().member_id, '20001')
+
+
+class IdSequenceConcurrencyTests(TransactionTestCase):
+    def test_concurrent_explicit_and_generated_ids_never_collide(self):
+        IdSequence.objects.update_or_create(name='member', defaults={'last_value': 1000})
+        explicit = [str(thread * 100000 + i * 1000) for thread in (1, 2) for i in range(10)]
+        generated = []
+        errors = []
+
+        def retry(call, *args):
+            # The shared-cache in-memory test database has no busy timeout; wait for the lock here
+            while True:
+                try:
+                    return call(*args)
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.001)
+
+        def worker(thread):
+            try:
+                for i in range(10):
+                    if thread:
+                        retry(IdSequence.advance, 'member', str(thread * 100000 + i * 1000))
+                    else:
+                        generated.extend(retry(IdSequence.reserve, 'member', 2))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(thread,)) for thread in (0, 1, 0, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(generated)), len(generated))
+        # Explicit IDs are spaced so generated ones could only hit them if an advance were lost
+        self.assertFalse(set(generated) & set(explicit))
+        self.assertGreater(int(IdSequence.next_value('member')), max(int(value) for value in explicit + generated))
+
+
+class BulkCreateObligationsTests(FamilyFixture, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.members = [create_member(cls.house, f'Member {i}') for i in range(3)]
+        cls.subcollection = create_subcollection()
+
+    def row(self, member, **overrides):
+        return {'member': member.member_id, 'subcollection': self.subcollection.id, 'amount': '100', **overrides}
+
+    def test_invalid_rows_are_reported_and_valid_rows_created(self):
+        MemberObligation.objects.create(member=self.members[2], subcollection=self.subcollection, amount=100)
+        rows = [
+            self.row(self.members[0]),
+            self.row(self.members[0]),
+            self.row(self.members[1], amount='NaN'),
+            self.row(self.members[1], paid_status='bogus'),
+            self.row(self.members[1], subcollection=self.subcollection.id + 100),
+            {'member': 'missing', 'subcollection': self.subcollection.id, 'amount': '5'},
+            self.row(self.members[2]),
+            'not a row',
+        ]
+
+        created, errors = bulk_create_obligations(rows)
+
+        self.assertEqual([row['member'] for row in created], [self.members[0].member_id])
+        self.assertEqual([list(error['errors']) for error in errors], [
+            ['amount'], ['paid_status'], ['non_field_errors'], ['non_field_errors'],
+            ['subcollection'], ['member'], ['non_field_errors'],
+        ])
+        self.assertEqual(MemberObligation.objects.count(), 2)
+
+    def test_only_rows_actually_inserted_are_counted(self):
+        counters.reconcile()
+        rows = [self.row(member) for member in self.members] + [self.row(self.members[0])]
+        real_bulk_operation = audit.bulk_operation
+
+        @contextmanager
+        def assigned_meanwhile(*args, **kwargs):
+            # Another request assigns members[1] after the rows were validated
+            MemberObligation.objects.create(member=self.members[1], subcollection=self.subcollection, amount=5)
+            with real_bulk_operation(*args, **kwargs) as summary:
+                yield summary
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(audit, 'bulk_operation', assigned_meanwhile):
+                created, errors = bulk_create_obligations(rows)
+
+        inserted = MemberObligation.objects.exclude(member=self.members[1])
+        self.assertEqual(
+            sorted((row['member'], row['id']) for row in created),
+            sorted((obligation.member.member_id, obligation.id) for obligation in inserted)
+        )
+        self.assertEqual([error['data'] for error in errors], [self.row(self.members[0]), self.row(self.members[1])])
+        self.assertEqual(MemberObligation.objects.get(member=self.members[1]).amount, 5)
+        self.assertEqual(
+            RecentAction.objects.get(object_id='bulk').fields_changed,
+            {'rows': 2, 'ids': sorted(inserted.values_list('id', flat=True))}
+        )
+        incremental = counters.snapshot()
+        counters.reconcile()
+        self.assertEqual(incremental, counters.snapshot())
+
+    def test_area_per_row(self):
+        other = Area.objects.create(name='Other')
+        rows = [
+            self.row(self.members[0], area=other.id),
+            self.row(self.members[1]),
+            self.row(self.members[2], area=other.id + 100),
+            self.row(self.members[2], area='x'),
+        ]
+
+        created, errors = bulk_create_obligations(rows)
+
+        self.assertEqual([row['area'] for row in created], [other.id, self.area.id])
+        self.assertEqual(
+            dict(MemberObligation.objects.values_list('member_id', 'area_id')),
+            {self.members[0].id: other.id, self.members[1].id: self.area.id}
+        )
+        self.assertEqual([list(error['errors']) for error in errors], [['area'], ['area']])
+
+    def test_batch_is_logged_as_one_summary_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_create_obligations([self.row(member) for member in self.members])
+        action = RecentAction.objects.get()
+        self.assertEqual((action.model_name, action.object_id, action.action_type), ('Obligation', 'bulk', 'CREATE'))
+        self.assertEqual(action.fields_changed, {
+            'rows': 3, 'ids': sorted(MemberObligation.objects.values_list('id', flat=True)),
+        })
+
+    def test_failure_during_insert_rolls_back_every_row(self):
+        rows = [self.row(member) for member in self.members]
+        with mock.patch.object(counters, 'record_obligations_created', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                bulk_create_obligations(rows)
+        self.assertEqual(MemberObligation.objects.count(), 0)
+
+
+class RetentionTests(TestCase):
+    def action(self, days_ago, pending=False, model_name='Member', action_type='UPDATE'):
+        action = RecentAction.objects.create(
+            model_name=model_name, object_id='1', action_type=action_type, description='',
+            is_sync_pending=pending,
+        )
+        RecentAction.objects.filter(pk=action.pk).update(
+            timestamp=timezone.now() - datetime.timedelta(days=days_ago)
+        )
+        return action
+
+    def test_only_synced_rows_past_the_keep_window_are_folded(self):
+        old = [self.action(100), self.action(100), self.action(100, action_type='DELETE')]
+        old_pending = self.action(100, pending=True)
+        recent = self.action(10)
+
+        removed, summaries = retention.compact(days=90)
+
+        self.assertEqual((removed, summaries), (3, 2))
+        self.assertFalse(RecentAction.objects.filter(pk__in=[action.pk for action in old]).exists())
+        self.assertEqual(RecentAction.objects.filter(pk__in=[old_pending.pk, recent.pk]).count(), 2)
+        daily = {
+            row.action_type: row.fields_changed
+            for row in RecentAction.objects.filter(object_id=retention.SUMMARY_OBJECT_ID)
+        }
+        self.assertEqual(daily, {'UPDATE': {'rows': 2, 'objects': 1}, 'DELETE': {'rows': 1, 'objects': 1}})
+
+        # Summaries are never folded again
+        self.assertEqual(retention.compact(days=90), (0, 0))
+
+    def test_archive_copies_the_folded_rows_and_closes_the_file(self):
+        old = [self.action(100), self.action(100)]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'archive.sqlite3')
+            opened = []
+            sqlite_connect = sqlite3.connect
+
+            def connect(*args):
+                opened.append(sqlite_connect(*args))
+                return opened[-1]
+
+            with mock.patch.object(retention.sqlite3, 'connect', connect):
+                retention.compact(days=90, archive_path=path)
+
+            with self.assertRaises(sqlite3.ProgrammingError):
+                opened[0].execute("SELECT 1")
+            archive_db = sqlite3.connect(path)
+            try:
+                archived = [row[0] for row in archive_db.execute("SELECT id FROM recent_action ORDER BY id")]
+            finally:
+                archive_db.close()
+        self.assertEqual(archived, [action.pk for action in old])
+
+
+class RecentActionBulkAckTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        RecentAction.objects.bulk_create(
+            RecentAction(model_name='Member', object_id=str(i), action_type='UPDATE', description='')
+            for i in range(4)
+        )
+        self.actions = list(RecentAction.objects.order_by('id'))
+        for day, action in enumerate(self.actions, 1):
+            RecentAction.objects.filter(pk=action.pk).update(
+                timestamp=datetime.datetime(2025, 1, day, tzinfo=datetime.timezone.utc)
+            )
+
+    def pending(self):
+        return list(RecentAction.objects.filter(is_sync_pending=True).order_by('id').values_list('id', flat=True))
+
+    def test_acknowledges_listed_ids_that_are_still_pending(self):
+        RecentAction.objects.filter(pk=self.actions[1].pk).update(is_sync_pending=False)
+        ids = [self.actions[0].pk, self.actions[1].pk, self.actions[0].pk + 1000]
+
+        response = self.client.post('/api/recent-actions/bulk_ack/', {'action_ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'updated_count': 1})
+        self.assertEqual(self.pending(), [self.actions[2].pk, self.actions[3].pk])
+
+    def test_acknowledges_everything_up_to_and_including_until(self):
+        response = self.client.post(
+            '/api/recent-actions/bulk_ack/', {'until': '2025-01-02T00:00:00Z'}, format='json'
+        )
+
+        self.assertEqual(response.data, {'updated_count': 2})
+        self.assertEqual(self.pending(), [self.actions[2].pk, self.actions[3].pk])
+
+    def test_rejects_missing_or_malformed_payloads(self):
+        for payload in ({}, {'action_ids': 5}, {'action_ids': ['x']}, {'action_ids': [1, '2']},
+                        {'action_ids': [True]}, {'action_ids': [None]}, {'until': 'yesterday'}):
+            response = self.client.post('/api/recent-actions/bulk_ack/', payload, format='json')
+            self.assertEqual(response.status_code, 400, payload)
+        self.assertEqual(len(self.pending()), 4)
+
+
+class SyncSnapshotTests(FamilyFixture, TestCase):
+    def test_streams_one_payload_per_family_with_the_guardians_pending_obligations(self):
+        house = self.house
+        empty = create_house(self.area, 'Empty')
+        member = create_member(house, 'Child', surname='Khan', date_of_birth=datetime.date(2010, 1, 1))
+        guardian = create_member(
+            house, 'Parent', surname='Khan', date_of_birth=datetime.date(1980, 5, 17),
+            adhar='123456789012', isGuardian=True,
+        )
+        subcollection = create_subcollection()
+        MemberObligation.objects.create(member=guardian, subcollection=subcollection, amount=100)
+        MemberObligation.objects.create(member=member, subcollection=subcollection, amount=50)
+
+        response = self.client.get('/api/sync/snapshot/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['X-Sync-Watermark'], str(change_feed.current_watermark()))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {
+                'docId': house.home_id,
+                'houseId': house.home_id,
+                'houseName': 'House',
+                'guardianName': 'Parent Khan',
+                'guardianDob': '1980-05-17',
+                'guardianAadhaarLast4': '9012',
+                'members': [
+                    {'member_id': member.member_id, 'name': 'Child Khan'},
+                    {'member_id': guardian.member_id, 'name': 'Parent Khan'},
+                ],
+                'obligations': [{'subcollection': 'Eid 2025', 'amount': '100.00'}],
+            },
+            {
+                'docId': empty.home_id,
+                'houseId': empty.home_id,
+                'houseName': 'Empty',
+                'guardianName': '',
+                'guardianDob': '',
+                'guardianAadhaarLast4': '',
+                'members': [],
+            },
+        ])
+
+
+class ChangeFeedTests(FamilyFixture, TestCase):
+
+    def changes(self, since):
+        response = self.client.get(f'/api/sync/changes/?since={since}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_each_write_moves_the_family_above_the_watermark_once(self):
+        first, second = self.house, create_house(self.area, 'Second')
+        member = create_member(first)
+        start = change_feed.current_watermark()
+
+        data = self.changes(0)
+        self.assertEqual([family['houseName'] for family in data['families']], ['House', 'Second'])
+        self.assertEqual((data['watermark'], data['has_more'], data['deleted']), (start, False, []))
+        self.assertEqual(self.changes(start)['families'], [])
+
+        # queryset.update() bypasses save() but not the triggers
+        Member.objects.filter(pk=member.pk).update(name='Renamed')
+        data = self.changes(start)
+        self.assertEqual([family['houseName'] for family in data['families']], ['House'])
+        self.assertEqual(data['watermark'], start + 1)
+
+        Member.objects.filter(pk=member.pk).update(house=second)
+        self.assertEqual(
+            sorted(family['houseName'] for family in self.changes(start + 1)['families']), ['House', 'Second']
+        )
+
+        watermark = change_feed.current_watermark()
+        doc_id = first.home_id
+        first.delete()
+        data = self.changes(watermark)
+        self.assertEqual((data['families'], data['deleted']), ([], [doc_id]))
+        self.assertEqual(data['watermark'], watermark + 1)
+
+    def test_pages_with_limit_and_rejects_bad_parameters(self):
+        for name in ('A', 'B'):
+            create_house(self.area, name)
+
+        first = self.client.get('/api/sync/changes/?since=0&limit=2').data
+        self.assertTrue(first['has_more'])
+        rest = self.changes(first['watermark'])
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(
+            [family['houseName'] for family in first['families'] + rest['families']], ['House', 'A', 'B']
+        )
+
+        self.assertEqual(self.client.get('/api/sync/changes/?since=x').status_code, 400)
+
+
+class DataTransferTests(TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+
+    def site(self, name):
+        """Database path and media root of a separate installation under the temp dir"""
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.join(path, 'media'))
+        return os.path.join(path, 'db.sqlite3'), os.path.join(path, 'media')
+
+    def use(self, db_path, media_root):
+        """Point data_transfer at another installation for the rest of the test step"""
+        return (
+            mock.patch.dict(settings.DATABASES['default'], {'NAME': db_path}),
+            override_settings(MEDIA_ROOT=media_root),
+        )
+
+    def test_export_then_import_restores_database_and_media(self):
+        source_db, source_media = self.site('source')
+        with sqlite3.connect(source_db) as db:
+            db.execute("CREATE TABLE marker (value TEXT)")
+            db.execute("INSERT INTO marker VALUES ('exported')")
+        db.close()
+        os.makedirs(os.path.join(source_media, 'photos'))
+        with open(os.path.join(source_media, 'photos', 'member.jpg'), 'wb') as f:
+            f.write(b'\xff\xd8jpeg')
+        with open(os.path.join(source_media, 'notes.txt'), 'w') as f:
+            f.write('notes ' * 100)
+
+        zip_path = os.path.join(self.root, 'export.zip')
+        patch_db, patch_media = self.use(source_db, source_media)
+        with patch_db, patch_media:
+            self.assertEqual(data_transfer.write_export(zip_path), 2)
+
+        with zipfile.ZipFile(zip_path) as zf:
+            compression = {info.filename: info.compress_type for info in zf.infolist()}
+        self.assertEqual(compression, {
+            'db.sqlite3': zipfile.ZIP_DEFLATED,
+            'photos/member.jpg': zipfile.ZIP_STORED,
+            'notes.txt': zipfile.ZIP_DEFLATED,
+        })
+
+        target_db, target_media = self.site('target')
+        os.makedirs(os.path.join(target_media, 'photos'))
+        with open(os.path.join(target_media, 'photos', 'stale.jpg'), 'wb') as f:
+            f.write(b'stale')
+        patch_db, patch_media = self.use(target_db, target_media)
+        with patch_db, patch_media, mock.patch.object(data_transfer, 'refresh_derived_data') as refresh:
+            data_transfer.import_archive(zip_path)
+
+        refresh.assert_called_once_with()
+        with sqlite3.connect(target_db) as db:
+            self.assertEqual(db.execute("SELECT value FROM marker").fetchall(), [('exported',)])
+        db.close()
+        self.assertEqual(os.listdir(os.path.join(target_media, 'photos')), ['member.jpg'])
+        with open(os.path.join(target_media, 'photos', 'member.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'\xff\xd8jpeg')
+        with open(os.path.join(target_media, 'notes.txt')) as f:
+            self.assertEqual(f.read(), 'notes ' * 100)
+
+
+class BaselineArchiveImportTests(SimpleTestCase):
+    """Import, in a separate process, of an archive exported before the derived tables existed"""
+
+    BASELINE_MIGRATION = '0010'
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+
+    def manage(self, site, *args):
+        """Run manage.py against the installation in ``site`` (its own database file and media root)"""
+        path = os.path.join(self.root, site)
+        os.makedirs(os.path.join(path, 'media'), exist_ok=True)
+        with open(os.path.join(path, f'{site}_settings.py'), 'w') as f:
+            f.write(
+                "from mahall_backend.settings import *\n"
+                f"DATABASES = {{'default': {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': {os.path.join(path, 'db.sqlite3')!r}}}}}\n"
+                f"MEDIA_ROOT = {os.path.join(path, 'media')!r}\n"
+            )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=f'{site}_settings', PYTHONPATH=path)
+        subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *args],
+            env=env, cwd=settings.BASE_DIR, check=True, capture_output=True,
+        )
+        return os.path.join(path, 'db.sqlite3')
+
+    def baseline_archive(self):
+        db_path = self.manage('baseline', 'migrate', 'society', self.BASELINE_MIGRATION)
+        now = '2025-01-01 00:00:00'
+        with closing(sqlite3.connect(db_path)) as db, db:
+            db.execute("INSERT INTO society_area VALUES (1, 'Area', '', ?, ?)", (now, now))
+            db.execute(
+                "INSERT INTO society_house VALUES (1, '1050', 'Rosewood', 'Family', 'Location', 'Address', ?, ?, 1, NULL)",
+                (now, now),
+            )
+            for pk, member_id, name, father_id in ((1, '1200', 'Grandfather', None), (2, '1201', 'Parent', 1),
+                                                   (3, '1202', 'Child', 2)):
+                db.execute(
+                    """INSERT INTO society_member (id, member_id, name, surname, status, date_of_birth, mother_name,
+                        mother_surname, father_name, father_surname, created_at, updated_at, house_id, isGuardian,
+                        general_body_member, married_to_name, married_to_surname, father_id)
+                    VALUES (?, ?, ?, '', 'live', '1990-01-01', '', '', '', '', ?, ?, 1, 0, 0, '', '', ?)""",
+                    (pk, member_id, name, now, now, father_id),
+                )
+        zip_path = os.path.join(self.root, 'baseline.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.write(db_path, 'db.sqlite3')
+            zf.writestr('photos/member.jpg', b'jpeg')
+        return zip_path
+
+    def test_import_migrates_the_archive_before_rebuilding_derived_data(self):
+        zip_path = self.baseline_archive()
+        self.manage('current', 'migrate')
+
+        db_path = self.manage(
+            'current', 'shell', '-c',
+            f"from society.data_transfer import import_archive; import_archive({zip_path!r})",
+        )
+
+        with closing(sqlite3.connect(db_path)) as db:
+            self.assertEqual(
+                db.execute("SELECT MAX(name) FROM django_migrations WHERE app = 'society'").fetchone()[0],
+                max(name[:-3] for name in os.listdir(os.path.dirname(__file__) + '/migrations') if name[0].isdigit()),
+            )
+            # The sequence table is created by migrate and then moved past the imported IDs
+            self.assertEqual(
+                dict(db.execute("SELECT name, last_value FROM society_idsequence")), {'house': 1050, 'member': 1202}
+            )
+            # Three self links plus grandfather-parent, parent-child and grandfather-child
+            self.assertEqual(db.execute("SELECT COUNT(*) FROM society_memberancestry").fetchone()[0], 6)
+            self.assertEqual(
+                db.execute("SELECT rowid FROM society_member_fts WHERE society_member_fts MATCH 'rose*'").fetchall(),
+                [(1,), (2,), (3,)],
+            )
+            self.assertEqual(
+                dict(db.execute("SELECT key, value FROM society_dashboardcounter WHERE key IN ('houses_count', 'members_count')")),
+                {'houses_count': 1, 'members_count': 3},
+            )
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'current', 'media', 'photos', 'member.jpg')))
+
+
+class IncrementalBackupTests(TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        root = temp_dir.name
+        self.repo = os.path.join(root, 'backups')
+        self.db_path = os.path.join(root, 'db.sqlite3')
+        self.media = os.path.join(root, 'media')
+        os.makedirs(os.path.join(self.media, 'photos'))
+        for patcher in (
+            mock.patch.dict(settings.DATABASES['default'], {'NAME': self.db_path}),
+            mock.patch.object(data_transfer, 'refresh_derived_data'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        media_settings = override_settings(MEDIA_ROOT=self.media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def write_media(self, rel, content):
+        with open(os.path.join(self.media, rel), 'wb') as f:
+            f.write(content)
+
+    def set_marker(self, value):
+        with sqlite3.connect(self.db_path) as db:
+            db.execute("CREATE TABLE IF NOT EXISTS marker (value TEXT)")
+            db.execute("DELETE FROM marker")
+            db.execute("INSERT INTO marker VALUES (?)", (value,))
+        db.close()
+
+    def marker(self):
+        with sqlite3.connect(self.db_path) as db:
+            value = db.execute("SELECT value FROM marker").fetchone()[0]
+        db.close()
+        return value
+
+    def media_tree(self):
+        tree = {}
+        for root, dirs, files in os.walk(self.media):
+            for name in files:
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    tree[os.path.relpath(path, self.media).replace(os.sep, '/')] = f.read()
+        return tree
+
+    def blobs(self):
+        return sum(len(files) for root, dirs, files in os.walk(os.path.join(self.repo, 'blobs')))
+
+    def test_snapshots_share_unchanged_blobs_and_restore_their_own_state(self):
+        self.set_marker('first')
+        self.write_media('photos/a.jpg', b'photo a')
+        self.write_media('photos/b.jpg', b'photo b')
+        self.write_media('copy.jpg', b'photo a')
+        first = backup_restore.create_incremental_backup(self.repo)
+        first_tree = self.media_tree()
+        self.assertEqual(self.blobs(), 3)  # database, a, b (copy.jpg shares a's blob)
+
+        self.set_marker('second')
+        os.remove(os.path.join(self.media, 'photos', 'b.jpg'))
+        self.write_media('photos/c.jpg', b'photo c')
+        with mock.patch.object(backup_restore, '_hash_file', wraps=backup_restore._hash_file) as hash_file:
+            second = backup_restore.create_incremental_backup(self.repo)
+        # Unchanged media is matched on size and mtime, not read again
+        self.assertEqual(
+            sorted(os.path.basename(str(call.args[0])) for call in hash_file.call_args_list), ['c.jpg', 'db.sqlite3']
+        )
+        self.assertEqual(self.blobs(), 5)
+        self.assertEqual(backup_restore.list_snapshots(self.repo), [first, second])
+
+        # Derived data is rebuilt only once the snapshot's media is in place as well
+        data_transfer.refresh_derived_data.side_effect = lambda: self.assertEqual(self.media_tree(), first_tree)
+        backup_restore.restore_incremental_backup(self.repo, first)
+        data_transfer.refresh_derived_data.side_effect = None
+        self.assertEqual(self.marker(), 'first')
+        self.assertEqual(self.media_tree(), first_tree)
+        data_transfer.refresh_derived_data.assert_called_once_with()
+
+        backup_restore.restore_incremental_backup(self.repo)
+        self.assertEqual(self.marker(), 'second')
+        self.assertEqual(sorted(self.media_tree()), ['copy.jpg', 'photos/a.jpg', 'photos/c.jpg'])
+
+    def test_restore_refuses_a_corrupt_blob_before_touching_current_data(self):
+        self.set_marker('backed up')
+        self.write_media('photos/a.jpg', b'photo a')
+        snapshot = backup_restore.create_incremental_backup(self.repo)
+        for root, dirs, files in os.walk(os.path.join(self.repo, 'blobs')):
+            for name in files:
+                with open(os.path.join(root, name), 'ab') as f:
+                    f.write(b'!')
+        self.set_marker('current')
+
+        with self.assertRaises(ValueError):
+            backup_restore.restore_incremental_backup(self.repo, snapshot)
+        self.assertEqual(self.marker(), 'current')
+        self.assertEqual(self.media_tree(), {'photos/a.jpg': b'photo a'})
+
+
+class ChangeTriggerMigrationTests(TransactionTestCase):
+    def tearDown(self):
+        call_command('migrate', 'society', verbosity=0)
+
+    def test_migrating_back_before_the_change_table_removes_its_triggers(self):
+        call_command('migrate', 'society', '0015', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'society_%_changes_%'")
+            self.assertEqual(cursor.fetchall(), [])
@@ -16,6 +16,12 @@ router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 from .views import RecentActionViewSet
 router.register(r'recent-actions', RecentActionViewSet)
 
+from .views import SyncViewSet
+router.register(r'sync', SyncViewSet, basename='sync')
+
+from .views import JobViewSet
+router.register(r'jobs', JobViewSet)
+
 
 urlpatterns = [
     path('', include(router.urls)),
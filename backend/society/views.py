@@ -1,18 +1,28 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Sum, Count
-from django.http import HttpResponse, Http404
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.exceptions import ValidationError
+from django.db.models import Q, Sum, Count, OuterRef, Subquery
+from django.http import HttpResponse, Http404, StreamingHttpResponse, FileResponse
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.core.management import execute_from_command_line
-from .models import Member, Area, House, Collection, SubCollection, MemberObligation, Todo, AppSettings
-from .serializers import MemberSerializer, AreaSerializer, HouseSerializer, CollectionSerializer, SubCollectionSerializer, MemberObligationSerializer, MemberObligationDetailSerializer, TodoSerializer, AppSettingsSerializer
+from .models import Member, Area, House, Collection, SubCollection, MemberObligation, Todo, AppSettings, Job
+from .serializers import MemberSerializer, AreaSerializer, HouseSerializer, CollectionSerializer, SubCollectionSerializer, MemberObligationSerializer, MemberObligationListSerializer, TodoSerializer, AppSettingsSerializer, JobSerializer
+from . import audit, change_feed, counters, data_transfer, jobs
+from .kinship import family_tree, ancestors, descendants, common_ancestors
+from .search_index import search_members, search_houses, suggest_members, suggest_houses
+from .obligation_service import bulk_create_obligations, assign_subcollection, parse_assignment
+from .family_sync import family_payloads
+import json
 import os
-import zipfile
-import tempfile
-import shutil
+import itertools
+import uuid
 from typing import Any
+from collections import Counter
 
 # Custom pagination class
 class MemberPagination(PageNumberPagination):
@@ -25,10 +35,27 @@ class HousePagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+
+def suggestion_limit(request):
+    try:
+        limit = int(request.query_params.get('limit', SUGGEST_DEFAULT_LIMIT))
+    except ValueError:
+        limit = SUGGEST_DEFAULT_LIMIT
+    return max(1, min(limit, SUGGEST_MAX_LIMIT))
+
 class AreaViewSet(viewsets.ModelViewSet):
     queryset = Area.objects.all()
     serializer_class = AreaSerializer
 
+    def get_queryset(self):
+        # Count houses and live members in the same query; both joins fan out, so count distinct rows
+        return Area.objects.annotate(
+            total_houses=Count('houses', distinct=True),
+            total_live_members=Count('houses__members', filter=Q(houses__members__status='live'), distinct=True),
+        ).order_by('id')
+
 class HouseViewSet(viewsets.ModelViewSet):
     queryset = House.objects.all()
     serializer_class = HouseSerializer
@@ -43,17 +70,22 @@ class HouseViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = House.objects.all()
+
+        if self.action in ('list', 'search'):
+            # Everything HouseListSerializer shows, in one query per page
+            guardians = Member.objects.filter(house=OuterRef('pk'), isGuardian=True).order_by('id')
+            queryset = queryset.select_related('area').annotate(
+                member_count=Count('members'),
+                live_member_count=Count('members', filter=Q(members__status='live')),
+                guardian_name=Subquery(guardians.values('name')[:1]),
+            ).order_by('id')
         
         # Apply filters from query parameters
         search = self.request.query_params.get('search', None)
         area_id = self.request.query_params.get('area', None)
         
         if search:
-            queryset = queryset.filter(
-                Q(house_name__icontains=search) | 
-                Q(family_name__icontains=search) | 
-                Q(location_name__icontains=search)
-            )
+            queryset = search_houses(queryset, search)
             
         if area_id:
             queryset = queryset.filter(area=area_id)
@@ -76,6 +108,11 @@ class HouseViewSet(viewsets.ModelViewSet):
         serializer = serializer_class(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Typeahead for house pickers: top matches for ?q= as [{id, name, house, location}]"""
+        return Response(suggest_houses(request.query_params.get('q', ''), suggestion_limit(request)))
+
 class MemberViewSet(viewsets.ModelViewSet):
     queryset = Member.objects.all()
     serializer_class = MemberSerializer
@@ -98,12 +135,7 @@ class MemberViewSet(viewsets.ModelViewSet):
         is_guardian = self.request.query_params.get('is_guardian', None)
         
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(surname__icontains=search) | 
-                Q(house__house_name__icontains=search) |
-                Q(member_id__icontains=search)
-            )
+            queryset = search_members(queryset, search)
             
         if area_id:
             queryset = queryset.filter(house__area=area_id)
@@ -129,6 +161,68 @@ class MemberViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def tree(self, request, member_id=None):
+        """Family tree around a member: ?up=N generations of ancestors, ?down=M of descendants"""
+        member = self.get_object()
+        try:
+            up = int(request.query_params.get('up', 2))
+            down = int(request.query_params.get('down', 2))
+        except ValueError:
+            return Response({'error': 'up and down must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(family_tree(member, up=up, down=down))
+
+    @action(detail=True, methods=['get'])
+    def kinship(self, request, member_id=None):
+        """Relationship lookups from the ancestry closure table
+
+        Without parameters: {"ancestors": [...], "descendants": [...]} (optionally limited by ?depth=N)
+        With ?with=<member_id>: {"related": bool, "common_ancestors": [...]} nearest first
+        """
+        member = self.get_object()
+        other_id = request.query_params.get('with', None)
+
+        if other_id:
+            try:
+                other = Member.objects.get(member_id=other_id)
+            except Member.DoesNotExist:
+                return Response({'error': 'Member not found'}, status=status.HTTP_404_NOT_FOUND)
+            shared = common_ancestors(member, other)
+            people = Member.objects.in_bulk([pk for pk, _, _ in shared])
+            return Response({
+                'related': bool(shared),
+                'common_ancestors': [
+                    {
+                        'id': people[pk].member_id,
+                        'name': people[pk].name,
+                        'surname': people[pk].surname,
+                        'generations_from_member': depth,
+                        'generations_from_other': other_depth,
+                    }
+                    for pk, depth, other_depth in shared
+                ]
+            })
+
+        try:
+            depth = int(request.query_params['depth']) if request.query_params.get('depth') else None
+        except ValueError:
+            return Response({'error': 'depth must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'ancestors': [
+                {'id': link.ancestor.member_id, 'name': link.ancestor.name, 'surname': link.ancestor.surname, 'generations': link.depth}
+                for link in ancestors(member, depth)
+            ],
+            'descendants': [
+                {'id': link.descendant.member_id, 'name': link.descendant.name, 'surname': link.descendant.surname, 'generations': link.depth}
+                for link in descendants(member, depth)
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Typeahead for member pickers: top matches for ?q= as [{id, name, house}]"""
+        return Response(suggest_members(request.query_params.get('q', ''), suggestion_limit(request)))
+
 class CollectionViewSet(viewsets.ModelViewSet):
     queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
@@ -142,8 +236,8 @@ class MemberObligationViewSet(viewsets.ModelViewSet):
     serializer_class = MemberObligationSerializer
     
     def get_serializer_class(self):
-        if self.action == 'list':
-            return MemberObligationDetailSerializer
+        if self.action in ('list', 'search'):
+            return MemberObligationListSerializer
         return MemberObligationSerializer
 
     def update(self, request, *args, **kwargs):
@@ -163,6 +257,14 @@ class MemberObligationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = MemberObligation.objects.all()
+
+        if self.action in ('list', 'search'):
+            # Load only what MemberObligationListSerializer shows, joined in one query
+            queryset = queryset.select_related('member__house', 'subcollection', 'area').only(
+                'id', 'amount', 'paid_status', 'created_at', 'updated_at',
+                'member__member_id', 'member__name', 'member__surname', 'member__house__house_name',
+                'subcollection__name', 'subcollection__year', 'area__name',
+            ).order_by('id')
         
         # Filter by subcollection if provided
         subcollection_id = self.request.query_params.get('subcollection', None)
@@ -197,63 +299,86 @@ class MemberObligationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
-        """Create multiple obligations at once"""
-        # Log the incoming data for debugging
-        print("=== DEBUG: Incoming bulk obligation data ===")
-        print("Request data:", request.data)
+        """Create multiple obligations at once
+
+        Rows are validated and inserted as a set (see obligation_service.bulk_create_obligations);
+        rows that fail validation or are already assigned come back in 'errors'.
+        """
         try:
             obligations_data = request.data.get('obligations', [])
             if not obligations_data:
                 return Response({'error': 'No obligations data provided'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            created_obligations = []
-            errors = []
-            
-            for i, obligation_data in enumerate(obligations_data):
-                try:
-                    print(f"--- Processing obligation {i+1} ---")
-                    print("Obligation data:", obligation_data)
-                    serializer = self.get_serializer(data=obligation_data)
-                    if serializer.is_valid():
-                        print("Serializer is valid")
-                        obligation = serializer.save()
-                        created_obligations.append(serializer.data)
-                        print("Created obligation:", serializer.data)
-                    else:
-                        print("Serializer errors:", serializer.errors)
-                        errors.append({
-                            'data': obligation_data,
-                            'errors': serializer.errors
-                        })
-                except Exception as e:
-                    print("Exception during obligation creation:", str(e))
-                    errors.append({
-                        'data': obligation_data,
-                        'errors': str(e)
-                    })
-            
+
+            created_obligations, errors = bulk_create_obligations(obligations_data)
+
             response_data = {
                 'created': created_obligations,
                 'errors': errors,
                 'total_created': len(created_obligations),
                 'total_errors': len(errors)
             }
-            
+
             if errors:
-                print("=== DEBUG: Response with errors ===")
-                print("Response data:", response_data)
-                print("==================================")
                 return Response(response_data, status=status.HTTP_201_CREATED if created_obligations else status.HTTP_400_BAD_REQUEST)
-            
-            print("=== DEBUG: Successful response ===")
-            print("Response data:", response_data)
-            print("==================================")
+
             return Response(response_data, status=status.HTTP_201_CREATED)
-            
+
         except Exception as e:
             print("Exception in bulk_create:", str(e))
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['post'])
+    def assign(self, request):
+        """Assign a subcollection to every member matching a filter, entirely in the database
+
+        Expects a JSON payload with:
+        {
+            "subcollection": 1,                 # Required
+            "amount": 100,                      # Optional, defaults to the subcollection amount
+            "area": 2,                          # Optional member filters
+            "status": "live",
+            "is_guardian": true,
+            "houses": ["1001", "1002"]
+        }
+
+        Returns counts only:
+        {
+            "matched": 120,           # Members selected by the filter
+            "created": 115,           # Obligations inserted
+            "already_assigned": 5     # Members that already had this obligation
+        }
+        """
+        subcollection_id = request.data.get('subcollection')
+        if not subcollection_id:
+            return Response({'error': 'subcollection is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            subcollection = SubCollection.objects.get(id=subcollection_id)
+        except (SubCollection.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'Subcollection not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        values, errors = parse_assignment(request.data)
+        if errors:
+            return Response({'error': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        members = Member.objects.all()
+        if values['area'] is not None:
+            members = members.filter(house__area=values['area'])
+        if values['status']:
+            members = members.filter(status=values['status'])
+        if values['is_guardian'] is not None:
+            members = members.filter(isGuardian=values['is_guardian'])
+        if values['houses']:
+            members = members.filter(house__home_id__in=values['houses'])
+
+        matched, created = assign_subcollection(
+            subcollection, members, amount=values['amount'], paid_status=values['paid_status']
+        )
+        return Response({
+            'matched': matched,
+            'created': created,
+            'already_assigned': matched - created
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
     @action(detail=False, methods=['patch'])
     def bulk_pay(self, request):
         """Mark multiple obligations as paid in a single database operation
@@ -274,10 +399,17 @@ class MemberObligationViewSet(viewsets.ModelViewSet):
             if not obligation_ids:
                 return Response({'error': 'No obligation IDs provided'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Update all obligations to paid status
-            updated_count = MemberObligation.objects.filter(
-                id__in=obligation_ids
-            ).update(paid_status='paid')
+            with transaction.atomic(), audit.bulk_operation('Obligation', 'bulk', 'UPDATE') as summary:
+                obligations = MemberObligation.objects.filter(id__in=obligation_ids)
+                previous = dict(obligations.values_list('id', 'paid_status'))
+                status_histogram = Counter(previous.values())
+
+                # Update all obligations to paid status
+                updated_count = obligations.update(paid_status='paid')
+                counters.record_obligation_status_change(status_histogram, 'paid')
+                # update() sends no signals, so the whole batch is one audit entry
+                summary.record_update(previous.keys(), 'paid_status', status_histogram, 'paid')
+                summary.description = f"Bulk payment: {updated_count} obligations marked as paid"
             
             return Response({
                 'updated_count': updated_count,
@@ -318,59 +450,34 @@ class MemberObligationViewSet(viewsets.ModelViewSet):
         # Apply pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = MemberObligationDetailSerializer(page, many=True)
+            serializer = MemberObligationListSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
             
-        serializer = MemberObligationDetailSerializer(queryset, many=True)
+        serializer = MemberObligationListSerializer(queryset, many=True)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
-    def statistics(self, request):
-        """Get obligation statistics for a subcollection"""
-        subcollection_id = request.query_params.get('subcollection', None)
-        
-        if not subcollection_id:
-            return Response({'error': 'subcollection parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
-            
-        try:
-            subcollection = SubCollection.objects.get(id=subcollection_id)
-        except SubCollection.DoesNotExist:
-            return Response({'error': 'Subcollection not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Get obligations for this subcollection
-        obligations = MemberObligation.objects.filter(subcollection=subcollection)
-        
-        # Calculate statistics
-        total_members = obligations.count()
-        paid_count = obligations.filter(paid_status='paid').count()
-        pending_count = obligations.filter(paid_status='pending').count()
-        overdue_count = obligations.filter(paid_status='overdue').count()
-        partial_count = obligations.filter(paid_status='partial').count()
-        
-        # Combine pending and overdue for "Pending / Overdue"
-        pending_overdue_count = pending_count + overdue_count
-        
-        # Calculate amounts
-        total_amount = obligations.aggregate(total=Sum('amount'))['total'] or 0
-        paid_amount = obligations.filter(paid_status='paid').aggregate(total=Sum('amount'))['total'] or 0
-        pending_amount = obligations.filter(Q(paid_status='pending') | Q(paid_status='overdue')).aggregate(total=Sum('amount'))['total'] or 0
-        
+    @staticmethod
+    def _format_statistics(row):
+        """Shape one row of aggregated obligation totals into the statistics payload"""
+        total_amount = row['total_amount'] or 0
+        paid_amount = row['paid_amount'] or 0
+
         # Calculate collection progress percentage
         progress_percentage = (paid_amount / total_amount * 100) if total_amount > 0 else 0
-        
-        stats = {
-            'total_members': total_members,
+
+        return {
+            'total_members': row['total_members'],
             'paid': {
-                'count': paid_count,
+                'count': row['paid_count'],
                 'amount': float(paid_amount)
             },
             'pending_overdue': {
-                'count': pending_overdue_count,
-                'amount': float(pending_amount)
+                'count': row['pending_overdue_count'],
+                'amount': float(row['pending_overdue_amount'] or 0)
             },
             'partial': {
-                'count': partial_count,
-                'amount': float(obligations.filter(paid_status='partial').aggregate(total=Sum('amount'))['total'] or 0)
+                'count': row['partial_count'],
+                'amount': float(row['partial_amount'] or 0)
             },
             'collection_progress': {
                 'percentage': round(progress_percentage, 2),
@@ -378,41 +485,85 @@ class MemberObligationViewSet(viewsets.ModelViewSet):
                 'total_amount': float(total_amount)
             }
         }
-        
-        return Response(stats)
+
+    @action(detail=False, methods=['get'])
+    def statistics(self, request):
+        """Get obligation statistics for one or more subcollections
+
+        ?subcollection=1            statistics for a single subcollection
+        ?subcollection=1,2,3        per-subcollection and rolled-up statistics
+        ?collection=4               the same, for every subcollection of a collection
+
+        All counts and sums come from a single conditional-aggregation query.
+        """
+        subcollection_param = request.query_params.get('subcollection', None)
+        collection_id = request.query_params.get('collection', None)
+
+        if not subcollection_param and not collection_id:
+            return Response({'error': 'subcollection or collection parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        subcollections = SubCollection.objects.all()
+        if subcollection_param:
+            try:
+                subcollection_ids = [int(value) for value in subcollection_param.split(',') if value.strip()]
+            except ValueError:
+                return Response({'error': 'subcollection must be a comma-separated list of IDs'}, status=status.HTTP_400_BAD_REQUEST)
+            subcollections = subcollections.filter(id__in=subcollection_ids)
+        if collection_id:
+            try:
+                collection_id = int(collection_id)
+            except ValueError:
+                return Response({'error': 'collection must be an ID'}, status=status.HTTP_400_BAD_REQUEST)
+            subcollections = subcollections.filter(collection=collection_id)
+
+        pending_overdue = Q(obligations__paid_status='pending') | Q(obligations__paid_status='overdue')
+        rows = list(subcollections.order_by('id').values('id', 'name', 'year').annotate(
+            total_members=Count('obligations'),
+            paid_count=Count('obligations', filter=Q(obligations__paid_status='paid')),
+            pending_overdue_count=Count('obligations', filter=pending_overdue),
+            partial_count=Count('obligations', filter=Q(obligations__paid_status='partial')),
+            total_amount=Sum('obligations__amount'),
+            paid_amount=Sum('obligations__amount', filter=Q(obligations__paid_status='paid')),
+            pending_overdue_amount=Sum('obligations__amount', filter=pending_overdue),
+            partial_amount=Sum('obligations__amount', filter=Q(obligations__paid_status='partial')),
+        ))
+
+        # A single subcollection keeps the original flat response
+        if subcollection_param and not collection_id and ',' not in subcollection_param:
+            if not rows:
+                return Response({'error': 'Subcollection not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(self._format_statistics(rows[0]))
+
+        totals = {
+            key: sum((row[key] or 0) for row in rows)
+            for key in ('total_members', 'paid_count', 'pending_overdue_count', 'partial_count',
+                        'total_amount', 'paid_amount', 'pending_overdue_amount', 'partial_amount')
+        }
+        return Response({
+            'subcollections': [
+                {'subcollection': row['id'], 'name': row['name'], 'year': row['year'], **self._format_statistics(row)}
+                for row in rows
+            ],
+            'totals': self._format_statistics(totals)
+        })
 
     @action(detail=False, methods=['post'])
     def export_data(self, request):
-        """Export database and images to ZIP"""
+        """Export database and images to ZIP
+
+        The archive is streamed as it is built (see data_transfer.stream_export),
+        so it is never held in memory or written to a temporary file.
+        """
         try:
-            with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_zip:
-                zip_path = temp_zip.name
-
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                # Add database file
-                db_path = settings.DATABASES['default']['NAME']
-                if os.path.exists(db_path):
-                    zf.write(db_path, 'db.sqlite3')
-
-                # Add media folder
-                media_root = settings.MEDIA_ROOT
-                if os.path.exists(media_root):
-                    for root, dirs, files in os.walk(media_root):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arc_name = os.path.relpath(file_path, media_root)
-                            zf.write(file_path, arc_name)
-
-            with open(zip_path, 'rb') as f:
-                response = HttpResponse(f.read(), content_type='application/zip')
-                response['Content-Disposition'] = 'attachment; filename="mahall_data.zip"'
-                return response
+            chunks = data_transfer.stream_export()
+            # Take the database snapshot now so a failure is reported before streaming starts
+            first = next(chunks)
+            response = StreamingHttpResponse(itertools.chain([first], chunks), content_type='application/zip')
+            response['Content-Disposition'] = 'attachment; filename="mahall_data.zip"'
+            return response
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'zip_path' in locals() and os.path.exists(zip_path):
-                os.remove(zip_path)
 
     @action(detail=False, methods=['post'])
     def import_data(self, request):
@@ -421,30 +572,11 @@ class MemberObligationViewSet(viewsets.ModelViewSet):
             uploaded_file = request.FILES.get('zip_file')
             if not uploaded_file:
                 return Response({'error': 'No ZIP file provided'}, status=status.HTTP_400_BAD_REQUEST)
+            # The import replaces the database file the running jobs write to
+            if Job.objects.filter(status__in=('queued', 'running')).exists():
+                return Response({'error': 'Wait for the running background jobs to finish'}, status=status.HTTP_409_CONFLICT)
 
-            # Extract to temp directory first
-            with tempfile.TemporaryDirectory() as temp_dir:
-                with zipfile.ZipFile(uploaded_file, 'r') as zf:
-                    zf.extractall(temp_dir)
-
-                # Replace database
-                db_source = os.path.join(temp_dir, 'db.sqlite3')
-                db_dest = settings.DATABASES['default']['NAME']
-                if os.path.exists(db_source):
-                    shutil.copy2(db_source, db_dest)
-
-                # Replace media files
-                media_temp = os.path.join(temp_dir)
-                for item in os.listdir(media_temp):
-                    if item != 'db.sqlite3':
-                        source = os.path.join(media_temp, item)
-                        dest = os.path.join(settings.MEDIA_ROOT, item)
-                        if os.path.isdir(source):
-                            if os.path.exists(dest):
-                                shutil.rmtree(dest)
-                            shutil.copytree(source, dest)
-                        else:
-                            shutil.copy2(source, dest)
+            data_transfer.import_archive(uploaded_file)
 
             return Response({'message': 'Data imported successfully'})
 
@@ -502,42 +634,200 @@ class DashboardViewSet(viewsets.ViewSet):
     """
     
     def list(self, request):
-        """Return dashboard statistics"""
-        # Get counts for each model
-        stats = {
-            'areas_count': Area.objects.count(),
-            'houses_count': House.objects.count(),
-            'members_count': Member.objects.count(),
-            'collections_count': Collection.objects.count(),
-            'subcollections_count': SubCollection.objects.count(),
-            'obligations_count': MemberObligation.objects.count(),
-            'todos_count': Todo.objects.count(),
-            'completed_todos_count': Todo.objects.filter(completed=True).count(),
-            'pending_todos_count': Todo.objects.filter(completed=False).count(),
-            'members_by_status': {
-                'live': Member.objects.filter(status='live').count(),
-                'dead': Member.objects.filter(status='dead').count(),
-                'terminated': Member.objects.filter(status='terminated').count(),
-            },
-            'obligations_by_status': {
-                'pending': MemberObligation.objects.filter(paid_status='pending').count(),
-                'paid': MemberObligation.objects.filter(paid_status='paid').count(),
-                'overdue': MemberObligation.objects.filter(paid_status='overdue').count(),
-                'partial': MemberObligation.objects.filter(paid_status='partial').count(),
-            }
-        }
-        
-        return Response(stats)
+        """Return dashboard statistics from the materialized counters (see society.counters)"""
+        return Response(counters.snapshot())
 
 from .models import RecentAction
 from .serializers import RecentActionSerializer
 
+class RecentActionPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-timestamp', '-id')
+
 class RecentActionViewSet(viewsets.ModelViewSet):
     """
     Viewset for recent actions. Allows updating status.
+
+    The list is cursor-paginated, newest first. Filters: model_name, action_type,
+    is_sync_pending and since (ISO timestamp; only actions after it are returned).
     """
 
     queryset = RecentAction.objects.all()
     serializer_class = RecentActionSerializer
-    ordering_fields = ['timestamp']
-    filterset_fields = ['model_name', 'action_type', 'is_sync_pending']
+    pagination_class = RecentActionPagination
+
+    def get_queryset(self):
+        queryset = RecentAction.objects.all()
+
+        model_name = self.request.query_params.get('model_name', None)
+        action_type = self.request.query_params.get('action_type', None)
+        is_sync_pending = self.request.query_params.get('is_sync_pending', None)
+        since = self.request.query_params.get('since', None)
+
+        if model_name:
+            queryset = queryset.filter(model_name=model_name)
+
+        if action_type:
+            queryset = queryset.filter(action_type=action_type.upper())
+
+        if is_sync_pending is not None:
+            queryset = queryset.filter(is_sync_pending=str(is_sync_pending).lower() in ('true', '1'))
+
+        if since:
+            # A '+' in an unencoded UTC offset arrives as a space
+            try:
+                since_dt = parse_datetime(since.replace(' ', '+'))
+            except ValueError:
+                since_dt = None
+            if since_dt is None:
+                raise ValidationError({'since': 'Expected an ISO 8601 timestamp'})
+            if timezone.is_naive(since_dt):
+                since_dt = timezone.make_aware(since_dt)
+            queryset = queryset.filter(timestamp__gt=since_dt)
+
+        return queryset
+
+    @action(detail=False, methods=['post'])
+    def bulk_ack(self, request):
+        """Mark many actions as synced in a single UPDATE
+
+        Expects a JSON payload with either:
+        {
+            "action_ids": [1, 2, 3, ...]  # Actions to mark as synced
+        }
+        or
+        {
+            "until": "2024-01-31T12:00:00Z"  # Mark every pending action up to and including this time
+        }
+
+        Returns:
+        {
+            "updated_count": 3  # Number of actions that were pending and are now synced
+        }
+        """
+        action_ids = request.data.get('action_ids', None)
+        until = request.data.get('until', None)
+        if not action_ids and not until:
+            return Response({'error': 'Provide action_ids or until'}, status=status.HTTP_400_BAD_REQUEST)
+
+        actions = RecentAction.objects.filter(is_sync_pending=True)
+        if action_ids:
+            if not isinstance(action_ids, list) or not all(
+                isinstance(pk, int) and not isinstance(pk, bool) for pk in action_ids
+            ):
+                return Response({'error': 'action_ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+            actions = actions.filter(id__in=action_ids)
+        if until:
+            try:
+                until_dt = parse_datetime(str(until))
+            except ValueError:
+                until_dt = None
+            if until_dt is None:
+                return Response({'error': 'until must be an ISO 8601 timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(until_dt):
+                until_dt = timezone.make_aware(until_dt)
+            actions = actions.filter(timestamp__lte=until_dt)
+
+        updated_count = actions.update(is_sync_pending=False)
+        return Response({'updated_count': updated_count}, status=status.HTTP_200_OK)
+
+
+SYNC_CHANGES_DEFAULT_LIMIT = 500
+SYNC_CHANGES_MAX_LIMIT = 5000
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Server-side data for the Firestore sync.
+    """
+
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        """Stream the sync payload of every family as NDJSON (one JSON object per line)
+
+        The X-Sync-Watermark header carries the change sequence number the snapshot
+        starts from; pass it to /sync/changes/ to continue with delta syncs.
+        """
+        watermark = change_feed.current_watermark()
+        lines = (json.dumps(payload) + '\n' for payload in family_payloads())
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        response['X-Sync-Watermark'] = str(watermark)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Families changed since a watermark
+
+        Query parameters: since (last acknowledged watermark, default 0) and
+        limit (default 500, max 5000).
+
+        Returns:
+        {
+            "watermark": 42,  # Pass as since= on the next call
+            "has_more": false,  # More changes are waiting beyond this page
+            "families": [...],  # Current payload of each changed family, as in /sync/snapshot/
+            "deleted": ["1001"]  # Document ids of deleted families
+        }
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = max(1, min(int(request.query_params.get('limit', SYNC_CHANGES_DEFAULT_LIMIT)), SYNC_CHANGES_MAX_LIMIT))
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        changed, deleted, watermark, has_more = change_feed.changes_since(since, limit)
+        families = list(family_payloads(House.objects.filter(pk__in=changed))) if changed else []
+        return Response({
+            'watermark': watermark,
+            'has_more': has_more,
+            'families': families,
+            'deleted': deleted,
+        })
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background jobs (see society.jobs). POST /jobs/ queues a job and returns it
+    at once with status 'queued'; poll /jobs/{id}/ for status, progress and result.
+    """
+
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def create(self, request):
+        """Queue a job
+
+        Expects {"kind": "...", "params": {...}}. Kinds:
+        - export_data: no params; download the archive from /jobs/{id}/download/
+        - bulk_create_obligations: params {"obligations": [...]} as for /obligations/bulk_create/
+        - firebase_sync: no params; flushes the pending Firestore changes
+
+        Imports are not jobs; use /obligations/import_data/. Neither are assignments:
+        /obligations/assign/ is a single INSERT ... SELECT that returns at once.
+        """
+        kind = request.data.get('kind')
+        if kind not in jobs.kinds():
+            return Response({'error': f"kind must be one of: {', '.join(jobs.kinds())}"}, status=status.HTTP_400_BAD_REQUEST)
+        params = request.data.get('params') or {}
+        if not isinstance(params, dict):
+            return Response({'error': 'params must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if kind == 'export_data':
+            # The handler creates JOBS_DIR when it writes the archive
+            params = {'filename': f'mahall_data_{uuid.uuid4().hex}.zip'}
+
+        job = jobs.submit(kind, params)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the file produced by a finished export job"""
+        job = self.get_object()
+        filename = (job.result or {}).get('file')
+        if job.status != 'succeeded' or not filename:
+            return Response({'error': 'Job has no file to download'}, status=status.HTTP_404_NOT_FOUND)
+        path = os.path.join(settings.JOBS_DIR, filename)
+        if not os.path.exists(path):
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename='mahall_data.zip', content_type='application/zip')
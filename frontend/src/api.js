@@ -12,6 +12,9 @@ export const memberAPI = {
   partialUpdate: (id, data) => api.patch(`/members/${id}/`, data),
   delete: (id) => api.delete(`/members/${id}/`),
   search: (params) => api.get('/members/search/', { params }),
+  suggest: (q, limit) => api.get('/members/suggest/', { params: { q, limit } }),
+  tree: (id, up = 2, down = 2) => api.get(`/members/${id}/tree/`, { params: { up, down } }),
+  kinship: (id, params) => api.get(`/members/${id}/kinship/`, { params }),
 };
 
 export const houseAPI = {
@@ -21,6 +24,7 @@ export const houseAPI = {
   update: (id, data) => api.put(`/houses/${id}/`, data),
   delete: (id) => api.delete(`/houses/${id}/`),
   search: (params) => api.get('/houses/search/', { params }),
+  suggest: (q, limit) => api.get('/houses/suggest/', { params: { q, limit } }),
 };
 
 export const areaAPI = {
@@ -52,6 +56,7 @@ export const obligationAPI = {
   get: (id) => api.get(`/obligations/${id}/`),
   create: (data) => api.post('/obligations/', data),
   bulkCreate: (data) => api.post('/obligations/bulk_create/', data),
+  assign: (data) => api.post('/obligations/assign/', data),
   bulkPay: (data) => api.patch('/obligations/bulk_pay/', data),
   update: (id, data) => api.put(`/obligations/${id}/`, data),
   partialUpdate: (id, data) => api.patch(`/obligations/${id}/`, data),
@@ -60,6 +65,8 @@ export const obligationAPI = {
   statistics: (subcollectionId) => api.get('/obligations/statistics/', {
     params: { subcollection: subcollectionId }
   }),
+  // params: { subcollection: '1,2,3' } or { collection: id }
+  statisticsSummary: (params) => api.get('/obligations/statistics/', { params }),
   exportData: () => api.post('/obligations/export_data/', {}, {
     responseType: 'blob',
   }),
@@ -97,12 +104,60 @@ export const settingsAPI = {
 };
 
 export const recentActionsAPI = {
+  // Cursor-paginated, newest first: { next, previous, results }
   getAll: (params) => api.get('/recent-actions/', { params }),
+  getPage: (url) => api.get(url),
+  // Follow the cursor until every matching action is loaded
+  getAllPages: async (params) => {
+    let response = await api.get('/recent-actions/', { params: { page_size: 500, ...params } });
+    const results = [...response.data.results];
+    while (response.data.next) {
+      response = await api.get(response.data.next);
+      results.push(...response.data.results);
+    }
+    return results;
+  },
   update: (id, data) => api.patch(`/recent-actions/${id}/`, data),
+  // Mark actions as synced: { action_ids: [...] } or { until: isoTimestamp }
+  bulkAck: (data) => api.post('/recent-actions/bulk_ack/', data),
 };
 
 
 
+export const syncAPI = {
+  // Families changed after the watermark: { watermark, has_more, families, deleted }
+  changes: (since, limit) => api.get('/sync/changes/', { params: { since, limit } }),
+  // Stream /sync/snapshot/ (NDJSON) and call onFamily for each family payload
+  snapshot: async (onFamily) => {
+    const response = await fetch(`${api.defaults.baseURL}/sync/snapshot/`);
+    if (!response.ok) throw new Error(`Snapshot failed with status ${response.status}`);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let count = 0;
+    while (true) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+      const lines = buffered.split('\n');
+      buffered = done ? '' : lines.pop();
+      for (const line of lines) {
+        if (line.trim()) {
+          await onFamily(JSON.parse(line));
+          count++;
+        }
+      }
+      if (done) return count;
+    }
+  },
+};
+
+export const jobsAPI = {
+  // Queue a background job; poll get(id) until status is 'succeeded' or 'failed'
+  submit: (kind, params) => api.post('/jobs/', { kind, params }),
+  get: (id) => api.get(`/jobs/${id}/`),
+  download: (id) => api.get(`/jobs/${id}/download/`, { responseType: 'blob' }),
+};
+
 // Export the api instance as well
 export { api };
 export default api;
\ No newline at end of file
@@ -21,7 +21,7 @@ const DeleteConfirmModal = ({ isOpen, onClose, onConfirm, item, itemType }) => {
     } else if (itemType === 'subcollections') {
       return `subcollection "${item.name}"`;
     } else if (itemType === 'obligations') {
-      return `obligation for member ${item.member?.name || 'Unknown'}`;
+      return `obligation for member ${item.member_name || 'Unknown'}`;
     }
 
     return 'this item';
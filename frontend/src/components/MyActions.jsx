@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { recentActionsAPI, settingsAPI, houseAPI, memberAPI, obligationAPI, subcollectionAPI, api } from '../api';
+import { recentActionsAPI, settingsAPI, houseAPI, memberAPI, obligationAPI, subcollectionAPI, syncAPI } from '../api';
 import './MyActions.css';
 import { FaHistory, FaCloudUploadAlt, FaCheck, FaTrash, FaSearch, FaSync, FaExclamationTriangle, FaTimes } from 'react-icons/fa';
 
@@ -24,8 +24,8 @@ const MyActions = () => {
     const loadActions = async () => {
         setLoading(true);
         try {
-            const response = await recentActionsAPI.getAll();
-            setActions(response.data);
+            // Only pending actions are shown, so leave the synced history on the server
+            setActions(await recentActionsAPI.getAllPages({ is_sync_pending: true }));
         } catch (err) {
             console.error("Failed to load actions", err);
             setError("Failed to load recent actions.");
@@ -109,6 +109,15 @@ const MyActions = () => {
         return new Date(isoString).toLocaleString();
     };
 
+    const formatChangeValue = (value) => {
+        if (Array.isArray(value)) return value.join(', ');
+        // Bulk updates store the old values as a histogram, e.g. {pending: 3, overdue: 1}
+        if (value && typeof value === 'object') {
+            return Object.entries(value).map(([key, count]) => `${key} ×${count}`).join(', ');
+        }
+        return value || 'None';
+    };
+
     const renderChanges = (changes) => {
         if (!changes || Object.keys(changes).length === 0) return null;
         return (
@@ -116,11 +125,17 @@ const MyActions = () => {
                 {Object.entries(changes).map(([field, delta]) => (
                     <div key={field} className="change-item">
                         <span className="change-field">{field}:</span>
-                        <div className="change-values">
-                            <span className="old-val">{delta.old || 'None'}</span>
-                            <span className="arrow">→</span>
-                            <span className="new-val">{delta.new || 'None'}</span>
-                        </div>
+                        {delta && typeof delta === 'object' && !Array.isArray(delta) ? (
+                            <div className="change-values">
+                                <span className="old-val">{formatChangeValue(delta.old)}</span>
+                                <span className="arrow">→</span>
+                                <span className="new-val">{formatChangeValue(delta.new)}</span>
+                            </div>
+                        ) : (
+                            <div className="change-values">
+                                <span className="new-val">{formatChangeValue(delta)}</span>
+                            </div>
+                        )}
                     </div>
                 ))}
             </div>
@@ -169,7 +184,7 @@ const MyActions = () => {
             const app = await getOrInitSyncApp(firebaseConfig);
             const db = getFirestore(app);
 
-            let syncedCount = 0;
+            const syncedIds = [];
 
             for (const action of pendingActions) {
                 try {
@@ -289,19 +304,22 @@ const MyActions = () => {
                         }
                     }
 
-                    // Mark as synced locally
-                    await recentActionsAPI.update(action.id, { is_sync_pending: false });
-                    syncedCount++;
+                    syncedIds.push(action.id);
 
                 } catch (innerErr) {
                     console.error(`Failed to sync action ${action.id}`, innerErr);
                 }
             }
 
+            // Mark everything that was pushed as synced locally in one request
+            if (syncedIds.length > 0) {
+                await recentActionsAPI.bulkAck({ action_ids: syncedIds });
+            }
+
             loadActions();
             loadCloudData();
             closeSyncModal();
-            alert(`Sync process finished. ${syncedCount}/${pendingActions.length} actions processed.`);
+            alert(`Sync process finished. ${syncedIds.length}/${pendingActions.length} actions processed.`);
 
         } catch (err) {
             console.error("Sync failed", err);
@@ -324,133 +342,15 @@ const MyActions = () => {
             const app = await getOrInitSyncApp(firebaseConfig);
             const db = getFirestore(app);
 
-            // Fetch ALL Houses
-            let allHouses = [];
-            let houseRes = await houseAPI.getAll();
-            if (houseRes.data.results) {
-                allHouses = houseRes.data.results;
-                let page = 2;
-                while (true) {
-                    try {
-                        const res = await api.get('/houses/', { params: { page_size: 100, page } });
-                        if (!res.data.results || res.data.results.length === 0) break;
-                        allHouses = [...allHouses, ...res.data.results];
-                        if (!res.data.next) break;
-                        page++;
-                    } catch (e) { break; }
-                }
-            } else {
-                allHouses = houseRes.data;
-            }
-
-            // Fetch ALL Members
-            let allMembers = [];
-            let memberRes = await memberAPI.getAll();
-            if (memberRes.data.results) {
-                allMembers = memberRes.data.results;
-                let page = 2;
-                while (true) {
-                    try {
-                        const res = await api.get('/members/', { params: { page_size: 100, page } });
-                        if (!res.data.results || res.data.results.length === 0) break;
-                        allMembers = [...allMembers, ...res.data.results];
-                        if (!res.data.next) break;
-                        page++;
-                    } catch (e) { break; }
-                }
-            } else {
-                allMembers = memberRes.data;
-            }
-
-
-            // Fetch ALL Pending Obligations for Bulk/Full Sync optimization
-            // Instead of fetching per guardian, we fetch all pending and map them.
-            const guardianObligationsMap = {}; // guardian_id -> [{ subcollection: "Name", amount: 100 }]
-            try {
-                // Fetch all pending
-                let allPendingObs = [];
-                // Pagination loop for obligations
-                let oPage = 1;
-                while (true) {
-                    const oRes = await obligationAPI.search({ paid_status: 'pending', page: oPage, page_size: 100 });
-                    const results = oRes.data.results || oRes.data;
-                    if (!results || results.length === 0) break;
-                    allPendingObs = [...allPendingObs, ...results];
-                    if (!oRes.data.next) break;
-                    oPage++;
-                }
-
-                // Group by member (guardian)
-                allPendingObs.forEach(o => {
-                    // Extract Member ID
-                    let mId = o.member;
-                    if (typeof o.member === 'object' && o.member !== null) mId = o.member.member_id;
-
-                    if (mId) {
-                        if (!guardianObligationsMap[mId]) guardianObligationsMap[mId] = [];
-                        const subId = (typeof o.subcollection === 'object') ? o.subcollection.id : o.subcollection;
-                        guardianObligationsMap[mId].push({
-                            subcollection: subcollectionMap[subId] || 'Unknown',
-                            amount: o.amount
-                        });
-                    }
-                });
-            } catch (e) {
-                console.error("Failed to fetch all obligations for full sync", e);
-            }
-
-            // Map Members to Houses
-            const houseMembersMap = {};
-            allMembers.forEach(m => {
-                if (m.house) {
-                    if (!houseMembersMap[m.house]) houseMembersMap[m.house] = [];
-                    houseMembersMap[m.house].push(m);
-                }
-            });
-
-            // Build Payloads and Batch Write
+            // The server streams one ready-made payload per family (house, guardian,
+            // members, pending obligations), so we only need to batch the writes
             const batchSize = 400;
             let batch = writeBatch(db);
             let count = 0;
-            let batchCount = 0;
-
-            for (const house of allHouses) {
-                const members = houseMembersMap[house.home_id] || [];
-                const guardian = members.find(m => m.isGuardian) || members[0] || {};
-
-                const docId = house.firebase_id || house.home_id;
-                if (!docId) continue;
-
-                const docRef = doc(db, 'units', String(docId));
-
-                const memberList = members.map(m => ({
-                    member_id: m.member_id,
-                    name: `${m.name} ${m.surname}`.trim()
-                }));
-
-                // STRICT PAYLOAD as per user request
-                const payload = {
-                    // 1. house id
-                    houseId: house.home_id,
-                    // 2. house name
-                    houseName: house.house_name,
-                    // 3. gardient name + surname
-                    guardianName: `${guardian.name || ''} ${guardian.surname || ''}`.trim(),
-                    // 4. date of birth
-                    guardianDob: guardian.date_of_birth || '',
-                    // 5. adhar number(last 4 digit)
-                    guardianAadhaarLast4: guardian.adhar ? guardian.adhar.slice(-4) : "",
-                    // 5. adhar number(last 4 digit)
-                    guardianAadhaarLast4: guardian.adhar ? guardian.adhar.slice(-4) : "",
-                    // 6. oblications - populated if exists
-                    members: memberList,
-                };
-
-                if (guardian.member_id && guardianObligationsMap[guardian.member_id]) {
-                    payload.obligations = guardianObligationsMap[guardian.member_id];
-                }
 
-                batch.set(docRef, payload, { merge: true });
+            const syncedUnits = await syncAPI.snapshot(async ({ docId, ...payload }) => {
+                if (!docId) return;
+                batch.set(doc(db, 'units', String(docId)), payload, { merge: true });
                 count++;
 
                 if (count >= batchSize) {
@@ -458,13 +358,13 @@ const MyActions = () => {
                     batch = writeBatch(db);
                     count = 0;
                 }
-            }
+            });
 
             if (count > 0) {
                 await batch.commit();
             }
 
-            alert(`Full Sync Complete! Synced ${allHouses.length} units.`);
+            alert(`Full Sync Complete! Synced ${syncedUnits} units.`);
             loadCloudData();
 
         } catch (e) {
@@ -33,8 +33,11 @@ const ObligationModal = ({ isOpen, onClose, onSubmit, initialData, selectedSubco
         });
 
         const memberData = initialData.member;
-        if (memberData) {
+        if (memberData && typeof memberData === 'object') {
           setSearchTerm(`${memberData.member_id} - ${memberData.name} ${memberData.surname || ''}`);
+        } else if (memberData) {
+          // Flat obligation rows from the list/search endpoints
+          setSearchTerm(`${memberData} - ${initialData.member_name || ''} ${initialData.member_surname || ''}`);
         }
       } else {
         setFormData({
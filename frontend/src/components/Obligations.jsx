@@ -526,7 +526,7 @@ const Obligations = ({
                     />
                   </td>
                   <td className="font-semibold">
-                    {`${obligation.member?.member_id} - ${obligation.member?.name || 'Unknown'}`}
+                    {`${obligation.member?.member_id ?? obligation.member} - ${obligation.member?.name || obligation.member_name || 'Unknown'}`}
                   </td>
                   <td>
                     <span className="badge-outline">{getAreaName(obligation)}</span>
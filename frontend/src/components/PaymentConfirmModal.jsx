@@ -35,11 +35,11 @@ const PaymentConfirmModal = ({ isOpen, onClose, onConfirm, obligation }) => {
             <h3>Payment Details</h3>
             <div className="detail-row">
               <span className="label">Member:</span>
-              <span className="value">{obligation?.member?.name || 'Unknown Member'}</span>
+              <span className="value">{obligation?.member_name || 'Unknown Member'}</span>
             </div>
             <div className="detail-row">
               <span className="label">Subcollection:</span>
-              <span className="value">{obligation?.subcollection?.name || 'N/A'}</span>
+              <span className="value">{obligation?.subcollection_name || 'N/A'}</span>
             </div>
             <div className="detail-row">
               <span className="label">Amount:</span>